@@ -0,0 +1,166 @@
+"""
+Incrementally maintained attendance rollups.
+
+ClassGroupDailyAttendance (per class group of the mark's course and date)
+and StudentMonthlyAttendance (per student and month) hold one count
+per AttendanceStatus plus the total. Every Attendance write applies its
+delta: attendance.signals handles save/delete and the bulk mark calls
+apply_attendance_changes() itself. API updates and deletes lock the mark
+before reading the status it replaces, so concurrent writes cannot make the
+rollups drift. rebuild_attendance_rollups recomputes both tables from
+scratch (the migration backfilling the marks' lesson fields runs it too).
+"""
+from collections import defaultdict
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from schedule.models import Course
+from .models import Attendance, AttendanceStatus, ClassGroupDailyAttendance, StudentMonthlyAttendance
+
+COUNT_FIELDS = [*AttendanceStatus.values, 'total']
+
+
+def status_counts():
+    """Aggregates for COUNT_FIELDS over Attendance rows (conditional counts)."""
+    counts = {status: Count('id', filter=Q(status=status)) for status in AttendanceStatus.values}
+    counts['total'] = Count('id')
+    return counts
+
+
+def attendance_entry(attendance):
+    """(student_id, course_id, date, status) of a mark as it counts in the rollups."""
+    return (
+        str(attendance.student_id),
+        str(attendance.course_id),
+        str(attendance.date) if attendance.date else None,
+        attendance.status,
+    )
+
+
+class _Delta:
+    __slots__ = ('counts', 'needs_row')
+
+    def __init__(self):
+        self.counts = defaultdict(int)
+        self.needs_row = False
+
+    def add(self, status, sign):
+        self.counts[status] += sign
+        self.counts['total'] += sign
+        if sign > 0:
+            self.needs_row = True
+
+    def is_empty(self):
+        return not any(self.counts.values())
+
+
+def _apply(model, key_fields, deltas):
+    deltas = {key: delta for key, delta in deltas.items() if not delta.is_empty()}
+    if not deltas:
+        return
+    # Rows are created only for keys that gain marks: removals never insert, so a
+    # cascade delete of the class group/student cannot re-create rows for it.
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key, delta in deltas.items() if delta.needs_row],
+        ignore_conflicts=True,
+    )
+    condition = reduce(or_, (Q(**dict(zip(key_fields, key))) for key in deltas))
+    rows = list(model.objects.select_for_update().filter(condition).order_by(*key_fields))
+    now = timezone.now()
+    for row in rows:
+        delta = deltas[tuple(str(getattr(row, field)) for field in key_fields)]
+        for field, count in delta.counts.items():
+            setattr(row, field, getattr(row, field) + count)
+        row.updated_at = now
+    model.objects.bulk_update(rows, [*COUNT_FIELDS, 'updated_at'])
+
+
+def apply_attendance_changes(removed=(), added=()):
+    """Apply removed/added attendance entries (see attendance_entry) to both rollup tables."""
+    # Marks not backfilled yet (no date) are left to rebuild_attendance_rollups
+    removed = [entry for entry in removed if entry[2]]
+    added = [entry for entry in added if entry[2]]
+    course_ids = {course_id for _, course_id, _, _ in removed + added}
+    if not course_ids:
+        return
+    class_groups = {
+        str(pk): str(class_group_id) for pk, class_group_id in
+        Course.objects.filter(id__in=course_ids).values_list('id', 'class_group_id')
+    }
+    class_group_day = defaultdict(_Delta)
+    student_month = defaultdict(_Delta)
+    for sign, entries in ((-1, removed), (1, added)):
+        for student_id, course_id, mark_date, status in entries:
+            if course_id not in class_groups:
+                continue  # the course is being deleted with its marks
+            class_group_day[(class_groups[course_id], mark_date)].add(status, sign)
+            student_month[(student_id, mark_date[:7])].add(status, sign)
+    with transaction.atomic(savepoint=False):
+        _apply(ClassGroupDailyAttendance, ('class_group_id', 'date'), class_group_day)
+        _apply(StudentMonthlyAttendance, ('student_id', 'period'), student_month)
+
+
+def attendance_saved(records):
+    """Account for created/updated marks (uses the entry loaded from the DB, if any)."""
+    removed = [record._rollup_entry for record in records if getattr(record, '_rollup_entry', None)]
+    added = [attendance_entry(record) for record in records]
+    apply_attendance_changes(removed, added)
+    for record, entry in zip(records, added):
+        record._rollup_entry = entry
+
+
+def attendance_deleted(records):
+    """Account for deleted marks."""
+    apply_attendance_changes(
+        [getattr(record, '_rollup_entry', None) or attendance_entry(record) for record in records],
+        (),
+    )
+
+
+def rebuild_attendance_rollups(apps=None):
+    """Recompute both rollup tables from the attendance table. Returns row counts.
+
+    `apps` is a migration's app registry, to run against its historical models.
+    """
+    attendance_model, daily_model, monthly_model = (
+        (Attendance, ClassGroupDailyAttendance, StudentMonthlyAttendance) if apps is None else (
+            apps.get_model('attendance', 'Attendance'),
+            apps.get_model('attendance', 'ClassGroupDailyAttendance'),
+            apps.get_model('attendance', 'StudentMonthlyAttendance'),
+        )
+    )
+    marks = attendance_model.objects.filter(date__isnull=False)
+    class_group_day = (
+        marks.values('course__class_group_id', 'date')
+        .annotate(**status_counts())
+        .order_by()
+    )
+    student_month = (
+        marks.annotate(month=TruncMonth('date'))
+        .values('student_id', 'month')
+        .annotate(**status_counts())
+        .order_by()
+    )
+    with transaction.atomic():
+        daily_model.objects.all().delete()
+        monthly_model.objects.all().delete()
+        daily = daily_model.objects.bulk_create([
+            daily_model(
+                class_group_id=row['course__class_group_id'],
+                date=row['date'],
+                **{field: row[field] for field in COUNT_FIELDS},
+            )
+            for row in class_group_day
+        ], batch_size=1000)
+        monthly = monthly_model.objects.bulk_create([
+            monthly_model(
+                student_id=row['student_id'],
+                period=row['month'].strftime('%Y-%m'),
+                **{field: row[field] for field in COUNT_FIELDS},
+            )
+            for row in student_month
+        ], batch_size=1000)
+    return len(daily), len(monthly)
@@ -5,3 +5,6 @@ class AttendanceConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'attendance'
 
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,22 @@
+"""
+Management command to fill Attendance.date/course/school from the lessons.
+The migration adding those columns does this itself; run it again for marks
+written without them since (e.g. by an older release during a deploy), then
+rebuild_attendance_rollups.
+"""
+from django.core.management.base import BaseCommand
+from attendance.services import backfill_attendance_lessons
+
+
+class Command(BaseCommand):
+    help = 'Copy lesson date, course and school onto attendance rows that lack them, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='Rows per UPDATE')
+
+    def handle(self, *args, **options):
+        total = 0
+        for count in backfill_attendance_lessons(options['batch_size']):
+            total += count
+            self.stdout.write(f'{total} rows...')
+        self.stdout.write(self.style.SUCCESS(f'Backfilled {total} attendance rows.'))
@@ -0,0 +1,33 @@
+"""
+Management command moving buffered student self check-ins into Attendance.
+Run it with --loop as a long-lived worker next to the web processes.
+"""
+import time
+from django.core.management.base import BaseCommand
+from attendance.services import flush_check_ins
+
+
+class Command(BaseCommand):
+    help = 'Flush buffered attendance check-ins into attendance marks, in batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Check-ins per batch')
+        parser.add_argument('--loop', action='store_true', help='Keep running, polling the buffer')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds between polls of an empty buffer')
+
+    def handle(self, *args, **options):
+        while True:
+            consumed = created = 0
+            while True:
+                batch, marks = flush_check_ins(options['batch_size'])
+                if not batch:
+                    break
+                consumed += batch
+                created += marks
+            if consumed or not options['loop']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Flushed {consumed} check-ins into {created} attendance marks.'
+                ))
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,16 @@
+"""
+Management command to recompute the attendance rollup tables from the attendance table.
+Use after imports/raw SQL that bypassed the ORM, or to repair drift.
+"""
+from django.core.management.base import BaseCommand
+from attendance.aggregates import rebuild_attendance_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild ClassGroupDailyAttendance and StudentMonthlyAttendance from attendance'
+
+    def handle(self, *args, **options):
+        daily, monthly = rebuild_attendance_rollups()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {daily} class group/day and {monthly} student/month rollups.'
+        ))
@@ -0,0 +1,21 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:44
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0003_initial'),
+        ('schedule', '0002_initial'),
+        ('students', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['created_at'], name='attendance_created_056129_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:56
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0004_attendance_created_at_index'),
+        ('students', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassGroupDailyAttendance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('tardy', models.IntegerField(default=0)),
+                ('excused', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('class_group', models.ForeignKey(help_text='Класс курса урока', on_delete=django.db.models.deletion.CASCADE, related_name='daily_attendance', to='students.classgroup')),
+            ],
+            options={
+                'verbose_name': 'Class group daily attendance',
+                'verbose_name_plural': 'Class group daily attendance',
+                'db_table': 'attendance_daily_class_group',
+                'indexes': [models.Index(fields=['date'], name='attendance__date_8b0a94_idx')],
+                'unique_together': {('class_group', 'date')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentMonthlyAttendance',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(help_text='Месяц в формате YYYY-MM', max_length=7)),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('tardy', models.IntegerField(default=0)),
+                ('excused', models.IntegerField(default=0)),
+                ('total', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='monthly_attendance', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Student monthly attendance',
+                'verbose_name_plural': 'Student monthly attendance',
+                'db_table': 'attendance_monthly_student',
+                'unique_together': {('student', 'period')},
+            },
+        ),
+    ]
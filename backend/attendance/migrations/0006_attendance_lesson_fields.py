@@ -0,0 +1,56 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:57
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_lesson_fields(apps, schema_editor):
+    from attendance.aggregates import rebuild_attendance_rollups
+    from attendance.services import backfill_attendance_lessons
+    for _ in backfill_attendance_lessons(apps=apps):
+        pass
+    rebuild_attendance_rollups(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0005_attendance_rollups'),
+        ('schedule', '0002_initial'),
+        ('schools', '0004_academicyear_terms'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='attendance',
+            name='attendance_student_5b1d70_idx',
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='course',
+            field=models.ForeignKey(help_text='Курс урока', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='schedule.course'),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='date',
+            field=models.DateField(help_text='Дата урока', null=True),
+        ),
+        migrations.AddField(
+            model_name='attendance',
+            name='school',
+            field=models.ForeignKey(help_text='Школа курса урока', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='attendance_records', to='schools.school'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['student', 'date'], name='attendance_student_0943ef_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['course', 'date'], name='attendance_course__f6a2dd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='attendance',
+            index=models.Index(fields=['school', 'date', 'status'], name='attendance_school__aad956_idx'),
+        ),
+        migrations.RunPython(backfill_lesson_fields, migrations.RunPython.noop),
+    ]
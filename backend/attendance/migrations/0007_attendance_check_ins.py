@@ -0,0 +1,31 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0006_attendance_lesson_fields'),
+        ('schedule', '0002_initial'),
+        ('students', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceCheckIn',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('checked_in_at', models.DateTimeField(default=django.utils.timezone.now, help_text='Время отметки учеником')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_ins', to='schedule.lesson')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='check_ins', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Attendance check-in',
+                'verbose_name_plural': 'Attendance check-ins',
+                'db_table': 'attendance_check_ins',
+            },
+        ),
+    ]
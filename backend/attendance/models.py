@@ -1,5 +1,6 @@
 import uuid
 from django.db import models
+from django.utils import timezone
 
 
 class AttendanceStatus(models.TextChoices):
@@ -22,6 +23,23 @@ class Attendance(models.Model):
         null=True,
         related_name='attendance_records'
     )
+    # Copied from the lesson (see save() and attendance.services.sync_lesson_attendance)
+    # so date-bounded queries need no join with lessons.
+    date = models.DateField(null=True, help_text="Дата урока")
+    course = models.ForeignKey(
+        'schedule.Course',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='attendance_records',
+        help_text="Курс урока"
+    )
+    school = models.ForeignKey(
+        'schools.School',
+        on_delete=models.CASCADE,
+        null=True,
+        related_name='attendance_records',
+        help_text="Школа курса урока"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -32,10 +50,94 @@ class Attendance(models.Model):
         unique_together = [['lesson', 'student']]
         indexes = [
             models.Index(fields=['lesson', 'student']),
-            models.Index(fields=['student']),
+            models.Index(fields=['student', 'date']),
+            models.Index(fields=['course', 'date']),
+            models.Index(fields=['school', 'date', 'status']),
             models.Index(fields=['status']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.get_status_display()} - {self.lesson.date}"
+    
+    def save(self, *args, **kwargs):
+        if self.lesson_id:
+            from schedule.models import Lesson
+            self.date, self.course_id, self.school_id = Lesson.objects.filter(pk=self.lesson_id).values_list(
+                'date', 'course_id', 'course__school_id'
+            ).get()
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row counts as in the attendance rollups, so a later
+        # save/delete can subtract it (see attendance.aggregates).
+        if {'student_id', 'course_id', 'date', 'status'}.issubset(field_names):
+            from .aggregates import attendance_entry
+            instance._rollup_entry = attendance_entry(instance)
+        return instance
+
+
+class ClassGroupDailyAttendance(models.Model):
+    """Attendance rollup per (class group, lesson date), maintained incrementally (attendance.aggregates)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    class_group = models.ForeignKey(
+        'students.ClassGroup',
+        on_delete=models.CASCADE,
+        related_name='daily_attendance',
+        help_text="Класс курса урока"
+    )
+    date = models.DateField()
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    tardy = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'attendance_daily_class_group'
+        verbose_name = 'Class group daily attendance'
+        verbose_name_plural = 'Class group daily attendance'
+        unique_together = [['class_group', 'date']]
+        indexes = [
+            models.Index(fields=['date']),
+        ]
+
+
+class StudentMonthlyAttendance(models.Model):
+    """Attendance rollup per (student, month), maintained incrementally (attendance.aggregates)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='monthly_attendance')
+    period = models.CharField(max_length=7, help_text="Месяц в формате YYYY-MM")
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    tardy = models.IntegerField(default=0)
+    excused = models.IntegerField(default=0)
+    total = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'attendance_monthly_student'
+        verbose_name = 'Student monthly attendance'
+        verbose_name_plural = 'Student monthly attendance'
+        unique_together = [['student', 'period']]
 
+
+class AttendanceCheckIn(models.Model):
+    """
+    Buffered student self check-in. Rows are only appended here (no unique
+    constraint, no locks) and moved into Attendance in batches by
+    attendance.services.flush_check_ins.
+    """
+    # Sequential key: the flusher consumes the buffer in insertion order
+    id = models.BigAutoField(primary_key=True)
+    lesson = models.ForeignKey('schedule.Lesson', on_delete=models.CASCADE, related_name='check_ins')
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='check_ins')
+    checked_in_at = models.DateTimeField(default=timezone.now, help_text="Время отметки учеником")
+    
+    class Meta:
+        db_table = 'attendance_check_ins'
+        verbose_name = 'Attendance check-in'
+        verbose_name_plural = 'Attendance check-ins'
@@ -0,0 +1,88 @@
+"""
+Lesson roster for attendance taking: the class group's students with their
+current mark for the lesson, in two queries (lesson, roster LEFT JOIN marks).
+
+While a lesson's attendance is open its roster is cached; any mark written
+for the lesson, a Lesson edit, or a Student change in the school drops it
+(attendance.signals and the bulk writers in attendance.services).
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import FilteredRelation, Q
+from schedule.models import Lesson
+from students.models import Student
+
+
+def lesson_roster_cache_key(lesson_id):
+    return f'attendance:roster:{lesson_id}'
+
+
+def invalidate_lesson_rosters(lesson_ids):
+    """Drop the cached rosters of these lessons."""
+    cache.delete_many([lesson_roster_cache_key(lesson_id) for lesson_id in lesson_ids])
+
+
+def invalidate_school_rosters(school_id):
+    """Drop the cached rosters of the school's open lessons (after a roster change)."""
+    invalidate_lesson_rosters(
+        Lesson.objects.filter(course__school_id=school_id, attendance_open_flag=True).values_list('id', flat=True)
+    )
+
+
+def build_lesson_roster(lesson_id):
+    """Roster payload of a lesson, or None if it does not exist."""
+    lesson = (
+        Lesson.objects.filter(id=lesson_id)
+        .values(
+            'id', 'date', 'start_time', 'end_time', 'attendance_open_flag',
+            'course_id', 'course__name', 'course__class_group_id', 'course__class_group__name',
+        )
+        .first()
+    )
+    if lesson is None:
+        return None
+    students = (
+        Student.objects.filter(class_group_id=lesson['course__class_group_id'])
+        .annotate(mark=FilteredRelation('attendance_records', condition=Q(attendance_records__lesson_id=lesson_id)))
+        .values_list(
+            'id', 'student_number', 'user__first_name', 'user__middle_name', 'user__last_name',
+            'mark__id', 'mark__status', 'mark__reason',
+        )
+        .order_by('user__last_name', 'user__first_name')
+    )
+    return {
+        'lesson': {
+            'id': lesson['id'],
+            'date': lesson['date'],
+            'start_time': lesson['start_time'],
+            'end_time': lesson['end_time'],
+            'attendance_open': lesson['attendance_open_flag'],
+            'course': lesson['course_id'],
+            'course_name': lesson['course__name'],
+            'class_group': lesson['course__class_group_id'],
+            'class_group_name': lesson['course__class_group__name'],
+        },
+        'students': [
+            {
+                'id': student_id,
+                'student_number': student_number,
+                'name': ' '.join(filter(None, [first_name, middle_name, last_name])),
+                'attendance_id': attendance_id,
+                'status': mark_status,
+                'reason': reason or '',
+            }
+            for student_id, student_number, first_name, middle_name, last_name,
+            attendance_id, mark_status, reason in students
+        ],
+    }
+
+
+def get_lesson_roster(lesson_id):
+    """Roster payload of a lesson (see build_lesson_roster), cached while attendance is open."""
+    key = lesson_roster_cache_key(lesson_id)
+    roster = cache.get(key)
+    if roster is None:
+        roster = build_lesson_roster(lesson_id)
+        if roster is not None and roster['lesson']['attendance_open']:
+            cache.set(key, roster, settings.LESSON_ROSTER_CACHE_TIMEOUT)
+    return roster
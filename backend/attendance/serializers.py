@@ -1,13 +1,13 @@
 from rest_framework import serializers
-from .models import Attendance
+from .models import Attendance, AttendanceStatus
 from students.serializers import StudentSerializer
 
 
 class AttendanceSerializer(serializers.ModelSerializer):
     """Attendance serializer."""
     student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
-    lesson_date = serializers.DateField(source='lesson.date', read_only=True)
-    lesson_course = serializers.CharField(source='lesson.course.name', read_only=True)
+    lesson_date = serializers.DateField(source='date', read_only=True)
+    lesson_course = serializers.CharField(source='course.name', read_only=True, allow_null=True)
     recorded_by_name = serializers.CharField(source='recorded_by.get_full_name', read_only=True, allow_null=True)
     
     class Meta:
@@ -19,3 +19,37 @@ class AttendanceSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+
+
+class AttendanceMarkRecordSerializer(serializers.Serializer):
+    """One student's mark in a bulk attendance request."""
+    student_id = serializers.UUIDField()
+    status = serializers.ChoiceField(choices=AttendanceStatus.choices)
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+
+class AttendanceMarkSerializer(serializers.Serializer):
+    """Body for bulk marking: a lesson and its students' marks."""
+    lesson_id = serializers.UUIDField()
+    records = AttendanceMarkRecordSerializer(many=True, allow_empty=False)
+
+
+class AttendanceCheckInSerializer(serializers.Serializer):
+    """Body for a student's self check-in (the lesson id from the scanned code)."""
+    lesson_id = serializers.UUIDField()
+
+
+class AttendanceExcuseSerializer(serializers.Serializer):
+    """Body for excusing a student or a class group over a date range."""
+    student_id = serializers.UUIDField(required=False)
+    class_group_id = serializers.UUIDField(required=False)
+    date_from = serializers.DateField()
+    date_to = serializers.DateField()
+    reason = serializers.CharField()
+    
+    def validate(self, data):
+        if bool(data.get('student_id')) == bool(data.get('class_group_id')):
+            raise serializers.ValidationError('Provide either student_id or class_group_id.')
+        if data['date_from'] > data['date_to']:
+            raise serializers.ValidationError({'date_to': 'Must not be before date_from.'})
+        return data
@@ -0,0 +1,356 @@
+"""
+Attendance services: bulk marking of a lesson, excusing a date range,
+flushing of buffered self check-ins and grouped attendance statistics (from the attendance table or
+from the rollups).
+"""
+import uuid
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import OuterRef, Subquery, Sum
+from django.db.models.functions import TruncWeek
+from django.utils import timezone
+from schedule.models import Course, Lesson
+from students.models import Student
+from .aggregates import COUNT_FIELDS, apply_attendance_changes, attendance_entry, status_counts
+from .models import Attendance, AttendanceCheckIn, AttendanceStatus
+from .roster import invalidate_lesson_rosters
+
+
+def mark_attendance(lesson, records, user):
+    """
+    Validate attendance marks against the lesson roster and upsert them.
+
+    The roster (students of the course class group) and the marks that
+    already exist are read in one query; the marks are then written with a
+    single INSERT ... ON CONFLICT (lesson, student) DO UPDATE in a
+    transaction, together with the rollup deltas (bulk writes send no
+    signals). Nothing is written if any record is invalid.
+
+    Args:
+        lesson: Lesson instance (with course)
+        records: validated record dicts (AttendanceMarkRecordSerializer)
+        user: User recording the marks
+
+    Returns:
+        (errors, created, updated): errors maps record index to messages
+        (empty on success); created/updated are lists of attendance ids.
+    """
+    # student id -> (id, status) of the student's existing mark (None, None if unmarked)
+    existing = Attendance.objects.filter(lesson=lesson, student_id=OuterRef('pk'))
+    roster = {
+        str(pk): (attendance_id, old_status) for pk, attendance_id, old_status in
+        Student.objects.filter(class_group_id=lesson.course.class_group_id).annotate(
+            attendance_id=Subquery(existing.values('id')[:1]),
+            attendance_status=Subquery(existing.values('status')[:1]),
+        ).values_list('id', 'attendance_id', 'attendance_status')
+    }
+
+    errors = {}
+    seen = set()
+    for index, record in enumerate(records):
+        student_id = str(record['student_id'])
+        if student_id not in roster:
+            errors[index] = {'student_id': 'Student is not in the lesson class group.'}
+        elif student_id in seen:
+            errors[index] = {'student_id': 'Student is marked twice.'}
+        seen.add(student_id)
+    if errors:
+        return errors, [], []
+
+    now = timezone.now()
+    marks = [
+        Attendance(
+            id=roster[str(record['student_id'])][0] or uuid.uuid4(),
+            lesson=lesson,
+            date=lesson.date,
+            course_id=lesson.course_id,
+            school_id=lesson.course.school_id,
+            student_id=record['student_id'],
+            status=record['status'],
+            reason=record.get('reason', ''),
+            recorded_by=user,
+            updated_at=now,
+        )
+        for record in records
+    ]
+    removed = [
+        (str(mark.student_id), str(lesson.course_id), str(lesson.date), roster[str(mark.student_id)][1])
+        for mark in marks if roster[str(mark.student_id)][0]
+    ]
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            marks,
+            update_conflicts=True,
+            unique_fields=['lesson', 'student'],
+            update_fields=['status', 'reason', 'recorded_by', 'date', 'course', 'school', 'updated_at'],
+        )
+        apply_attendance_changes(removed, [attendance_entry(mark) for mark in marks])
+    invalidate_lesson_rosters([lesson.id])
+
+    created = [mark.id for mark in marks if not roster[str(mark.student_id)][0]]
+    updated = [mark.id for mark in marks if roster[str(mark.student_id)][0]]
+    return {}, created, updated
+
+
+def excuse_absences(date_from, date_to, reason, user, student_id=None, class_group_id=None):
+    """
+    Mark a student (or a whole class group) excused for every lesson of their
+    class group between date_from and date_to inclusive.
+
+    The affected (lesson, student) pairs and their existing marks are read in
+    one query over the lessons' (course, date) index, then written with one
+    INSERT ... ON CONFLICT (lesson, student) DO UPDATE in a transaction with
+    the rollup deltas. Students marked present or tardy for a lesson attended
+    it, so those marks are kept.
+
+    Returns:
+        dict with the number of lessons, created, updated and skipped marks.
+    """
+    students = Student.objects.filter(**(
+        {'id': student_id} if student_id else {'class_group_id': class_group_id}
+    ))
+    lesson_path = 'class_group__courses__lessons'
+    existing = Attendance.objects.filter(lesson_id=OuterRef(f'{lesson_path}__id'), student_id=OuterRef('pk'))
+    pairs = list(
+        students.filter(**{f'{lesson_path}__date__range': [date_from, date_to]})
+        .annotate(
+            attendance_id=Subquery(existing.values('id')[:1]),
+            attendance_status=Subquery(existing.values('status')[:1]),
+        )
+        .values_list(
+            'id', f'{lesson_path}__id', f'{lesson_path}__date', 'class_group__courses__id',
+            'class_group__courses__school_id', 'attendance_id', 'attendance_status',
+        )
+    )
+
+    attended = {AttendanceStatus.PRESENT, AttendanceStatus.TARDY}
+    now = timezone.now()
+    marks, removed = [], []
+    created = updated = skipped = 0
+    for pk, lesson_id, lesson_date, course_id, school_id, attendance_id, old_status in pairs:
+        if old_status in attended:
+            skipped += 1
+            continue
+        if attendance_id:
+            removed.append((str(pk), str(course_id), str(lesson_date), old_status))
+            updated += 1
+        else:
+            created += 1
+        marks.append(Attendance(
+            id=attendance_id or uuid.uuid4(),
+            lesson_id=lesson_id,
+            student_id=pk,
+            date=lesson_date,
+            course_id=course_id,
+            school_id=school_id,
+            status=AttendanceStatus.EXCUSED,
+            reason=reason,
+            recorded_by=user,
+            updated_at=now,
+        ))
+    with transaction.atomic():
+        Attendance.objects.bulk_create(
+            marks,
+            update_conflicts=True,
+            unique_fields=['lesson', 'student'],
+            update_fields=['status', 'reason', 'recorded_by', 'date', 'course', 'school', 'updated_at'],
+        )
+        apply_attendance_changes(removed, [attendance_entry(mark) for mark in marks])
+    invalidate_lesson_rosters({mark.lesson_id for mark in marks})
+
+    return {
+        'lessons': len({lesson_id for _, lesson_id, *_ in pairs}),
+        'created': created,
+        'updated': updated,
+        'skipped': skipped,
+    }
+
+
+def flush_check_ins(batch_size=1000):
+    """
+    Move one batch of buffered self check-ins (AttendanceCheckIn) into Attendance.
+
+    The batch is claimed with SELECT ... FOR UPDATE OF the check-in rows
+    SKIP LOCKED, so several flushers can run side by side (the students
+    joined for their user ids are not locked). Check-ins are coalesced per (lesson,
+    student), keeping the earliest; students that already have a mark for
+    the lesson keep it. New marks are present, or tardy if the check-in came
+    ATTENDANCE_CHECK_IN_TARDY_MINUTES after the lesson start, and are
+    written with one INSERT ... ON CONFLICT DO NOTHING.
+
+    Returns:
+        (consumed, created): check-ins removed from the buffer, marks created.
+    """
+    with transaction.atomic():
+        batch = list(
+            AttendanceCheckIn.objects.select_for_update(skip_locked=True, of=('self',))
+            .order_by('id')
+            .values_list('id', 'lesson_id', 'student_id', 'student__user_id', 'checked_in_at')[:batch_size]
+        )
+        if not batch:
+            return 0, 0
+        first = {}
+        for _, lesson_id, student_id, user_id, checked_in_at in batch:
+            first.setdefault((lesson_id, student_id), (user_id, checked_in_at))
+        lesson_ids = {lesson_id for lesson_id, _ in first}
+        lessons = {
+            pk: row for pk, *row in Lesson.objects.filter(id__in=lesson_ids).values_list(
+                'id', 'date', 'start_time', 'course_id', 'course__school_id'
+            )
+        }
+        marked = set(
+            Attendance.objects.filter(
+                lesson_id__in=lesson_ids, student_id__in={student_id for _, student_id in first}
+            ).values_list('lesson_id', 'student_id')
+        )
+
+        late = timedelta(minutes=settings.ATTENDANCE_CHECK_IN_TARDY_MINUTES)
+        now = timezone.now()
+        marks = []
+        for (lesson_id, student_id), (user_id, checked_in_at) in first.items():
+            if (lesson_id, student_id) in marked or lesson_id not in lessons:
+                continue
+            lesson_date, start_time, course_id, school_id = lessons[lesson_id]
+            starts_at = timezone.make_aware(datetime.combine(lesson_date, start_time))
+            marks.append(Attendance(
+                lesson_id=lesson_id,
+                student_id=student_id,
+                date=lesson_date,
+                course_id=course_id,
+                school_id=school_id,
+                status=AttendanceStatus.TARDY if checked_in_at > starts_at + late else AttendanceStatus.PRESENT,
+                recorded_by_id=user_id,
+                updated_at=now,
+            ))
+        Attendance.objects.bulk_create(marks, ignore_conflicts=True)
+        # A teacher may have marked a student meanwhile: count only the rows inserted here
+        inserted = set(Attendance.objects.filter(id__in=[mark.id for mark in marks]).values_list('id', flat=True))
+        created = [mark for mark in marks if mark.id in inserted]
+        apply_attendance_changes((), [attendance_entry(mark) for mark in created])
+        AttendanceCheckIn.objects.filter(id__in=[row[0] for row in batch]).delete()
+    invalidate_lesson_rosters({mark.lesson_id for mark in created})
+    return len(batch), len(created)
+
+
+def sync_lesson_attendance(lesson):
+    """
+    Copy a lesson's date, course and school onto its marks after the lesson changed,
+    moving their counts in the rollups accordingly. Returns the number of marks moved.
+    """
+    stale = Attendance.objects.filter(lesson=lesson).exclude(date=lesson.date, course_id=lesson.course_id)
+    removed = [
+        (str(student_id), str(course_id), str(mark_date) if mark_date else None, mark_status)
+        for student_id, course_id, mark_date, mark_status in
+        stale.values_list('student_id', 'course_id', 'date', 'status')
+    ]
+    if not removed:
+        return 0
+    school_id = Course.objects.filter(pk=lesson.course_id).values_list('school_id', flat=True).get()
+    with transaction.atomic():
+        Attendance.objects.filter(lesson=lesson).update(
+            date=lesson.date, course_id=lesson.course_id, school_id=school_id, updated_at=timezone.now()
+        )
+        apply_attendance_changes(removed, [
+            (student_id, str(lesson.course_id), str(lesson.date), mark_status)
+            for student_id, _, _, mark_status in removed
+        ])
+    return len(removed)
+
+
+def backfill_attendance_lessons(batch_size=5000, apps=None):
+    """
+    Fill date, course and school of marks that lack them from their lessons,
+    one UPDATE per batch of primary keys. Yields the size of each batch.
+
+    `apps` is a migration's app registry, to run against its historical models.
+    """
+    attendance_model, lesson_model = (Attendance, Lesson) if apps is None else (
+        apps.get_model('attendance', 'Attendance'),
+        apps.get_model('schedule', 'Lesson'),
+    )
+    lessons = lesson_model.objects.filter(pk=OuterRef('lesson_id'))
+    last_id = None
+    while True:
+        batch = attendance_model.objects.filter(date__isnull=True).order_by('id')
+        if last_id is not None:
+            batch = batch.filter(id__gt=last_id)
+        ids = list(batch.values_list('id', flat=True)[:batch_size])
+        if not ids:
+            return
+        attendance_model.objects.filter(id__in=ids).update(
+            date=Subquery(lessons.values('date')[:1]),
+            course_id=Subquery(lessons.values('course_id')[:1]),
+            school_id=Subquery(lessons.values('course__school_id')[:1]),
+        )
+        last_id = ids[-1]
+        yield len(ids)
+
+
+STATISTICS_GROUPS = {
+    'student': {'student': 'student_id'},
+    'class_group': {'class_group': 'course__class_group_id', 'class_group_name': 'course__class_group__name'},
+    'course': {'course': 'course_id', 'course_name': 'course__name'},
+    'week': {'week': 'week'},
+}
+
+
+# Groups that ClassGroupDailyAttendance can answer
+ROLLUP_STATISTICS_GROUPS = {
+    'class_group': {'class_group': 'class_group_id', 'class_group_name': 'class_group__name'},
+    'week': {'week': 'week'},
+}
+
+
+def _rate(row):
+    return round(row['present'] / row['total'] * 100, 2) if row['total'] else 0
+
+
+def _statistics(queryset, counts, groups, group_by, week_of):
+    if not group_by:
+        row = queryset.aggregate(**counts)
+        row = {field: row[field] or 0 for field in counts}
+        return {**row, 'attendance_rate': _rate(row)}
+
+    columns = {}
+    for name in group_by:
+        columns.update(groups[name])
+    if 'week' in group_by:
+        queryset = queryset.annotate(week=TruncWeek(week_of))
+    keys = list(columns.values())
+    rows = queryset.values(*keys).annotate(**counts).order_by(*keys)
+    return [
+        {
+            **{name: row[column] for name, column in columns.items()},
+            **{name: row[name] for name in counts},
+            'attendance_rate': _rate(row),
+        }
+        for row in rows
+    ]
+
+
+def attendance_statistics(queryset, group_by=()):
+    """
+    Attendance counts per status in one (grouped) query of conditional aggregates.
+
+    Args:
+        queryset: Attendance queryset (already filtered and scoped to the user)
+        group_by: keys of STATISTICS_GROUPS; week groups by the Monday of the lesson week
+
+    Returns:
+        list of dicts: group keys plus total, one count per AttendanceStatus and
+        attendance_rate (percent present); a single dict when group_by is empty
+    """
+    return _statistics(queryset, status_counts(), STATISTICS_GROUPS, group_by, 'date')
+
+
+def rollup_statistics(queryset, group_by=()):
+    """
+    Same payload as attendance_statistics, summed from rollup rows.
+
+    Args:
+        queryset: ClassGroupDailyAttendance (group_by: keys of ROLLUP_STATISTICS_GROUPS)
+            or StudentMonthlyAttendance (no group_by) queryset
+    """
+    counts = {field: Sum(field) for field in COUNT_FIELDS}
+    return _statistics(queryset, counts, ROLLUP_STATISTICS_GROUPS, group_by, 'date')
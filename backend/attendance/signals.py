@@ -0,0 +1,43 @@
+"""
+Keep the attendance rollups in step with single Attendance saves and deletes,
+the lesson fields copied onto Attendance in step with Lesson edits, and
+cached lesson rosters fresh.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from schedule.models import Lesson
+from students.models import Student
+from .aggregates import attendance_saved, attendance_deleted
+from .models import Attendance
+from .roster import invalidate_lesson_rosters, invalidate_school_rosters
+from .services import sync_lesson_attendance
+
+
+@receiver(post_save, sender=Attendance)
+def attendance_record_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    attendance_saved([instance])
+    invalidate_lesson_rosters([instance.lesson_id])
+
+
+@receiver(post_delete, sender=Attendance)
+def attendance_record_deleted(sender, instance, **kwargs):
+    attendance_deleted([instance])
+    invalidate_lesson_rosters([instance.lesson_id])
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, created=False, raw=False, **kwargs):
+    if raw or created:
+        return
+    sync_lesson_attendance(instance)
+    invalidate_lesson_rosters([instance.pk])
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    invalidate_school_rosters(instance.school_id)
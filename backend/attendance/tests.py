@@ -0,0 +1,433 @@
+from django.test import TestCase
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from schools.models import School, AcademicYear
+from students.models import Student, ClassGroup
+from staff.models import Staff, Subject, Position
+from schedule.models import Course, Lesson
+from users.models import UserRole, Role
+from .aggregates import rebuild_attendance_rollups
+from .models import Attendance, AttendanceCheckIn, AttendanceStatus, ClassGroupDailyAttendance, StudentMonthlyAttendance
+from .services import backfill_attendance_lessons, excuse_absences, flush_check_ins, sync_lesson_attendance
+from datetime import date, datetime, timedelta
+from importlib import import_module
+from io import StringIO
+
+User = get_user_model()
+
+
+class AttendanceTestCase(TestCase):
+    """A class group of three students with one course and a lesson on 2024-10-01."""
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.academic_year = AcademicYear.objects.create(
+            school=self.school,
+            name='2024-2025',
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 5, 31)
+        )
+        self.teacher_user = User.objects.create_user(email='teacher@test.com', password='test123')
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        self.teacher = Staff.objects.create(
+            user=self.teacher_user,
+            school=self.school,
+            position=Position.TEACHER,
+            employment_date=date(2020, 9, 1)
+        )
+        self.class_group = ClassGroup.objects.create(
+            school=self.school,
+            name='10A',
+            grade_level=10,
+            academic_year=self.academic_year
+        )
+        self.course = Course.objects.create(
+            school=self.school,
+            name='Math Course',
+            subject=Subject.objects.create(school=self.school, name='Mathematics', code='MATH'),
+            teacher=self.teacher,
+            class_group=self.class_group,
+            academic_year=self.academic_year
+        )
+        self.lesson = self.add_lesson(date(2024, 10, 1))
+        self.students = [self.add_student(index) for index in range(3)]
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher_user)
+
+    def add_lesson(self, day, start_time='09:00', end_time='09:45'):
+        return Lesson.objects.create(
+            course=self.course, date=day, start_time=start_time, end_time=end_time, teacher=self.teacher
+        )
+
+    def add_student(self, index):
+        user = User.objects.create_user(
+            email=f'student{index}@test.com', password='test123', first_name=f'Student{index}'
+        )
+        UserRole.objects.create(user=user, school=self.school, role=Role.STUDENT)
+        return Student.objects.create(
+            user=user,
+            school=self.school,
+            class_group=self.class_group,
+            student_number=f'STU{index:03}',
+            enrollment_date=date(2024, 9, 1)
+        )
+
+
+class AttendanceListPlanningTest(AttendanceTestCase):
+    def test_list_query_count_independent_of_page_size(self):
+        Attendance.objects.create(lesson=self.lesson, student=self.students[0], recorded_by=self.teacher_user)
+        self.client.get('/api/attendance/')  # caches the user's roles
+        with self.assertNumQueries(2):  # COUNT, then the page with its joins
+            response = self.client.get('/api/attendance/')
+        self.assertEqual(response.json()['results'][0]['lesson_course'], self.course.name)
+        
+        for day in range(2, 6):
+            lesson = self.add_lesson(date(2024, 10, day))
+            for student in self.students:
+                Attendance.objects.create(
+                    lesson=lesson, student=student, status=AttendanceStatus.ABSENT, recorded_by=self.teacher_user
+                )
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/attendance/')
+        self.assertEqual(len(response.json()['results']), 13)
+        with self.assertNumQueries(1):  # keyset pages have no COUNT
+            response = self.client.get('/api/attendance/', {'pagination': 'cursor', 'page_size': 5})
+        rows = response.json()['results']
+        self.assertEqual(len(rows), 5)
+        self.assertEqual({row['lesson_date'] for row in rows} - {'2024-10-05', '2024-10-04'}, set())
+
+
+class MarkAttendanceTest(AttendanceTestCase):
+    url = '/api/attendance/mark/'
+
+    def mark(self, records):
+        return self.client.post(self.url, {
+            'lesson_id': str(self.lesson.id),
+            'records': [{'student_id': str(student.id), 'status': status} for student, status in records],
+        }, format='json')
+
+    def test_upsert_reports_created_and_updated(self):
+        response = self.mark([(self.students[0], AttendanceStatus.PRESENT), (self.students[1], AttendanceStatus.ABSENT)])
+        self.assertEqual(response.status_code, 200)
+        first = response.json()
+        self.assertEqual(len(first['created']), 2)
+        self.assertEqual(first['updated'], [])
+        
+        # Lesson, roster with marks, one upsert and the rollup writes: none of it per record
+        with self.assertNumQueries(12):
+            response = self.mark([(self.students[1], AttendanceStatus.TARDY), (self.students[2], AttendanceStatus.ABSENT)])
+        data = response.json()
+        mark = Attendance.objects.get(lesson=self.lesson, student=self.students[1])
+        self.assertEqual(data['updated'], [str(mark.id)])
+        self.assertIn(str(mark.id), first['created'])  # the upsert kept the row
+        self.assertEqual(len(data['created']), 1)
+        self.assertEqual(mark.status, AttendanceStatus.TARDY)
+        self.assertEqual((mark.date, mark.course_id, mark.school_id), (self.lesson.date, self.course.id, self.school.id))
+        self.assertEqual(Attendance.objects.count(), 3)
+
+    def test_invalid_records_write_nothing(self):
+        outsider = self.add_student(9)
+        outsider.class_group = None
+        outsider.save()
+        response = self.mark([
+            (self.students[0], AttendanceStatus.PRESENT),
+            (outsider, AttendanceStatus.PRESENT),
+            (self.students[0], AttendanceStatus.ABSENT),
+        ])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(set(response.json()['records']), {'1', '2'})
+        self.assertFalse(Attendance.objects.exists())
+        
+        response = self.client.post(self.url, {
+            'lesson_id': str(self.course.id),
+            'records': [{'student_id': str(self.students[0].id), 'status': AttendanceStatus.PRESENT}],
+        }, format='json')
+        self.assertEqual(response.json(), {'lesson_id': ['Lesson not found.']})
+
+
+class AttendanceStatisticsTest(AttendanceTestCase):
+    url = '/api/attendance/statistics/'
+
+    def setUp(self):
+        super().setUp()
+        second = self.add_lesson(date(2024, 10, 8))
+        for lesson, statuses in ((self.lesson, ['present', 'absent', 'tardy']), (second, ['present', 'present', 'excused'])):
+            for student, status in zip(self.students, statuses):
+                Attendance.objects.create(lesson=lesson, student=student, status=status)
+
+    def statistics(self, **params):
+        response = self.client.get(self.url, {'date_from': '2024-10-01', 'date_to': '2024-10-31', **params})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_totals_and_rate(self):
+        data = self.statistics(class_group_id=str(self.class_group.id))
+        self.assertEqual(
+            {key: data[key] for key in ('present', 'absent', 'tardy', 'excused', 'total')},
+            {'present': 3, 'absent': 1, 'tardy': 1, 'excused': 1, 'total': 6}
+        )
+        self.assertEqual(data['attendance_rate'], 50.0)
+        # The same numbers from raw attendance (a course filter bypasses the rollups)
+        raw = self.statistics(course_id=str(self.course.id))
+        self.assertEqual(raw, data)
+
+    def test_group_by(self):
+        data = self.statistics(group_by='student')
+        rows = {row['student']: row for row in data['groups']}
+        self.assertEqual(rows[str(self.students[0].id)]['attendance_rate'], 100.0)
+        self.assertEqual(rows[str(self.students[2].id)]['excused'], 1)
+        
+        weeks = self.statistics(group_by='class_group,week')['groups']
+        self.assertEqual([row['total'] for row in weeks], [3, 3])
+        self.assertEqual(weeks[0]['class_group_name'], '10A')
+        self.assertEqual(
+            weeks, self.statistics(group_by='class_group,week', course_id=str(self.course.id))['groups']
+        )
+        
+        response = self.client.get(self.url, {'group_by': 'student,lesson'})
+        self.assertEqual(response.status_code, 400)
+
+
+class AttendanceRollupTest(AttendanceTestCase):
+    def snapshot(self):
+        return (
+            sorted(
+                (str(row.class_group_id), str(row.date), row.present, row.absent, row.tardy, row.excused, row.total)
+                for row in ClassGroupDailyAttendance.objects.filter(total__gt=0)
+            ),
+            sorted(
+                (str(row.student_id), row.period, row.present, row.absent, row.tardy, row.excused, row.total)
+                for row in StudentMonthlyAttendance.objects.filter(total__gt=0)
+            ),
+        )
+
+    def test_rollups_match_rebuild(self):
+        november = self.add_lesson(date(2024, 11, 4))
+        first = Attendance.objects.create(lesson=self.lesson, student=self.students[0])
+        Attendance.objects.create(lesson=self.lesson, student=self.students[1], status=AttendanceStatus.ABSENT)
+        removed = Attendance.objects.create(lesson=november, student=self.students[2], status=AttendanceStatus.TARDY)
+        
+        first = Attendance.objects.get(pk=first.pk)
+        first.status = AttendanceStatus.ABSENT
+        first.save()
+        removed.delete()
+        self.client.post('/api/attendance/mark/', {
+            'lesson_id': str(november.id),
+            'records': [
+                {'student_id': str(self.students[0].id), 'status': AttendanceStatus.PRESENT},
+                {'student_id': str(self.students[1].id), 'status': AttendanceStatus.ABSENT},
+            ],
+        }, format='json')
+        excuse_absences(date(2024, 10, 1), date(2024, 11, 30), 'Sick', self.teacher_user, student_id=self.students[1].id)
+        
+        incremental = self.snapshot()
+        self.assertEqual(incremental[0], [
+            (str(self.class_group.id), '2024-10-01', 0, 1, 0, 1, 2),
+            (str(self.class_group.id), '2024-11-04', 1, 0, 0, 1, 2),
+        ])
+        rebuild_attendance_rollups()
+        self.assertEqual(self.snapshot(), incremental)
+
+    def test_api_writes_lock_the_mark(self):
+        mark = Attendance.objects.create(lesson=self.lesson, student=self.students[0])
+        for method, payload in (('patch', {'status': AttendanceStatus.ABSENT}), ('delete', None)):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(f'/api/attendance/{mark.id}/', payload, format='json')
+            self.assertLess(response.status_code, 300, method)
+            self.assertTrue(
+                any(query['sql'].startswith('SELECT') and 'FOR UPDATE' in query['sql'] and '"attendance"' in query['sql']
+                    for query in queries),
+                method,
+            )
+        self.assertEqual(self.snapshot(), ([], []))
+
+
+class LessonFieldsTest(AttendanceTestCase):
+    def test_lesson_fields_follow_the_lesson(self):
+        mark = Attendance.objects.create(lesson=self.lesson, student=self.students[0])
+        self.assertEqual((mark.date, mark.course_id, mark.school_id), (self.lesson.date, self.course.id, self.school.id))
+        
+        # Moving the lesson to another class group's course and date moves the mark and its counts
+        other_group = ClassGroup.objects.create(
+            school=self.school, name='10B', grade_level=10, academic_year=self.academic_year
+        )
+        other_course = Course.objects.create(
+            school=self.school, name='Physics Course', subject=self.course.subject, teacher=self.teacher,
+            class_group=other_group, academic_year=self.academic_year
+        )
+        self.lesson.date = date(2024, 11, 5)
+        self.lesson.course = other_course
+        self.lesson.save()
+        mark.refresh_from_db()
+        self.assertEqual((mark.date, mark.course_id), (date(2024, 11, 5), other_course.id))
+        self.assertEqual(ClassGroupDailyAttendance.objects.get(class_group=self.class_group).total, 0)
+        self.assertEqual(ClassGroupDailyAttendance.objects.get(class_group=other_group, date=date(2024, 11, 5)).total, 1)
+        self.assertEqual(
+            dict(StudentMonthlyAttendance.objects.values_list('period', 'total')), {'2024-10': 0, '2024-11': 1}
+        )
+        # Saving the lesson again moves nothing
+        self.assertEqual(sync_lesson_attendance(self.lesson), 0)
+
+    def test_backfill(self):
+        second = self.add_lesson(date(2024, 10, 2))
+        for lesson in (self.lesson, second):
+            for student in self.students:
+                Attendance.objects.create(lesson=lesson, student=student)
+        Attendance.objects.update(date=None, course=None, school=None)
+        
+        self.assertEqual(list(backfill_attendance_lessons(batch_size=4)), [4, 2])
+        self.assertFalse(Attendance.objects.filter(date__isnull=True).exists())
+        self.assertEqual(
+            Attendance.objects.filter(lesson=second, date=second.date, course=self.course, school=self.school).count(), 3
+        )
+
+    def test_migration_backfills_and_rebuilds_rollups(self):
+        for student, mark_status in zip(self.students, (AttendanceStatus.PRESENT, AttendanceStatus.ABSENT)):
+            Attendance.objects.create(lesson=self.lesson, student=student, status=mark_status)
+        # Marks from before the columns existed, and rollup tables that were created empty
+        Attendance.objects.update(date=None, course=None, school=None)
+        ClassGroupDailyAttendance.objects.all().delete()
+        StudentMonthlyAttendance.objects.all().delete()
+
+        migration = import_module('attendance.migrations.0006_attendance_lesson_fields')
+        migration.backfill_lesson_fields(apps, None)
+        self.assertEqual(Attendance.objects.filter(date=self.lesson.date, school=self.school).count(), 2)
+        daily = ClassGroupDailyAttendance.objects.get(class_group=self.class_group, date=self.lesson.date)
+        self.assertEqual((daily.present, daily.absent, daily.total), (1, 1, 2))
+        self.assertEqual(StudentMonthlyAttendance.objects.filter(period='2024-10').count(), 2)
+
+
+class LessonRosterTest(AttendanceTestCase):
+    def roster(self, lesson=None):
+        response = self.client.get(f'/api/schedule/lessons/{(lesson or self.lesson).id}/roster/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def statuses(self):
+        return {row['id']: row['status'] for row in self.roster()['students']}
+
+    def test_open_roster_cached_and_invalidated(self):
+        self.lesson.attendance_open_flag = True
+        self.lesson.save()
+        self.roster()  # caches the roster (and the user's roles)
+        with self.assertNumQueries(0):
+            data = self.roster()
+        self.assertEqual(len(data['students']), 3)
+        self.assertTrue(data['lesson']['attendance_open'])
+        
+        # A single mark, a bulk mark and a roster change each drop the cached roster
+        Attendance.objects.create(lesson=self.lesson, student=self.students[0], status=AttendanceStatus.ABSENT)
+        self.assertEqual(self.statuses()[str(self.students[0].id)], AttendanceStatus.ABSENT)
+        self.client.post('/api/attendance/mark/', {
+            'lesson_id': str(self.lesson.id),
+            'records': [{'student_id': str(self.students[1].id), 'status': AttendanceStatus.TARDY}],
+        }, format='json')
+        self.assertEqual(self.statuses()[str(self.students[1].id)], AttendanceStatus.TARDY)
+        student = self.add_student(3)
+        self.assertIn(str(student.id), self.statuses())
+
+    def test_closed_roster_not_cached(self):
+        self.roster()
+        with self.assertNumQueries(2):  # lesson, roster with marks
+            data = self.roster()
+        self.assertEqual([row['status'] for row in data['students']], [None] * 3)
+        response = self.client.get(f'/api/schedule/lessons/{self.course.id}/roster/')
+        self.assertEqual(response.status_code, 404)
+
+
+class CheckInFlushTest(AttendanceTestCase):
+    def test_check_in_is_buffered(self):
+        student = self.students[0]
+        client = APIClient()
+        client.force_authenticate(student.user)
+        url = '/api/attendance/check-in/'
+        response = client.post(url, {'lesson_id': str(self.lesson.id)}, format='json')
+        self.assertEqual(response.status_code, 400)  # attendance is not open
+        self.lesson.attendance_open_flag = True
+        self.lesson.save()
+        response = client.post(url, {'lesson_id': str(self.lesson.id)}, format='json')
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(AttendanceCheckIn.objects.get().student_id, student.id)
+        self.assertFalse(Attendance.objects.exists())
+
+    def test_flush_coalesces_and_keeps_marks(self):
+        starts_at = timezone.make_aware(datetime(2024, 10, 1, 9, 0))
+        first, late, marked = self.students
+        Attendance.objects.create(lesson=self.lesson, student=marked, status=AttendanceStatus.EXCUSED)
+        for student, minutes in ((first, 2), (late, 15), (first, 30), (marked, 1)):
+            AttendanceCheckIn.objects.create(
+                lesson=self.lesson, student=student, checked_in_at=starts_at + timedelta(minutes=minutes)
+            )
+        
+        self.assertEqual(flush_check_ins(), (4, 2))
+        self.assertEqual(flush_check_ins(), (0, 0))
+        self.assertFalse(AttendanceCheckIn.objects.exists())
+        marks = dict(Attendance.objects.values_list('student_id', 'status'))
+        self.assertEqual(marks, {
+            first.id: AttendanceStatus.PRESENT,  # the earliest check-in counts
+            late.id: AttendanceStatus.TARDY,
+            marked.id: AttendanceStatus.EXCUSED,
+        })
+        self.assertEqual(Attendance.objects.get(student=late).recorded_by_id, late.user_id)
+        day = ClassGroupDailyAttendance.objects.get(class_group=self.class_group, date=self.lesson.date)
+        self.assertEqual((day.present, day.tardy, day.excused, day.total), (1, 1, 1, 3))
+        self.assertEqual(StudentMonthlyAttendance.objects.get(student=late, period='2024-10').tardy, 1)
+
+    def test_flush_in_batches(self):
+        for student in self.students:
+            AttendanceCheckIn.objects.create(lesson=self.lesson, student=student)
+        out = StringIO()
+        call_command('flush_attendance_check_ins', '--batch-size', '2', stdout=out)
+        self.assertIn('Flushed 3 check-ins into 3 attendance marks.', out.getvalue())
+        self.assertEqual(Attendance.objects.count(), 3)
+
+
+class ExcuseAbsencesTest(AttendanceTestCase):
+    url = '/api/attendance/excuse/'
+
+    def excuse(self, **target):
+        return self.client.post(self.url, {
+            'date_from': '2024-10-01', 'date_to': '2024-10-31', 'reason': 'Sick note', **target,
+        }, format='json')
+
+    def test_unknown_target(self):
+        response = self.excuse(student_id=str(self.course.id))
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'student_id': ['Student not found.']})
+        response = self.excuse(class_group_id=str(self.course.id))
+        self.assertEqual(response.json(), {'class_group_id': ['Class group not found.']})
+
+    def test_class_group_excused(self):
+        second = self.add_lesson(date(2024, 10, 2))
+        self.add_lesson(date(2024, 11, 1))  # outside the range
+        Attendance.objects.create(lesson=self.lesson, student=self.students[0], status=AttendanceStatus.PRESENT)
+        Attendance.objects.create(lesson=self.lesson, student=self.students[1], status=AttendanceStatus.TARDY)
+        Attendance.objects.create(lesson=second, student=self.students[2], status=AttendanceStatus.ABSENT)
+        
+        response = self.excuse(class_group_id=str(self.class_group.id))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        # 2 lessons x 3 students: present/tardy are kept, the absence is updated
+        self.assertEqual({key: data[key] for key in ('lessons', 'created', 'updated', 'skipped')},
+                         {'lessons': 2, 'created': 3, 'updated': 1, 'skipped': 2})
+        self.assertEqual(Attendance.objects.get(lesson=self.lesson, student=self.students[1]).status, AttendanceStatus.TARDY)
+        excused = Attendance.objects.filter(status=AttendanceStatus.EXCUSED)
+        self.assertEqual(excused.count(), 4)
+        self.assertEqual(set(excused.values_list('reason', flat=True)), {'Sick note'})
+        
+        day = ClassGroupDailyAttendance.objects.get(class_group=self.class_group, date=second.date)
+        self.assertEqual((day.absent, day.excused, day.total), (0, 3, 3))
+        month = StudentMonthlyAttendance.objects.get(student=self.students[0], period='2024-10')
+        self.assertEqual((month.present, month.excused, month.total), (1, 1, 2))
+        
+        # Again: everything is already excused or attended
+        data = self.excuse(student_id=str(self.students[2].id)).json()
+        self.assertEqual((data['created'], data['updated'], data['skipped']), (0, 2, 0))
+        self.assertEqual(ClassGroupDailyAttendance.objects.get(class_group=self.class_group, date=second.date).total, 3)
@@ -2,27 +2,61 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.db import transaction
 from django.db.models import Count, Q
 from datetime import date, timedelta
-from .models import Attendance
-from .serializers import AttendanceSerializer
+from .models import Attendance, AttendanceCheckIn, ClassGroupDailyAttendance, StudentMonthlyAttendance
+from .serializers import (
+    AttendanceSerializer,
+    AttendanceMarkSerializer,
+    AttendanceCheckInSerializer,
+    AttendanceExcuseSerializer,
+)
+from .services import (
+    mark_attendance,
+    excuse_absences,
+    attendance_statistics,
+    rollup_statistics,
+    ROLLUP_STATISTICS_GROUPS,
+    STATISTICS_GROUPS,
+)
+from schedule.models import Lesson
+from students.models import Student, ClassGroup
+from students.visibility import filter_visible, get_visible_student_ids
+from users.pagination import PageNumberOrKeysetPagination
+from users.query_planning import QueryPlanningMixin
 from users.permissions import IsTeacher, IsSchoolAdmin, IsSuperAdmin, IsParent, IsStudent
 
 
-class AttendanceViewSet(viewsets.ModelViewSet):
+class AttendanceViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """Attendance viewset."""
     queryset = Attendance.objects.all()
     serializer_class = AttendanceSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PageNumberOrKeysetPagination
+    keyset_ordering = ('-created_at', '-id')
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy', 'mark']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'mark', 'excuse']:
             return [IsTeacher() | IsSchoolAdmin() | IsSuperAdmin()]
+        if self.action == 'check_in':
+            return [IsStudent()]
         return super().get_permissions()
     
     def perform_create(self, serializer):
         serializer.save(recorded_by=self.request.user)
     
+    # Updates and deletes load the mark FOR UPDATE, so the rollup delta
+    # (attendance.aggregates) subtracts the status it replaces rather than one
+    # a concurrent write has already changed.
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+    
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+    
     def get_queryset(self):
         queryset = Attendance.objects.all()
         student_id = self.request.query_params.get('student_id')
@@ -30,63 +64,37 @@ class AttendanceViewSet(viewsets.ModelViewSet):
         date_from = self.request.query_params.get('date_from')
         date_to = self.request.query_params.get('date_to')
         
-        user = self.request.user
-        
-        # Students can only see their own attendance
-        if user.has_role('student'):
-            try:
-                student = user.student_profile
-                queryset = queryset.filter(student=student)
-            except:
-                queryset = Attendance.objects.none()
-        
-        # Parents can only see their children's attendance
-        if user.has_role('parent'):
-            children_ids = [sp.student_id for sp in user.children.all()]
-            queryset = queryset.filter(student_id__in=children_ids)
+        # Students see their own attendance, parents their children's
+        queryset = filter_visible(queryset, self.request.user)
         
         if student_id:
             queryset = queryset.filter(student_id=student_id)
         if lesson_id:
             queryset = queryset.filter(lesson_id=lesson_id)
         if date_from:
-            queryset = queryset.filter(lesson__date__gte=date_from)
+            queryset = queryset.filter(date__gte=date_from)
         if date_to:
-            queryset = queryset.filter(lesson__date__lte=date_to)
+            queryset = queryset.filter(date__lte=date_to)
+        if self.action in ('update', 'partial_update', 'destroy'):
+            queryset = queryset.select_for_update()
         
         return queryset
     
     @action(detail=False, methods=['post'])
     def mark(self, request):
-        """Mark attendance for multiple students."""
-        lesson_id = request.data.get('lesson_id')
-        records = request.data.get('records', [])  # List of {student_id, status, reason}
+        """Mark attendance for multiple students of a lesson in one batch."""
+        serializer = AttendanceMarkSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson = Lesson.objects.select_related('course').filter(
+            id=serializer.validated_data['lesson_id']
+        ).first()
+        if not lesson:
+            return Response({'lesson_id': ['Lesson not found.']}, status=status.HTTP_400_BAD_REQUEST)
         
-        if not lesson_id:
-            return Response({'error': 'lesson_id is required'}, status=status.HTTP_400_BAD_REQUEST)
-        
-        created = []
-        updated = []
-        
-        for record in records:
-            student_id = record.get('student_id')
-            status_val = record.get('status')
-            reason = record.get('reason', '')
-            
-            attendance, created_flag = Attendance.objects.update_or_create(
-                lesson_id=lesson_id,
-                student_id=student_id,
-                defaults={
-                    'status': status_val,
-                    'reason': reason,
-                    'recorded_by': request.user
-                }
-            )
-            
-            if created_flag:
-                created.append(attendance.id)
-            else:
-                updated.append(attendance.id)
+        records = serializer.validated_data['records']
+        errors, created, updated = mark_attendance(lesson, records, request.user)
+        if errors:
+            return Response({'records': errors}, status=status.HTTP_400_BAD_REQUEST)
         
         return Response({
             'created': created,
@@ -94,33 +102,132 @@ class AttendanceViewSet(viewsets.ModelViewSet):
             'message': f'Marked attendance for {len(records)} students'
         })
     
+    @action(detail=False, methods=['post'])
+    def excuse(self, request):
+        """Excuse a student or a class group for all lessons in a date range (e.g. a sick note)."""
+        serializer = AttendanceExcuseSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        if data.get('student_id') and not Student.objects.filter(id=data['student_id']).exists():
+            return Response({'student_id': ['Student not found.']}, status=status.HTTP_400_BAD_REQUEST)
+        if data.get('class_group_id') and not ClassGroup.objects.filter(id=data['class_group_id']).exists():
+            return Response({'class_group_id': ['Class group not found.']}, status=status.HTTP_400_BAD_REQUEST)
+        counts = excuse_absences(
+            data['date_from'],
+            data['date_to'],
+            data['reason'],
+            request.user,
+            student_id=data.get('student_id'),
+            class_group_id=data.get('class_group_id'),
+        )
+        return Response({
+            **counts,
+            'message': f'Excused {counts["created"] + counts["updated"]} lesson marks'
+        })
+    
+    @action(detail=False, methods=['post'], url_path='check-in')
+    def check_in(self, request):
+        """Student self check-in for a lesson with open attendance.
+        
+        The check-in is only appended to a buffer (one lookup, one INSERT) and
+        becomes an Attendance mark when flush_attendance_check_ins runs, so a
+        whole school checking in at the bell does not queue on row locks.
+        """
+        serializer = AttendanceCheckInSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        lesson_id = serializer.validated_data['lesson_id']
+        # The requesting student, if in the class group of an open lesson
+        student_id = Student.objects.filter(
+            user=request.user,
+            class_group__courses__lessons__id=lesson_id,
+            class_group__courses__lessons__attendance_open_flag=True,
+        ).values_list('id', flat=True).first()
+        if not student_id:
+            return Response(
+                {'lesson_id': ['Lesson not found or attendance is not open.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        AttendanceCheckIn.objects.create(lesson_id=lesson_id, student_id=student_id)
+        return Response({'message': 'Check-in received'}, status=status.HTTP_202_ACCEPTED)
+    
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get attendance statistics."""
-        student_id = request.query_params.get('student_id')
-        date_from = request.query_params.get('date_from', str(date.today() - timedelta(days=30)))
-        date_to = request.query_params.get('date_to', str(date.today()))
+        """Get attendance statistics.
         
-        queryset = self.get_queryset().filter(
-            lesson__date__range=[date_from, date_to]
-        )
+        ?group_by=student,class_group,course,week returns one row per group, so a
+        homeroom dashboard gets the rates of a whole class (?class_group_id=) in
+        one call. Class group, school and week views, and a student over whole
+        months, are summed from the attendance rollups; other filters fall back
+        to aggregating attendance.
+        """
+        params = request.query_params
+        student_id = params.get('student_id')
+        date_from = params.get('date_from', str(date.today() - timedelta(days=30)))
+        date_to = params.get('date_to', str(date.today()))
+        group_by = [name for name in params.get('group_by', '').split(',') if name]
         
-        if student_id:
-            queryset = queryset.filter(student_id=student_id)
+        unknown = [name for name in group_by if name not in STATISTICS_GROUPS]
+        if unknown:
+            return Response(
+                {'group_by': [f'Unknown group: {", ".join(unknown)}. Use {", ".join(STATISTICS_GROUPS)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
-        total = queryset.count()
-        present = queryset.filter(status='present').count()
-        absent = queryset.filter(status='absent').count()
-        tardy = queryset.filter(status='tardy').count()
+        period = {'from': date_from, 'to': date_to}
+        rollup = self.get_rollup_queryset(date_from, date_to, group_by)
+        if rollup is not None:
+            queryset, statistics = rollup, rollup_statistics
+        else:
+            statistics = attendance_statistics
+            queryset = self.get_queryset().filter(date__range=[date_from, date_to])
+            if student_id:
+                queryset = queryset.filter(student_id=student_id)
+            if params.get('class_group_id'):
+                queryset = queryset.filter(course__class_group_id=params['class_group_id'])
+            if params.get('school_id'):
+                queryset = queryset.filter(school_id=params['school_id'])
+            if params.get('course_id'):
+                queryset = queryset.filter(course_id=params['course_id'])
         
-        attendance_rate = (present / total * 100) if total > 0 else 0
+        if group_by:
+            return Response({
+                'group_by': group_by,
+                'groups': statistics(queryset, group_by),
+                'period': period
+            })
+        return Response({**statistics(queryset), 'period': period})
+    
+    def get_rollup_queryset(self, date_from, date_to, group_by):
+        """Rollup rows answering this statistics request, or None if it needs raw attendance."""
+        params = self.request.query_params
+        if params.get('lesson_id') or params.get('course_id'):
+            return None
+        try:
+            start, end = date.fromisoformat(date_from), date.fromisoformat(date_to)
+        except ValueError:
+            return None
         
-        return Response({
-            'total': total,
-            'present': present,
-            'absent': absent,
-            'tardy': tardy,
-            'attendance_rate': round(attendance_rate, 2),
-            'period': {'from': date_from, 'to': date_to}
-        })
-
+        student_id = params.get('student_id')
+        visible_ids = get_visible_student_ids(self.request.user)
+        if not student_id:
+            if visible_ids is not None or not set(group_by) <= set(ROLLUP_STATISTICS_GROUPS):
+                return None
+            queryset = ClassGroupDailyAttendance.objects.filter(date__range=[start, end])
+            if params.get('class_group_id'):
+                queryset = queryset.filter(class_group_id=params['class_group_id'])
+            if params.get('school_id'):
+                queryset = queryset.filter(class_group__school_id=params['school_id'])
+            return queryset
+        
+        # A student over whole calendar months
+        whole_months = start.day == 1 and (end + timedelta(days=1)).day == 1
+        if group_by or params.get('class_group_id') or params.get('school_id') or not whole_months:
+            return None
+        if visible_ids is not None and student_id not in visible_ids:
+            return None
+        return StudentMonthlyAttendance.objects.filter(
+            student_id=student_id,
+            period__gte=start.strftime('%Y-%m'),
+            period__lte=end.strftime('%Y-%m'),
+        )
@@ -8,6 +8,7 @@ import os
 from .models import Certificate, CertificateTemplate
 from .serializers import CertificateSerializer, CertificateTemplateSerializer
 from .services import generate_certificate_pdf
+from students.visibility import filter_visible
 from users.permissions import IsSchoolAdmin, IsTeacher, IsSuperAdmin
 
 
@@ -50,20 +51,8 @@ class CertificateViewSet(viewsets.ModelViewSet):
         student_id = self.request.query_params.get('student_id')
         school_id = self.request.query_params.get('school_id')
         
-        user = self.request.user
-        
-        # Students can only see their own certificates
-        if user.has_role('student'):
-            try:
-                student = user.student_profile
-                queryset = queryset.filter(student=student)
-            except:
-                queryset = Certificate.objects.none()
-        
-        # Parents can only see their children's certificates
-        if user.has_role('parent'):
-            children_ids = [sp.student_id for sp in user.children.all()]
-            queryset = queryset.filter(student_id__in=children_ids)
+        # Students see their own certificates, parents their children's
+        queryset = filter_visible(queryset, self.request.user)
         
         if student_id:
             queryset = queryset.filter(student_id=student_id)
@@ -27,6 +27,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'rest_framework',
     'rest_framework_simplejwt',
     'corsheaders',
@@ -131,7 +132,7 @@ AUTH_USER_MODEL = 'users.User'
 # REST Framework
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.JWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
@@ -153,8 +154,13 @@ SIMPLE_JWT = {
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,
     'AUTH_HEADER_TYPES': ('Bearer',),
+    'TOKEN_OBTAIN_SERIALIZER': 'users.serializers.TokenObtainPairWithClaimsSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'users.serializers.TokenRefreshWithClaimsSerializer',
 }
 
+# Embed role claims + permission-matrix version in access tokens (authorize without DB lookups)
+JWT_ACCESS_CLAIMS = os.getenv('JWT_ACCESS_CLAIMS', 'False') == 'True'
+
 # CORS
 CORS_ALLOWED_ORIGINS = os.getenv(
     'CORS_ALLOWED_ORIGINS',
@@ -175,6 +181,21 @@ CACHES = {
     }
 }
 
+# Role rows and role-permission codes are cached (invalidated on edit); TTL is a backstop
+PERMISSION_CACHE_TIMEOUT = int(os.getenv('PERMISSION_CACHE_TIMEOUT', '3600'))
+
+# Slim user record cached by JWTAuthentication (invalidated on User save/delete)
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv('AUTH_USER_CACHE_TIMEOUT', '300'))
+
+# Academic year term calendars (invalidated on AcademicYear save/delete)
+TERM_CALENDAR_CACHE_TIMEOUT = int(os.getenv('TERM_CALENDAR_CACHE_TIMEOUT', '86400'))
+
+# Lesson rosters with marks, cached while attendance is open (invalidated on marks/roster edits)
+LESSON_ROSTER_CACHE_TIMEOUT = int(os.getenv('LESSON_ROSTER_CACHE_TIMEOUT', '600'))
+
+# Student self check-ins: a check-in this many minutes after the lesson start counts as tardy
+ATTENDANCE_CHECK_IN_TARDY_MINUTES = int(os.getenv('ATTENDANCE_CHECK_IN_TARDY_MINUTES', '10'))
+
 # Spectacular Settings
 SPECTACULAR_SETTINGS = {
     'TITLE': 'GradeApp API',
@@ -33,6 +33,7 @@ urlpatterns = [
     path('api/roles/', include('users.role_permission_urls')),
     path('api/school-join-requests/', include('users.join_request_urls')),
     path('api/notifications/', include('users.notifications_urls')),
+    path('api/audit-logs/', include('users.audit_log_urls')),
 
     # Frontend (SPA)
     path('', TemplateView.as_view(template_name='index.html')),
@@ -0,0 +1,211 @@
+"""
+Incrementally maintained grade aggregates.
+
+StudentCourseGradeStats (per student and course) and CoursePeriodGradeStats
+(per course and month) hold count, sum and a per-GradeType breakdown. Every
+Grade write applies its delta: journal.signals handles save/delete and the
+bulk gradebook save calls grades_saved() itself. Writers lock the grade row
+before reading the value it replaces, so concurrent updates cannot make the
+aggregates drift. rebuild_grade_stats recomputes both tables from scratch
+(the migration creating them runs it too).
+"""
+from collections import defaultdict
+from datetime import date as date_cls
+from decimal import Decimal
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from .models import Grade, StudentCourseGradeStats, CoursePeriodGradeStats
+
+CENTS = Decimal('0.01')
+
+
+def period_of(value):
+    """Month period key ('YYYY-MM') of a date."""
+    if isinstance(value, str):
+        value = date_cls.fromisoformat(value)
+    return value.strftime('%Y-%m')
+
+
+def grade_entry(grade):
+    """(student_id, course_id, period, type, value) of a grade as it counts in the aggregates."""
+    return (
+        str(grade.student_id),
+        str(grade.course_id),
+        period_of(grade.date),
+        grade.type,
+        Decimal(str(grade.value)),
+    )
+
+
+class _Delta:
+    __slots__ = ('count', 'total', 'by_type', 'needs_row')
+
+    def __init__(self):
+        self.count = 0
+        self.total = Decimal(0)
+        self.by_type = defaultdict(lambda: [0, Decimal(0)])
+        self.needs_row = False
+
+    def add(self, grade_type, value, sign):
+        self.count += sign
+        self.total += sign * value
+        self.by_type[grade_type][0] += sign
+        self.by_type[grade_type][1] += sign * value
+        if sign > 0:
+            self.needs_row = True
+
+    def is_empty(self):
+        return not self.count and not self.total and not any(
+            c or s for c, s in self.by_type.values()
+        )
+
+
+def _apply(model, key_fields, deltas):
+    deltas = {key: delta for key, delta in deltas.items() if not delta.is_empty()}
+    if not deltas:
+        return
+    # Rows are created only for keys that gain grades: removals never insert, so a
+    # cascade delete of the student/course cannot re-create rows for it.
+    model.objects.bulk_create(
+        [model(**dict(zip(key_fields, key))) for key, delta in deltas.items() if delta.needs_row],
+        ignore_conflicts=True,
+    )
+    condition = reduce(or_, (Q(**dict(zip(key_fields, key))) for key in deltas))
+    rows = list(model.objects.select_for_update().filter(condition).order_by(*key_fields))
+    now = timezone.now()
+    for row in rows:
+        delta = deltas[tuple(str(getattr(row, field)) for field in key_fields)]
+        row.count += delta.count
+        row.total += delta.total
+        by_type = dict(row.by_type or {})
+        for grade_type, (count, total) in delta.by_type.items():
+            current = by_type.pop(grade_type, {'count': 0, 'sum': '0'})
+            if current['count'] + count:
+                by_type[grade_type] = {
+                    'count': current['count'] + count,
+                    'sum': _money(Decimal(current['sum']) + total),
+                }
+        row.by_type = by_type
+        row.updated_at = now
+    model.objects.bulk_update(rows, ['count', 'total', 'by_type', 'updated_at'])
+
+
+def apply_grade_changes(removed=(), added=()):
+    """Apply removed/added grade entries (see grade_entry) to both aggregate tables."""
+    student_course = defaultdict(_Delta)
+    course_period = defaultdict(_Delta)
+    for sign, entries in ((-1, removed), (1, added)):
+        for student_id, course_id, period, grade_type, value in entries:
+            student_course[(student_id, course_id)].add(grade_type, value, sign)
+            course_period[(course_id, period)].add(grade_type, value, sign)
+    with transaction.atomic(savepoint=False):
+        _apply(StudentCourseGradeStats, ('student_id', 'course_id'), student_course)
+        _apply(CoursePeriodGradeStats, ('course_id', 'period'), course_period)
+
+
+def grades_saved(grades):
+    """Account for created/updated grades (uses the entry loaded from the DB, if any)."""
+    removed = [grade._stats_entry for grade in grades if getattr(grade, '_stats_entry', None)]
+    added = [grade_entry(grade) for grade in grades]
+    apply_grade_changes(removed, added)
+    for grade, entry in zip(grades, added):
+        grade._stats_entry = entry
+
+
+def grades_deleted(grades):
+    """Account for deleted grades."""
+    apply_grade_changes(
+        [getattr(grade, '_stats_entry', None) or grade_entry(grade) for grade in grades],
+        (),
+    )
+
+
+def _money(value):
+    return str(Decimal(value).quantize(CENTS))
+
+
+def _by_type(rows):
+    return {
+        grade_type: {'count': count, 'sum': _money(total)}
+        for grade_type, count, total in rows
+    }
+
+
+def rebuild_grade_stats(apps=None):
+    """Recompute both aggregate tables from the grades table. Returns row counts.
+
+    `apps` is a migration's app registry, to run against its historical models.
+    """
+    grade_model, student_course_model, course_period_model = (
+        (Grade, StudentCourseGradeStats, CoursePeriodGradeStats) if apps is None else (
+            apps.get_model('journal', 'Grade'),
+            apps.get_model('journal', 'StudentCourseGradeStats'),
+            apps.get_model('journal', 'CoursePeriodGradeStats'),
+        )
+    )
+    student_course = defaultdict(list)
+    for row in (
+        grade_model.objects.values('student_id', 'course_id', 'type')
+        .annotate(n=Count('id'), s=Sum('value'))
+        .order_by()
+    ):
+        student_course[(row['student_id'], row['course_id'])].append((row['type'], row['n'], row['s']))
+
+    course_period = defaultdict(list)
+    for row in (
+        grade_model.objects.annotate(month=TruncMonth('date'))
+        .values('course_id', 'month', 'type')
+        .annotate(n=Count('id'), s=Sum('value'))
+        .order_by()
+    ):
+        course_period[(row['course_id'], period_of(row['month']))].append((row['type'], row['n'], row['s']))
+
+    with transaction.atomic():
+        student_course_model.objects.all().delete()
+        course_period_model.objects.all().delete()
+        student_course_model.objects.bulk_create([
+            student_course_model(
+                student_id=student_id,
+                course_id=course_id,
+                count=sum(n for _, n, _ in rows),
+                total=sum(s for _, _, s in rows),
+                by_type=_by_type(rows),
+            )
+            for (student_id, course_id), rows in student_course.items()
+        ], batch_size=1000)
+        course_period_model.objects.bulk_create([
+            course_period_model(
+                course_id=course_id,
+                period=period,
+                count=sum(n for _, n, _ in rows),
+                total=sum(s for _, _, s in rows),
+                by_type=_by_type(rows),
+            )
+            for (course_id, period), rows in course_period.items()
+        ], batch_size=1000)
+    return len(student_course), len(course_period)
+
+
+def summarize(rows):
+    """Merge aggregate rows into the statistics payload (avg_grade, total_grades, by_type)."""
+    count = 0
+    total = Decimal(0)
+    by_type = defaultdict(lambda: [0, Decimal(0)])
+    for row in rows:
+        count += row.count
+        total += row.total
+        for grade_type, values in (row.by_type or {}).items():
+            by_type[grade_type][0] += values['count']
+            by_type[grade_type][1] += Decimal(values['sum'])
+    return {
+        'avg_grade': total / count if count else None,
+        'total_grades': count,
+        'by_type': {
+            grade_type: {'count': n, 'avg_grade': s / n}
+            for grade_type, (n, s) in sorted(by_type.items()) if n
+        },
+    }
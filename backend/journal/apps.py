@@ -5,3 +5,5 @@ class JournalConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'journal'
 
+    def ready(self):
+        from . import signals  # noqa: F401
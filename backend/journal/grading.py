@@ -0,0 +1,165 @@
+"""
+Term and final grades computed from School.grading_system.
+
+grading_system keys used here (all optional):
+    scale      label stored with the result, e.g. '10-point'
+    min, max   the final value is clamped to this range
+    weights    {GradeType: weight}; unlisted types weigh 1, weight 0 ignores a type
+    rounding   'half_up' (default), 'half_even', 'floor' or 'ceil'
+    precision  decimal places of the final value (default 0)
+
+A student's result is the weighted mean of their per-type averages over the
+types they have grades in. Grades are summed per (course, student, type) in
+one grouped query for any number of courses, and the results are written
+with one bulk insert, so a whole school term costs a handful of queries.
+"""
+from collections import defaultdict
+from decimal import Decimal, ROUND_CEILING, ROUND_FLOOR, ROUND_HALF_EVEN, ROUND_HALF_UP
+from functools import reduce
+from operator import or_
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from rest_framework.exceptions import ValidationError
+from schedule.models import Course
+from schools.models import AcademicYear
+from schools.terms import term_range
+from .models import Grade, FinalGrade
+
+ROUNDING = {
+    'half_up': ROUND_HALF_UP,
+    'half_even': ROUND_HALF_EVEN,
+    'floor': ROUND_FLOOR,
+    'ceil': ROUND_CEILING,
+}
+CENTS = Decimal('0.01')
+
+
+def _decimal(value):
+    return None if value is None else Decimal(str(value))
+
+
+class GradingPolicy:
+    """Weights, rounding and scale of a school (from School.grading_system)."""
+
+    def __init__(self, grading_system):
+        grading_system = grading_system or {}
+        rounding = grading_system.get('rounding') or 'half_up'
+        if rounding not in ROUNDING:
+            raise ValidationError(
+                {'grading_system': [f'Unknown rounding {rounding!r}. Use {", ".join(ROUNDING)}.']}
+            )
+        try:
+            self.weights = {
+                grade_type: Decimal(str(weight))
+                for grade_type, weight in (grading_system.get('weights') or {}).items()
+            }
+            self.quantum = Decimal(1).scaleb(-int(grading_system.get('precision') or 0))
+        except (ArithmeticError, TypeError, ValueError):
+            raise ValidationError({'grading_system': ['weights and precision must be numbers.']})
+        self.scale = grading_system.get('scale') or '10-point'
+        self.min = _decimal(grading_system.get('min'))
+        self.max = _decimal(grading_system.get('max'))
+        self.rounding = ROUNDING[rounding]
+
+    def weight(self, grade_type):
+        return self.weights.get(grade_type, Decimal(1))
+
+    def evaluate(self, by_type):
+        """(weighted_average, value, breakdown) from {type: (count, sum)}; None if nothing counts."""
+        numerator = denominator = Decimal(0)
+        breakdown = {}
+        for grade_type, (count, total) in sorted(by_type.items()):
+            average = total / count
+            weight = self.weight(grade_type)
+            breakdown[grade_type] = {
+                'count': count,
+                'average': str(average.quantize(CENTS)),
+                'weight': str(weight),
+            }
+            if weight:
+                numerator += weight * average
+                denominator += weight
+        if not denominator:
+            return None
+        weighted_average = numerator / denominator
+        value = weighted_average.quantize(self.quantum, rounding=self.rounding)
+        if self.min is not None:
+            value = max(value, self.min)
+        if self.max is not None:
+            value = min(value, self.max)
+        return weighted_average, value, breakdown
+
+
+def courses_for_final_grades(course_id=None, school_id=None, academic_year_id=None):
+    """A single course, or every course of a school in an academic year (default: current)."""
+    queryset = Course.objects.select_related('school')
+    if course_id:
+        return queryset.filter(id=course_id)
+    if not academic_year_id:
+        academic_year_id = AcademicYear.objects.filter(
+            school_id=school_id, is_current=True
+        ).values_list('id', flat=True).first()
+        if not academic_year_id:
+            raise ValidationError({'academic_year': ['The school has no current academic year.']})
+    return queryset.filter(school_id=school_id, academic_year_id=academic_year_id)
+
+
+def compute_final_grades(courses, term):
+    """
+    Recompute FinalGrade rows of the given courses for a term.
+
+    Args:
+        courses: Course instances (school loaded, e.g. select_related('school'))
+        term: term code of the courses' academic year ('Q1', 'year', ...)
+
+    Returns:
+        list of saved FinalGrade instances
+    """
+    courses = list(courses)
+    if not courses:
+        return []
+
+    # Courses of the same academic year share the term date range
+    courses_by_year = defaultdict(list)
+    for course in courses:
+        courses_by_year[course.academic_year_id].append(course.id)
+    conditions = []
+    for year_id, course_ids in courses_by_year.items():
+        start, end = term_range(year_id, term)
+        conditions.append(Q(course_id__in=course_ids, date__gte=start, date__lt=end))
+
+    sums = defaultdict(dict)
+    for row in (
+        Grade.objects.filter(reduce(or_, conditions))
+        .values('course_id', 'student_id', 'type')
+        .annotate(n=Count('id'), s=Sum('value'))
+        .order_by()
+    ):
+        sums[(row['course_id'], row['student_id'])][row['type']] = (row['n'], row['s'])
+
+    policies = {}
+    courses_by_id = {course.id: course for course in courses}
+    final_grades = []
+    for (course_id, student_id), by_type in sums.items():
+        school = courses_by_id[course_id].school
+        if school.pk not in policies:
+            policies[school.pk] = GradingPolicy(school.grading_system)
+        policy = policies[school.pk]
+        result = policy.evaluate(by_type)
+        if result is None:
+            continue
+        weighted_average, value, breakdown = result
+        final_grades.append(FinalGrade(
+            student_id=student_id,
+            course_id=course_id,
+            term=term,
+            weighted_average=weighted_average.quantize(Decimal('0.001')),
+            value=value,
+            scale=policy.scale,
+            breakdown=breakdown,
+        ))
+
+    with transaction.atomic():
+        FinalGrade.objects.filter(course_id__in=list(courses_by_id), term=term).delete()
+        FinalGrade.objects.bulk_create(final_grades, batch_size=1000)
+    return final_grades
@@ -0,0 +1,42 @@
+"""
+Management command to compute term/final grades from School.grading_system.
+Use at the end of a term, e.g. `compute_final_grades --school <id> --term Q1`.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.exceptions import ValidationError
+from journal.grading import compute_final_grades, courses_for_final_grades
+from schools.models import School
+
+
+class Command(BaseCommand):
+    help = 'Compute FinalGrade rows for a term, for one course or every course of a school'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--term', required=True, help="Term code of the academic year (Q1, T2, year)")
+        parser.add_argument('--course', help='Course ID')
+        parser.add_argument('--school', help='School ID (all courses of the academic year)')
+        parser.add_argument('--academic-year', help='Academic year ID (default: the current one)')
+        parser.add_argument('--all-schools', action='store_true', help='Every school, current academic year')
+
+    def handle(self, *args, **options):
+        if options['all_schools']:
+            school_ids = list(School.objects.values_list('id', flat=True))
+        elif options['school']:
+            school_ids = [options['school']]
+        elif not options['course']:
+            raise CommandError('Give --course, --school or --all-schools.')
+        else:
+            school_ids = [None]
+
+        total = 0
+        for school_id in school_ids:
+            try:
+                courses = courses_for_final_grades(
+                    course_id=options['course'],
+                    school_id=school_id,
+                    academic_year_id=options['academic_year'],
+                )
+                total += len(compute_final_grades(courses, options['term']))
+            except ValidationError as exc:
+                self.stdout.write(self.style.WARNING(f'School {school_id}: {exc.detail}'))
+        self.stdout.write(self.style.SUCCESS(f'Computed {total} final grades for {options["term"]}.'))
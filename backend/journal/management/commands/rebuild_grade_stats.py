@@ -0,0 +1,16 @@
+"""
+Management command to recompute the grade aggregate tables from the grades table.
+Use after imports/raw SQL that bypassed the ORM, or to repair drift.
+"""
+from django.core.management.base import BaseCommand
+from journal.aggregates import rebuild_grade_stats
+
+
+class Command(BaseCommand):
+    help = 'Rebuild StudentCourseGradeStats and CoursePeriodGradeStats from grades'
+
+    def handle(self, *args, **options):
+        student_course, course_period = rebuild_grade_stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt {student_course} student/course and {course_period} course/month aggregates.'
+        ))
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:40
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+def backfill_grade_stats(apps, schema_editor):
+    from journal.aggregates import rebuild_grade_stats
+    rebuild_grade_stats(apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0002_initial'),
+        ('schedule', '0002_initial'),
+        ('students', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoursePeriodGradeStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('period', models.CharField(help_text='Месяц в формате YYYY-MM', max_length=7)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('by_type', models.JSONField(default=dict, help_text="Разбивка по типу оценки: {'quiz': {'count': 2, 'sum': '17.00'}, ...}")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='period_grade_stats', to='schedule.course')),
+            ],
+            options={
+                'verbose_name': 'Course period grade stats',
+                'verbose_name_plural': 'Course period grade stats',
+                'db_table': 'grade_stats_course_period',
+                'unique_together': {('course', 'period')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StudentCourseGradeStats',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('count', models.IntegerField(default=0)),
+                ('total', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('by_type', models.JSONField(default=dict, help_text="Разбивка по типу оценки: {'quiz': {'count': 2, 'sum': '17.00'}, ...}")),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='student_grade_stats', to='schedule.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='grade_stats', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Student course grade stats',
+                'verbose_name_plural': 'Student course grade stats',
+                'db_table': 'grade_stats_student_course',
+                'unique_together': {('student', 'course')},
+            },
+        ),
+        migrations.RunPython(backfill_grade_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:46
+
+import django.db.models.deletion
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0003_grade_stats'),
+        ('schedule', '0002_initial'),
+        ('students', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FinalGrade',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('term', models.CharField(help_text='Код периода учебного года (Q1, T2, year)', max_length=20)),
+                ('weighted_average', models.DecimalField(decimal_places=3, help_text='Взвешенное среднее до округления', max_digits=7)),
+                ('value', models.DecimalField(decimal_places=2, help_text='Итоговая оценка по шкале школы', max_digits=5)),
+                ('scale', models.CharField(default='10-point', max_length=50)),
+                ('breakdown', models.JSONField(default=dict, help_text="По типам оценок: {'exam': {'count': 2, 'average': '8.50', 'weight': 3}, ...}")),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_grades', to='schedule.course')),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='final_grades', to='students.student')),
+            ],
+            options={
+                'verbose_name': 'Final Grade',
+                'verbose_name_plural': 'Final Grades',
+                'db_table': 'final_grades',
+                'indexes': [models.Index(fields=['course', 'term'], name='final_grade_course__d0ea97_idx')],
+                'unique_together': {('student', 'course', 'term')},
+            },
+        ),
+    ]
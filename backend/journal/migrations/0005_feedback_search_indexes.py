@@ -0,0 +1,34 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:47
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0004_final_grade'),
+        ('students', '0002_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='feedback',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('text', config='russian'), name='feedback_text_russian_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('text', config='simple'), name='feedback_text_simple_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=django.contrib.postgres.indexes.GinIndex(django.contrib.postgres.search.SearchVector('text', config='english'), name='feedback_text_english_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='feedback',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['tags'], name='feedback_tags_gin', opclasses=['jsonb_path_ops']),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('journal', '0005_feedback_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='grade',
+            index=models.Index(fields=['date', 'id'], name='grades_date_6fee5e_idx'),
+        ),
+    ]
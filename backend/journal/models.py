@@ -1,5 +1,7 @@
 import uuid
 from django.db import models
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVector
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
@@ -56,11 +58,31 @@ class Grade(models.Model):
             models.Index(fields=['student', 'course']),
             models.Index(fields=['student', 'date']),
             models.Index(fields=['course', 'date']),
+            models.Index(fields=['date', 'id']),  # keyset pages of all visible grades
             models.Index(fields=['type']),
         ]
     
     def __str__(self):
         return f"{self.student.user.get_full_name()} - {self.value} ({self.get_type_display()})"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what this row counts as in the grade aggregates, so a later
+        # save/delete can subtract it (see journal.aggregates).
+        if {'student_id', 'course_id', 'date', 'type', 'value'}.issubset(field_names):
+            from .aggregates import grade_entry
+            instance._stats_entry = grade_entry(instance)
+        return instance
+
+
+# Text search configuration per UI language; each has a GIN index on Feedback.text.
+# Postgres ships no Kazakh stemmer, so kz uses the unstemmed 'simple' config.
+FEEDBACK_SEARCH_CONFIGS = {
+    'ru': 'russian',
+    'kz': 'simple',
+    'en': 'english',
+}
 
 
 class Feedback(models.Model):
@@ -93,8 +115,91 @@ class Feedback(models.Model):
         indexes = [
             models.Index(fields=['to_student', 'date']),
             models.Index(fields=['from_user']),
+            GinIndex(SearchVector('text', config='russian'), name='feedback_text_russian_gin'),
+            GinIndex(SearchVector('text', config='simple'), name='feedback_text_simple_gin'),
+            GinIndex(SearchVector('text', config='english'), name='feedback_text_english_gin'),
+            GinIndex(fields=['tags'], opclasses=['jsonb_path_ops'], name='feedback_tags_gin'),
         ]
     
     def __str__(self):
         return f"Feedback to {self.to_student.user.get_full_name()} from {self.from_user.get_full_name()}"
 
+
+class StudentCourseGradeStats(models.Model):
+    """Grade aggregate per (student, course), maintained incrementally (journal.aggregates)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='grade_stats')
+    course = models.ForeignKey('schedule.Course', on_delete=models.CASCADE, related_name='student_grade_stats')
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    by_type = models.JSONField(
+        default=dict,
+        help_text="Разбивка по типу оценки: {'quiz': {'count': 2, 'sum': '17.00'}, ...}"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'grade_stats_student_course'
+        verbose_name = 'Student course grade stats'
+        verbose_name_plural = 'Student course grade stats'
+        unique_together = [['student', 'course']]
+    
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+
+class CoursePeriodGradeStats(models.Model):
+    """Grade aggregate per (course, month), maintained incrementally (journal.aggregates)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    course = models.ForeignKey('schedule.Course', on_delete=models.CASCADE, related_name='period_grade_stats')
+    period = models.CharField(max_length=7, help_text="Месяц в формате YYYY-MM")
+    count = models.IntegerField(default=0)
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    by_type = models.JSONField(
+        default=dict,
+        help_text="Разбивка по типу оценки: {'quiz': {'count': 2, 'sum': '17.00'}, ...}"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'grade_stats_course_period'
+        verbose_name = 'Course period grade stats'
+        verbose_name_plural = 'Course period grade stats'
+        unique_together = [['course', 'period']]
+    
+    @property
+    def average(self):
+        return self.total / self.count if self.count else None
+
+
+class FinalGrade(models.Model):
+    """Computed term/final grade per (student, course, term) (journal.grading)."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    student = models.ForeignKey('students.Student', on_delete=models.CASCADE, related_name='final_grades')
+    course = models.ForeignKey('schedule.Course', on_delete=models.CASCADE, related_name='final_grades')
+    term = models.CharField(max_length=20, help_text="Код периода учебного года (Q1, T2, year)")
+    weighted_average = models.DecimalField(
+        max_digits=7,
+        decimal_places=3,
+        help_text="Взвешенное среднее до округления"
+    )
+    value = models.DecimalField(max_digits=5, decimal_places=2, help_text="Итоговая оценка по шкале школы")
+    scale = models.CharField(max_length=50, default='10-point')
+    breakdown = models.JSONField(
+        default=dict,
+        help_text="По типам оценок: {'exam': {'count': 2, 'average': '8.50', 'weight': 3}, ...}"
+    )
+    computed_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'final_grades'
+        verbose_name = 'Final Grade'
+        verbose_name_plural = 'Final Grades'
+        unique_together = [['student', 'course', 'term']]
+        indexes = [
+            models.Index(fields=['course', 'term']),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.course_id} {self.term}: {self.value}"
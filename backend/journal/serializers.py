@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Grade, Feedback
+from .models import Grade, Feedback, GradeType, FinalGrade
 from students.serializers import StudentSerializer
 
 
@@ -23,12 +23,61 @@ class FeedbackSerializer(serializers.ModelSerializer):
     """Feedback serializer."""
     from_user_name = serializers.CharField(source='from_user.get_full_name', read_only=True)
     to_student_name = serializers.CharField(source='to_student.user.get_full_name', read_only=True)
+    rank = serializers.FloatField(read_only=True, help_text='Search relevance (only with ?q=)')
     
     class Meta:
         model = Feedback
         fields = [
             'id', 'from_user', 'from_user_name', 'to_student', 'to_student_name',
-            'text', 'tags', 'date', 'created_at', 'updated_at'
+            'text', 'tags', 'date', 'rank', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
 
+
+class GradeCellSerializer(serializers.Serializer):
+    """One gradebook cell for bulk save (value null deletes the grade)."""
+    id = serializers.UUIDField(required=False)
+    student = serializers.UUIDField(required=False)
+    lesson = serializers.UUIDField(required=False, allow_null=True)
+    value = serializers.DecimalField(max_digits=5, decimal_places=2, min_value=0, allow_null=True)
+    type = serializers.ChoiceField(choices=GradeType.choices, required=False)
+    comment = serializers.CharField(required=False, allow_blank=True)
+    date = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        if not attrs.get('id') and not attrs.get('student'):
+            raise serializers.ValidationError('Either id or student is required.')
+        return attrs
+
+
+class GradeBulkSaveSerializer(serializers.Serializer):
+    """Body for bulk gradebook save: a course and its grid of cells."""
+    course = serializers.UUIDField()
+    cells = GradeCellSerializer(many=True, allow_empty=False)
+
+
+class FinalGradeSerializer(serializers.ModelSerializer):
+    """Computed term/final grade."""
+    student_name = serializers.CharField(source='student.user.get_full_name', read_only=True)
+    course_name = serializers.CharField(source='course.name', read_only=True)
+
+    class Meta:
+        model = FinalGrade
+        fields = [
+            'id', 'student', 'student_name', 'course', 'course_name', 'term',
+            'weighted_average', 'value', 'scale', 'breakdown', 'computed_at'
+        ]
+        read_only_fields = fields
+
+
+class FinalGradeComputeSerializer(serializers.Serializer):
+    """Body for computing final grades: one course, or all courses of a school's academic year."""
+    term = serializers.CharField(max_length=20)
+    course = serializers.UUIDField(required=False)
+    school = serializers.UUIDField(required=False)
+    academic_year = serializers.UUIDField(required=False)
+
+    def validate(self, attrs):
+        if bool(attrs.get('course')) == bool(attrs.get('school')):
+            raise serializers.ValidationError('Give either course or school.')
+        return attrs
@@ -0,0 +1,362 @@
+"""
+Gradebook services: bulk save of grade cells, the grade matrix of a course
+and grouped grade statistics.
+"""
+from decimal import Decimal
+from itertools import groupby
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Q
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+from schedule.models import Course, Lesson
+from students.models import Student
+from students.visibility import get_visible_student_ids
+from .aggregates import grades_saved, period_of
+from .models import Grade, GradeType
+
+
+def _cell_key(student_id, lesson_id, grade_type):
+    return (str(student_id), str(lesson_id), grade_type)
+
+
+def save_gradebook(course, cells, user):
+    """
+    Validate a grid of grade cells against the course roster and apply it.
+
+    Each cell is a dict with `id` (existing grade) or `student` + optional
+    `lesson`, plus `value`, `type`, `comment`, `date`. A cell without `id`
+    that has a lesson updates the grade for (student, lesson, type) if one
+    exists; `value` None deletes the grade. Everything is validated first
+    (four queries), then creates/updates/deletes are applied with
+    bulk_create / bulk_update in one transaction, with the changed grades
+    locked. bulk writes send no signals, so the grade aggregates are updated
+    here (deletes go through the signal).
+
+    Args:
+        course: Course instance (with school)
+        cells: validated cell dicts (GradeCellSerializer)
+        user: User recording the grades
+
+    Returns:
+        (results, counts): per-cell results and created/updated/deleted counts;
+        counts is None if any cell failed validation (nothing is applied).
+    """
+    roster = {
+        str(pk) for pk in
+        Student.objects.filter(class_group_id=course.class_group_id).values_list('id', flat=True)
+    }
+    lesson_ids = {cell['lesson'] for cell in cells if cell.get('lesson')}
+    lesson_dates = {
+        str(pk): lesson_date for pk, lesson_date in
+        Lesson.objects.filter(course=course, id__in=lesson_ids).values_list('id', 'date')
+    }
+    grade_ids = {cell['id'] for cell in cells if cell.get('id')}
+    keyed_students = {cell['student'] for cell in cells if not cell.get('id') and cell.get('lesson')}
+    existing = Grade.objects.filter(course=course).filter(
+        Q(id__in=grade_ids) | Q(lesson_id__in=lesson_ids, student_id__in=keyed_students)
+    )
+    by_id = {}
+    by_key = {}
+    for grade in existing:
+        by_id[str(grade.id)] = grade
+        by_key.setdefault(_cell_key(grade.student_id, grade.lesson_id, grade.type), grade)
+
+    max_value = (course.school.grading_system or {}).get('max')
+    now = timezone.now()
+    results = []
+    to_create, to_update, to_delete = [], [], []
+    seen = set()
+    has_errors = False
+
+    for cell in cells:
+        errors = {}
+        grade = None
+        if cell.get('id'):
+            grade = by_id.get(str(cell['id']))
+            if grade is None:
+                errors['id'] = 'Grade not found in this course.'
+        if grade is not None:
+            student_id = str(grade.student_id)
+        else:
+            student_id = str(cell['student']) if cell.get('student') else None
+        lesson_id = str(cell['lesson']) if cell.get('lesson') else None
+        grade_type = cell.get('type') or (grade.type if grade else GradeType.HOMEWORK)
+
+        if student_id and student_id not in roster:
+            errors['student'] = 'Student is not in the course class group.'
+        if lesson_id and lesson_id not in lesson_dates:
+            errors['lesson'] = 'Lesson does not belong to this course.'
+        if cell['value'] is not None and max_value is not None and cell['value'] > max_value:
+            errors['value'] = f'Value exceeds the school scale maximum ({max_value}).'
+        if grade is None and not errors and lesson_id:
+            grade = by_key.get(_cell_key(student_id, lesson_id, grade_type))
+        if grade is None and cell['value'] is not None and not cell.get('date') and not lesson_id:
+            errors['date'] = 'date is required when no lesson is given.'
+        if not errors:
+            # An existing grade, or the (student, lesson, type) a new lesson grade will take
+            target = grade.id if grade is not None else (
+                _cell_key(student_id, lesson_id, grade_type) if lesson_id and cell['value'] is not None else None
+            )
+            if target is not None and target in seen:
+                errors['non_field_errors'] = 'Several cells target the same grade.'
+            seen.add(target)
+
+        if errors:
+            has_errors = True
+            results.append({'status': 'error', 'errors': errors})
+            continue
+
+        if cell['value'] is None:
+            if grade is None:
+                results.append({'status': 'unchanged', 'id': None})
+            else:
+                to_delete.append(grade.id)
+                results.append({'status': 'deleted', 'id': grade.id})
+            continue
+
+        if grade is None:
+            grade = Grade(
+                course=course,
+                student_id=student_id,
+                lesson_id=lesson_id,
+                type=grade_type,
+                scale=(course.school.grading_system or {}).get('scale') or '10-point',
+            )
+            to_create.append(grade)
+            status = 'created'
+        else:
+            to_update.append(grade)
+            status = 'updated'
+        grade.value = cell['value']
+        grade.type = grade_type
+        if lesson_id:
+            grade.lesson_id = lesson_id
+        grade.date = cell.get('date') or (lesson_dates[lesson_id] if lesson_id else grade.date)
+        if 'comment' in cell:
+            grade.comment = cell['comment']
+        grade.recorded_by = user
+        grade.updated_at = now
+        results.append({'status': status, 'id': grade.id})
+
+    if has_errors:
+        return results, None
+
+    with transaction.atomic():
+        # Lock the grades being changed and take their aggregate entries from
+        # the locked rows: the ones loaded above may be stale by now.
+        locked = {
+            grade.id: grade for grade in
+            Grade.objects.select_for_update().filter(id__in=[grade.id for grade in to_update] + to_delete)
+        }
+        # A grade deleted meanwhile is not re-created (bulk_update skips it)
+        to_update = [grade for grade in to_update if grade.id in locked]
+        for grade in to_update:
+            grade._stats_entry = locked[grade.id]._stats_entry
+        Grade.objects.bulk_create(to_create)
+        Grade.objects.bulk_update(
+            to_update,
+            ['value', 'type', 'lesson', 'date', 'comment', 'recorded_by', 'updated_at'],
+        )
+        grades_saved(to_create + to_update)
+        if to_delete:
+            Grade.objects.filter(id__in=to_delete).delete()
+
+    return results, {
+        'created': len(to_create),
+        'updated': len(to_update),
+        'deleted': len(to_delete),
+    }
+
+
+def build_gradebook(course_id, user, date_range=None):
+    """
+    Students × lessons grade matrix of a course in columnar form (three queries).
+
+    Rows follow the class-group roster (limited to visible students for
+    students/parents), columns are the course lessons by date. A cell holds the
+    most recently updated grade of that student for that lesson; grades
+    without a lesson (or further grades on the same lesson) are listed in
+    `other` as parallel arrays.
+
+    Args:
+        course_id: Course ID
+        user: requesting User (visibility scope)
+        date_range: optional [start, end) date range for lessons and grades
+
+    Returns:
+        dict payload, or None if the course does not exist
+    """
+    # Course and roster in one query (LEFT JOIN through the class group)
+    rows = list(
+        Course.objects.filter(id=course_id)
+        .values(
+            'id', 'name',
+            'class_group__students__id',
+            'class_group__students__user__first_name',
+            'class_group__students__user__middle_name',
+            'class_group__students__user__last_name',
+            'class_group__students__user__email',
+        )
+        .order_by('class_group__students__user__last_name', 'class_group__students__user__first_name')
+    )
+    if not rows:
+        return None
+
+    visible_ids = get_visible_student_ids(user)
+    students = []
+    for row in rows:
+        student_id = row['class_group__students__id']
+        if student_id is None or (visible_ids is not None and str(student_id) not in visible_ids):
+            continue
+        parts = [
+            row['class_group__students__user__first_name'],
+            row['class_group__students__user__middle_name'],
+            row['class_group__students__user__last_name'],
+        ]
+        students.append({
+            'id': student_id,
+            'name': ' '.join(filter(None, parts)) or row['class_group__students__user__email'],
+        })
+
+    date_filter = {}
+    if date_range:
+        date_filter = {'date__gte': date_range[0], 'date__lt': date_range[1]}
+
+    lessons = list(
+        Lesson.objects.filter(course_id=course_id, **date_filter)
+        .order_by('date', 'start_time')
+        .values('id', 'date', 'start_time')
+    )
+
+    row_index = {student['id']: i for i, student in enumerate(students)}
+    column_index = {lesson['id']: j for j, lesson in enumerate(lessons)}
+    values = [[None] * len(lessons) for _ in students]
+    ids = [[None] * len(lessons) for _ in students]
+    types = [[None] * len(lessons) for _ in students]
+    other = {'row': [], 'id': [], 'value': [], 'type': [], 'date': [], 'lesson': []}
+
+    grades = (
+        Grade.objects.filter(course_id=course_id, student_id__in=list(row_index), **date_filter)
+        .order_by('-updated_at')
+        .values_list('id', 'student_id', 'lesson_id', 'value', 'type', 'date')
+    )
+    for grade_id, student_id, lesson_id, value, grade_type, grade_date in grades:
+        i = row_index[student_id]
+        j = column_index.get(lesson_id)
+        if j is not None and ids[i][j] is None:
+            values[i][j] = value
+            ids[i][j] = grade_id
+            types[i][j] = grade_type
+            continue
+        other['row'].append(i)
+        other['id'].append(grade_id)
+        other['value'].append(value)
+        other['type'].append(grade_type)
+        other['date'].append(grade_date)
+        other['lesson'].append(lesson_id)
+
+    return {
+        'course': {'id': rows[0]['id'], 'name': rows[0]['name']},
+        'students': students,
+        'lessons': lessons,
+        'values': values,
+        'ids': ids,
+        'types': types,
+        'other': other,
+    }
+
+
+# group_by option -> {output key: query column}
+STATISTICS_GROUPS = {
+    'course': {'course': 'course_id', 'course_name': 'course__name'},
+    'class_group': {'class_group': 'course__class_group_id', 'class_group_name': 'course__class_group__name'},
+    'type': {'type': 'type'},
+    'month': {'month': 'month'},
+    'student': {'student': 'student_id'},
+}
+PERCENTILES = (25, 50, 75, 90)
+
+
+def _percentile(histogram, count, q):
+    """Linear-interpolated percentile over a sorted [(value, count), ...] histogram."""
+    position = (count - 1) * q / 100
+    lower, upper = int(position), min(int(position) + 1, count - 1)
+    lower_value = upper_value = None
+    seen = 0
+    for value, n in histogram:
+        seen += n
+        if lower_value is None and lower < seen:
+            lower_value = value
+        if upper < seen:
+            upper_value = value
+            break
+    return lower_value + (upper_value - lower_value) * (Decimal(str(position)) - lower)
+
+
+def grade_statistics(queryset, group_by=(), distribution=False):
+    """
+    Grade statistics per group in one grouped query.
+
+    Args:
+        queryset: Grade queryset (already filtered and scoped to the user)
+        group_by: keys of STATISTICS_GROUPS
+        distribution: add a value histogram and percentiles (the query then
+            groups by value too and the rest is computed in one pass)
+
+    Returns:
+        list of dicts: group keys plus total_grades, avg_grade, min_grade,
+        max_grade (and histogram, percentiles)
+    """
+    columns = {}
+    for name in group_by:
+        columns.update(STATISTICS_GROUPS[name])
+    if 'month' in group_by:
+        queryset = queryset.annotate(month=TruncMonth('date'))
+    keys = list(columns.values())
+
+    def group_of(row):
+        group = {name: row[column] for name, column in columns.items()}
+        if group.get('month') is not None:
+            group['month'] = period_of(group['month'])
+        return group
+
+    if not distribution:
+        rows = (
+            queryset.values(*keys)
+            .annotate(
+                total_grades=Count('id'),
+                avg_grade=Avg('value'),
+                min_grade=Min('value'),
+                max_grade=Max('value'),
+            )
+            .order_by(*keys)
+        )
+        return [
+            {
+                **group_of(row),
+                'total_grades': row['total_grades'],
+                'avg_grade': row['avg_grade'],
+                'min_grade': row['min_grade'],
+                'max_grade': row['max_grade'],
+            }
+            for row in rows
+        ]
+
+    rows = queryset.values(*keys, 'value').annotate(n=Count('id')).order_by(*keys, 'value')
+    results = []
+    for _, group_rows in groupby(rows, key=lambda row: tuple(row[key] for key in keys)):
+        group_rows = list(group_rows)
+        histogram = [(row['value'], row['n']) for row in group_rows]
+        count = sum(n for _, n in histogram)
+        results.append({
+            **group_of(group_rows[0]),
+            'total_grades': count,
+            'avg_grade': sum(value * n for value, n in histogram) / count,
+            'min_grade': histogram[0][0],
+            'max_grade': histogram[-1][0],
+            'histogram': [{'value': value, 'count': n} for value, n in histogram],
+            'percentiles': {
+                f'p{q}': _percentile(histogram, count, q) for q in PERCENTILES
+            },
+        })
+    return results
@@ -0,0 +1,19 @@
+"""
+Keep the grade aggregates in step with single Grade saves and deletes.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .aggregates import grades_saved, grades_deleted
+from .models import Grade
+
+
+@receiver(post_save, sender=Grade)
+def grade_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    grades_saved([instance])
+
+
+@receiver(post_delete, sender=Grade)
+def grade_deleted(sender, instance, **kwargs):
+    grades_deleted([instance])
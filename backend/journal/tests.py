@@ -1,21 +1,42 @@
+from datetime import date
+from decimal import Decimal
+from importlib import import_module
+from io import StringIO
+import uuid
+
+from django.apps import apps
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from schools.models import School, SchoolType, AcademicYear
+from django.core.cache import cache
+from django.core.management import call_command
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+from schools.models import School, AcademicYear
 from students.models import Student, ClassGroup
 from staff.models import Staff, Subject, Position
-from schedule.models import Course
-from journal.models import Grade, GradeType
-from datetime import date
+from schedule.models import Course, Lesson
+from users.models import UserRole, Role
+from users.pagination import KeysetPagination
+from users.query_planning import plan_queryset, trim_fields
+from journal.aggregates import rebuild_grade_stats
+from journal.grading import GradingPolicy, compute_final_grades
+from journal.serializers import GradeSerializer
+from journal.models import Grade, GradeType, Feedback, FinalGrade, StudentCourseGradeStats, CoursePeriodGradeStats
+from journal.services import build_gradebook, grade_statistics, save_gradebook
 
 User = get_user_model()
 
 
-class GradeModelTest(TestCase):
+class JournalTestCase(TestCase):
+    """A course of class group 10A with one enrolled student and its teacher."""
+
     def setUp(self):
+        cache.clear()
         self.school = School.objects.create(
             name='Test School',
-            type=SchoolType.NIS,
-            city='Almaty'
+            grading_system={'scale': '10-point', 'min': 0, 'max': 10}
         )
         self.academic_year = AcademicYear.objects.create(
             school=self.school,
@@ -23,6 +44,12 @@ class GradeModelTest(TestCase):
             start_date=date(2024, 9, 1),
             end_date=date(2025, 5, 31)
         )
+        self.class_group = ClassGroup.objects.create(
+            school=self.school,
+            name='10A',
+            grade_level=10,
+            academic_year=self.academic_year
+        )
         self.user = User.objects.create_user(
             email='student@test.com',
             password='test123'
@@ -30,6 +57,7 @@ class GradeModelTest(TestCase):
         self.student = Student.objects.create(
             user=self.user,
             school=self.school,
+            class_group=self.class_group,
             student_number='STU001',
             enrollment_date=date(2024, 9, 1)
         )
@@ -48,12 +76,6 @@ class GradeModelTest(TestCase):
             name='Mathematics',
             code='MATH'
         )
-        self.class_group = ClassGroup.objects.create(
-            school=self.school,
-            name='10A',
-            grade_level=10,
-            academic_year=self.academic_year
-        )
         self.course = Course.objects.create(
             school=self.school,
             name='Math Course',
@@ -62,7 +84,30 @@ class GradeModelTest(TestCase):
             class_group=self.class_group,
             academic_year=self.academic_year
         )
+        self.client = APIClient()
+        self.client.force_authenticate(self.teacher_user)
+
+    def add_grade(self, value, grade_type=GradeType.QUIZ, day=date(2024, 10, 1), **fields):
+        return Grade.objects.create(
+            student=self.student,
+            course=self.course,
+            value=value,
+            type=grade_type,
+            date=day,
+            **fields
+        )
+
+    def add_lesson(self, day, start_time='09:00', end_time='09:45'):
+        return Lesson.objects.create(
+            course=self.course,
+            date=day,
+            start_time=start_time,
+            end_time=end_time,
+            teacher=self.teacher
+        )
+
 
+class GradeModelTest(JournalTestCase):
     def test_grade_creation(self):
         grade = Grade.objects.create(
             student=self.student,
@@ -78,3 +123,410 @@ class GradeModelTest(TestCase):
         self.assertEqual(float(grade.value), 8.5)
         self.assertEqual(grade.type, GradeType.HOMEWORK)
 
+
+class GradebookSaveTest(JournalTestCase):
+    def test_updates_and_creates_cells(self):
+        grade = self.add_grade(5)
+        results, counts = save_gradebook(self.course, [
+            {'id': grade.id, 'value': 7},
+            {'student': self.student.id, 'value': 9, 'type': GradeType.EXAM, 'date': date(2024, 10, 2)},
+        ], self.teacher_user)
+        self.assertEqual(counts, {'created': 1, 'updated': 1, 'deleted': 0})
+        grade.refresh_from_db()
+        self.assertEqual(float(grade.value), 7)
+        self.assertEqual(Grade.objects.filter(course=self.course).count(), 2)
+
+    def test_rejects_duplicate_new_cells(self):
+        lesson = self.add_lesson(date(2024, 10, 3))
+        cell = {'student': self.student.id, 'lesson': lesson.id, 'value': 8, 'type': GradeType.PROJECT}
+        results, counts = save_gradebook(self.course, [cell, {**cell, 'value': 9}], self.teacher_user)
+        self.assertIsNone(counts)
+        self.assertEqual(results[1]['errors'], {'non_field_errors': 'Several cells target the same grade.'})
+        self.assertFalse(Grade.objects.exists())
+
+        results, counts = save_gradebook(self.course, [cell, {**cell, 'type': GradeType.QUIZ}], self.teacher_user)
+        self.assertEqual(counts, {'created': 2, 'updated': 0, 'deleted': 0})
+        self.assertEqual(results[0]['status'], 'created')
+
+
+class GradeStatsTest(JournalTestCase):
+    def snapshot(self):
+        return (
+            sorted(
+                (str(row.student_id), row.count, row.total, row.by_type)
+                for row in StudentCourseGradeStats.objects.filter(count__gt=0)
+            ),
+            sorted(
+                (row.period, row.count, row.total, row.by_type)
+                for row in CoursePeriodGradeStats.objects.filter(count__gt=0)
+            ),
+        )
+
+    def test_follow_writes(self):
+        grade = self.add_grade(6)
+        self.add_grade(8, GradeType.EXAM, date(2024, 11, 1))
+        grade = Grade.objects.get(pk=grade.pk)
+        grade.value = 4
+        grade.save()
+
+        stats = StudentCourseGradeStats.objects.get(student=self.student, course=self.course)
+        self.assertEqual(stats.count, 2)
+        self.assertEqual(float(stats.average), 6)
+        self.assertEqual(stats.by_type['quiz'], {'count': 1, 'sum': '4.00'})
+
+        grade.delete()
+        self.assertEqual(
+            CoursePeriodGradeStats.objects.get(course=self.course, period='2024-10').count, 0
+        )
+        rebuild_grade_stats()
+        self.assertFalse(CoursePeriodGradeStats.objects.filter(period='2024-10').exists())
+        self.assertEqual(StudentCourseGradeStats.objects.get(student=self.student).count, 1)
+
+    def test_match_rebuild_after_bulk_save(self):
+        old = self.add_grade(5, day=date(2024, 9, 20))
+        removed = self.add_grade(3, GradeType.HOMEWORK, date(2024, 10, 5))
+        save_gradebook(self.course, [
+            {'id': old.id, 'value': 9, 'date': date(2024, 10, 1)},
+            {'id': removed.id, 'value': None},
+            {'student': self.student.id, 'value': 7, 'type': GradeType.EXAM, 'date': date(2024, 11, 2)},
+        ], self.teacher_user)
+
+        incremental = self.snapshot()
+        rebuild_grade_stats()
+        self.assertEqual(incremental, self.snapshot())
+        self.assertEqual([row[:3] for row in incremental[1]], [('2024-10', 1, 9), ('2024-11', 1, 7)])
+
+    def test_bulk_save_locks_changed_grades(self):
+        grades = [self.add_grade(5), self.add_grade(6, GradeType.EXAM)]
+        with CaptureQueriesContext(connection) as queries:
+            save_gradebook(self.course, [
+                {'id': grades[0].id, 'value': 9},
+                {'id': grades[1].id, 'value': None},
+            ], self.teacher_user)
+        locks = [query['sql'] for query in queries if 'FOR UPDATE' in query['sql'] and '"grades"' in query['sql']]
+        self.assertEqual(len(locks), 1)
+        self.assertIn(str(grades[1].id).replace('-', ''), locks[0].replace('-', ''))
+        incremental = self.snapshot()
+        rebuild_grade_stats()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_api_writes_lock_the_grade(self):
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        grade = self.add_grade(5)
+        for method, payload in (('patch', {'value': 7}), ('delete', None)):
+            with CaptureQueriesContext(connection) as queries:
+                response = getattr(self.client, method)(f'/api/journal/grades/{grade.id}/', payload, format='json')
+            self.assertLess(response.status_code, 300, method)
+            self.assertTrue(
+                any(query['sql'].startswith('SELECT') and 'FOR UPDATE' in query['sql'] and '"grades"' in query['sql']
+                    for query in queries),
+                method,
+            )
+        self.assertEqual(self.snapshot(), ([], []))
+
+    def test_migration_backfills_existing_grades(self):
+        self.add_grade(6)
+        self.add_grade(8, GradeType.EXAM, date(2024, 11, 1))
+        incremental = self.snapshot()
+        StudentCourseGradeStats.objects.all().delete()
+        CoursePeriodGradeStats.objects.all().delete()
+
+        migration = import_module('journal.migrations.0003_grade_stats')
+        migration.backfill_grade_stats(apps, None)
+        self.assertEqual(self.snapshot(), incremental)
+        self.assertEqual(len(incremental[1]), 2)
+
+
+class GradebookMatrixTest(JournalTestCase):
+    def test_matrix(self):
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        first, second = [self.add_lesson(date(2024, 10, day)) for day in (1, 2)]
+        cell = self.add_grade(8, lesson=second, day=date(2024, 10, 2))
+        loose = self.add_grade(6, GradeType.HOMEWORK, date(2024, 10, 5))
+
+        self.assertEqual(self.client.get('/api/journal/grades/gradebook/').status_code, 400)
+        response = self.client.get('/api/journal/grades/gradebook/', {'course_id': self.course.id})
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([row['id'] for row in data['students']], [str(self.student.id)])
+        self.assertEqual([lesson['id'] for lesson in data['lessons']], [str(first.id), str(second.id)])
+        self.assertEqual(data['ids'], [[None, str(cell.id)]])
+        self.assertEqual(data['types'], [[None, GradeType.QUIZ]])
+        self.assertEqual(data['other']['id'], [str(loose.id)])
+
+        # The query count does not grow with the roster or the number of lessons
+        for index in range(3):
+            user = User.objects.create_user(email=f'student{index}@test.com', password='test123')
+            Student.objects.create(
+                user=user, school=self.school, class_group=self.class_group,
+                student_number=f'STU10{index}', enrollment_date=date(2024, 9, 1)
+            )
+        teacher = User.objects.get(pk=self.teacher_user.pk)
+        build_gradebook(self.course.id, teacher)
+        with self.assertNumQueries(3):
+            payload = build_gradebook(self.course.id, teacher)
+        self.assertEqual(len(payload['values']), 4)
+
+
+class GradeStatisticsTest(JournalTestCase):
+    def test_grouped_statistics_and_distribution(self):
+        for value, grade_type, day in ((4, GradeType.QUIZ, 1), (6, GradeType.QUIZ, 2), (6, GradeType.QUIZ, 3),
+                                       (10, GradeType.EXAM, 4)):
+            self.add_grade(value, grade_type, date(2024, 10, day))
+
+        with self.assertNumQueries(1):
+            groups = grade_statistics(Grade.objects.all(), ['type'], distribution=True)
+        self.assertEqual([group['type'] for group in groups], [GradeType.EXAM, GradeType.QUIZ])
+        quiz = groups[1]
+        self.assertEqual(quiz['total_grades'], 3)
+        self.assertEqual(quiz['histogram'], [{'value': Decimal('4'), 'count': 1}, {'value': Decimal('6'), 'count': 2}])
+        self.assertEqual(quiz['percentiles']['p25'], Decimal('5'))
+        self.assertEqual(quiz['percentiles']['p50'], Decimal('6'))
+
+        # Without a distribution: one row per group, the same aggregates
+        plain = grade_statistics(Grade.objects.all(), ['course', 'month'])
+        self.assertEqual(len(plain), 1)
+        self.assertEqual(plain[0]['month'], '2024-10')
+        self.assertEqual((plain[0]['total_grades'], plain[0]['min_grade'], plain[0]['max_grade']), (4, 4, 10))
+
+        response = self.client.get('/api/journal/grades/statistics/', {'group_by': 'type,bogus'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/journal/grades/statistics/', {'distribution': 'true'})
+        self.assertEqual(response.json()['total_grades'], 4)
+
+    def test_period_reads_aggregate(self):
+        self.add_grade(6, day=date(2024, 1, 15))
+        for period in ('2024-01', '2024-1'):
+            response = self.client.get('/api/journal/grades/statistics/', {'course_id': self.course.id, 'period': period})
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['total_grades'], 1, period)
+        for period in ('2024-13', '9999-12', '99999999999999999999-01'):
+            response = self.client.get('/api/journal/grades/statistics/', {'course_id': self.course.id, 'period': period})
+            self.assertEqual(response.status_code, 400, period)
+
+
+class GradeCursorPaginationTest(JournalTestCase):
+    ordering = ('-date', '-id')
+
+    def test_pages_follow_next_link(self):
+        for day in (1, 1, 1, 2, 3):
+            self.add_grade(7, day=date(2024, 10, day))
+        seen = []
+        response = self.client.get('/api/journal/grades/', {'pagination': 'cursor', 'page_size': 2, 'fields': 'id'})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.json()['results']]
+            if not response.json()['next']:
+                break
+            response = self.client.get(response.json()['next'])
+        expected = Grade.objects.order_by(*self.ordering).values_list('id', flat=True)
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_cursor_seeks_the_date_index(self):
+        for day in range(1, 11):
+            self.add_grade(7, day=date(2024, 10, day))
+        last = Grade.objects.order_by(*self.ordering)[3]
+        queryset = Grade.objects.filter(
+            KeysetPagination().after(self.ordering, [last.date, last.id])
+        ).order_by(*self.ordering)[:3]
+        self.assertEqual(len(queryset), 3)
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')  # a table this small is otherwise read whole
+        plan = queryset.explain()
+        index_conditions = [line for line in plan.splitlines() if 'Index Cond' in line]
+        self.assertTrue(any('date <=' in line for line in index_conditions), plan)
+
+
+class FinalGradeTest(JournalTestCase):
+    url = '/api/journal/final-grades/compute/'
+
+    def test_grading_policy(self):
+        policy = GradingPolicy({'scale': '10-point', 'min': 0, 'max': 10, 'weights': {'exam': 3, 'participation': 0}})
+        weighted_average, value, breakdown = policy.evaluate({
+            'exam': (1, Decimal('10')),
+            'homework': (2, Decimal('13')),
+            'participation': (1, Decimal('1')),
+        })
+        self.assertEqual(weighted_average, Decimal('9.125'))
+        self.assertEqual(value, Decimal('9'))
+        self.assertEqual(breakdown['homework'], {'count': 2, 'average': '6.50', 'weight': '1'})
+
+    def test_grading_policy_rounding_and_clamp(self):
+        by_type = {'quiz': (2, Decimal('17'))}
+        self.assertEqual(GradingPolicy({'rounding': 'floor'}).evaluate(by_type)[1], Decimal('8'))
+        self.assertEqual(GradingPolicy({'rounding': 'half_even'}).evaluate(by_type)[1], Decimal('8'))
+        self.assertEqual(GradingPolicy({'precision': 1}).evaluate(by_type)[1], Decimal('8.5'))
+        self.assertEqual(GradingPolicy({'max': 5}).evaluate(by_type)[1], Decimal('5'))
+        self.assertIsNone(GradingPolicy({'weights': {'quiz': 0}}).evaluate(by_type))
+        with self.assertRaises(ValidationError):
+            GradingPolicy({'rounding': 'up'})
+
+    def test_compute_final_grades(self):
+        self.school.grading_system = {'scale': '10-point', 'min': 0, 'max': 10, 'weights': {'exam': 3}}
+        self.school.save()
+        for value, grade_type, day in ((10, GradeType.EXAM, date(2024, 12, 1)),
+                                       (6, GradeType.HOMEWORK, date(2024, 10, 1)),
+                                       (7, GradeType.HOMEWORK, date(2024, 10, 2)),
+                                       (2, GradeType.QUIZ, date(2025, 7, 1))):  # after the year
+            self.add_grade(value, grade_type, day)
+
+        final_grades = compute_final_grades(Course.objects.select_related('school'), 'year')
+        self.assertEqual(len(final_grades), 1)
+        final = FinalGrade.objects.get(student=self.student, course=self.course, term='year')
+        self.assertEqual(final.weighted_average, Decimal('9.125'))
+        self.assertEqual(final.value, Decimal('9'))
+        self.assertEqual(set(final.breakdown), {'exam', 'homework'})
+
+        # Recomputing replaces the rows
+        Grade.objects.filter(type=GradeType.EXAM).delete()
+        compute_final_grades(Course.objects.select_related('school'), 'year')
+        self.assertEqual(FinalGrade.objects.get().value, Decimal('7'))  # 6.5 rounded half up
+
+        out = StringIO()
+        call_command('compute_final_grades', '--school', str(self.school.id), '--term', 'year', stdout=out)
+        self.assertIn('no current academic year', out.getvalue())
+        self.academic_year.is_current = True
+        self.academic_year.save()
+        out = StringIO()
+        call_command('compute_final_grades', '--school', str(self.school.id), '--term', 'year', stdout=out)
+        self.assertIn('Computed 1 final grades', out.getvalue())
+
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        response = self.client.post(self.url, {'course': str(self.course.id), 'term': 'year'}, format='json')
+        self.assertEqual(response.json(), {'term': 'year', 'computed': 1})
+        response = self.client.post(self.url, {'course': str(self.course.id), 'term': 'Q9'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get('/api/journal/final-grades/', {'course_id': self.course.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['value'] for row in response.json()['results']], ['7.00'])
+
+        self.client.force_authenticate(self.user)  # a user without a staff role
+        response = self.client.post(self.url, {'course': str(self.course.id), 'term': 'year'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+    def test_compute_is_scoped_to_the_school(self):
+        self.academic_year.is_current = True
+        self.academic_year.save()
+        self.add_grade(8)
+        other_school = School.objects.create(name='Other School')
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        admin = User.objects.create_user(email='admin@test.com', password='test123')
+        UserRole.objects.create(user=admin, school=other_school, role=Role.SCHOOLADMIN)
+        course = {'course': str(self.course.id), 'term': 'year'}
+        school = {'school': str(self.school.id), 'term': 'year'}
+
+        # A teacher computes courses of their school, but not the whole school
+        self.assertEqual(self.client.post(self.url, course, format='json').json()['computed'], 1)
+        self.assertEqual(self.client.post(self.url, school, format='json').status_code, 403)
+        response = self.client.post(self.url, {'course': str(uuid.uuid4()), 'term': 'year'}, format='json')
+        self.assertEqual(response.json(), {'course': ['Course not found.']})
+
+        # An admin of another school can touch neither
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.post(self.url, course, format='json').status_code, 403)
+        self.assertEqual(self.client.post(self.url, school, format='json').status_code, 403)
+
+        UserRole.objects.create(user=admin, school=self.school, role=Role.DIRECTOR)
+        response = self.client.post(self.url, school, format='json')
+        self.assertEqual(response.json(), {'term': 'year', 'computed': 1})
+
+
+class FeedbackSearchTest(JournalTestCase):
+    url = '/api/journal/feedback/'
+
+    def add_feedback(self, text, tags, day):
+        return Feedback.objects.create(
+            from_user=self.teacher_user, to_student=self.student, text=text, tags=tags, date=date(2024, 10, day)
+        ).id
+
+    def ids(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return [row['id'] for row in response.json()['results']]
+
+    def test_search_and_tags(self):
+        both = self.add_feedback('Great homework, homework essays improved a lot', ['homework', 'praise'], 1)
+        once = self.add_feedback('Forgot the homework again', ['homework'], 2)
+        other = self.add_feedback('Active in class', ['praise'], 3)
+
+        self.assertEqual(self.ids(tags='homework'), [str(once), str(both)])  # newest first
+        self.assertEqual(self.ids(tags='homework, praise'), [str(both)])
+        self.assertEqual(self.ids(tags='absent'), [])
+        # English stemming; the more relevant text ranks first
+        self.assertEqual(self.ids(q='homeworks', lang='en'), [str(both), str(once)])
+        self.assertEqual(self.ids(q='homework -forgot', lang='en'), [str(both)])
+        self.assertEqual(self.ids(q='class'), [str(other)])  # the user's language (ru) by default
+        # 'simple' (kz) does not stem: only the exact word matches
+        self.assertEqual(self.ids(q='homeworks', lang='kz'), [])
+        self.assertEqual(self.ids(q='homework', lang='en', tags='praise'), [str(both)])
+
+
+class SparseFieldsetsTest(JournalTestCase):
+    url = '/api/journal/grades/'
+
+    def test_plan_queryset(self):
+        self.add_grade(7)
+        serializer = trim_fields(GradeSerializer(many=True), fields={'id', 'value', 'course_name'})
+        serializer.instance = plan_queryset(Grade.objects.all(), serializer)
+        with self.assertNumQueries(1):
+            data = serializer.data
+        self.assertEqual(set(data[0]), {'id', 'value', 'course_name'})
+        self.assertEqual(data[0]['course_name'], self.course.name)
+
+    def test_planned_list_query_count(self):
+        for value in (5, 6, 7):
+            self.add_grade(value)
+        serializer = GradeSerializer(many=True)
+        serializer.instance = plan_queryset(Grade.objects.all(), serializer)
+        with self.assertNumQueries(1):
+            data = serializer.data
+        self.assertEqual(len(data), 3)
+        self.assertEqual(data[0]['course_name'], self.course.name)
+
+    def test_trim_fields_and_column_plan(self):
+        self.add_grade(7, comment='Well done')
+        untouched = GradeSerializer(many=True)
+        self.assertIs(trim_fields(untouched), untouched)
+        self.assertIn('student_name', untouched.child.fields)
+
+        slim = trim_fields(GradeSerializer(many=True), slim=True, expand={'course_name'})
+        self.assertNotIn('student_name', slim.child.fields)
+        self.assertNotIn('recorded_by_name', slim.child.fields)
+        self.assertIn('course_name', slim.child.fields)
+        self.assertIn('comment', slim.child.fields)
+
+        # Only the columns the trimmed serializer reads are loaded, plus the join it needs
+        serializer = trim_fields(GradeSerializer(many=True), fields={'id', 'value'})
+        grade = plan_queryset(Grade.objects.all(), serializer).get()
+        self.assertIn('comment', grade.get_deferred_fields())
+        self.assertNotIn('value', grade.get_deferred_fields())
+        queryset = plan_queryset(Grade.objects.all(), trim_fields(GradeSerializer(), fields={'course_name'}))
+        self.assertEqual(queryset.query.select_related, {'course': {}})
+        # A queryset that already chose its joins keeps its columns
+        grade = plan_queryset(Grade.objects.select_related('student'), serializer).get()
+        self.assertEqual(grade.get_deferred_fields(), set())
+
+    def test_api(self):
+        for value in (5, 6, 7):
+            self.add_grade(value, day=date(2024, 10, value))
+
+        rows = self.client.get(self.url, {'fields': 'id,value,course_name'}).json()['results']
+        self.assertEqual([set(row) for row in rows], [{'id', 'value', 'course_name'}] * 3)
+        self.assertEqual(rows[0]['course_name'], self.course.name)
+
+        row = self.client.get(self.url, {'slim': 'true', 'expand': 'student_name'}).json()['results'][0]
+        self.assertIn('student_name', row)
+        self.assertNotIn('course_name', row)
+        self.assertIn('comment', row)
+
+        row = self.client.get(self.url, {'pagination': 'cursor', 'fields': 'id'}).json()['results'][0]
+        self.assertEqual(set(row), {'id'})
+
+        # Writes are not trimmed
+        UserRole.objects.create(user=self.teacher_user, school=self.school, role=Role.TEACHER)
+        response = self.client.post(f'{self.url}?fields=id', {
+            'student': str(self.student.id), 'course': str(self.course.id),
+            'value': 8, 'type': GradeType.EXAM, 'date': '2024-10-20',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn('course_name', response.json())
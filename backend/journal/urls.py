@@ -1,10 +1,11 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import GradeViewSet, FeedbackViewSet
+from .views import GradeViewSet, FeedbackViewSet, FinalGradeViewSet
 
 router = DefaultRouter()
 router.register(r'grades', GradeViewSet, basename='grade')
 router.register(r'feedback', FeedbackViewSet, basename='feedback')
+router.register(r'final-grades', FinalGradeViewSet, basename='finalgrade')
 
 urlpatterns = router.urls
 
@@ -1,76 +1,189 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import transaction
 from django.db.models import Avg, Count
-from .models import Grade, Feedback
-from .serializers import GradeSerializer, FeedbackSerializer
+from .aggregates import summarize
+from .grading import compute_final_grades, courses_for_final_grades
+from .models import (
+    Grade,
+    Feedback,
+    StudentCourseGradeStats,
+    CoursePeriodGradeStats,
+    FinalGrade,
+    FEEDBACK_SEARCH_CONFIGS,
+)
+from .serializers import (
+    GradeSerializer,
+    FeedbackSerializer,
+    GradeBulkSaveSerializer,
+    FinalGradeSerializer,
+    FinalGradeComputeSerializer,
+)
+from .services import save_gradebook, build_gradebook, grade_statistics, STATISTICS_GROUPS
+from schedule.models import Course
+from schools.terms import month_range, term_range
+from students.visibility import filter_visible, get_visible_student_ids
+from users.models import Role
+from users.pagination import PageNumberOrKeysetPagination
+from users.query_planning import SparseFieldsetsMixin
 from users.permissions import IsTeacher, IsSchoolAdmin, IsSuperAdmin, IsParent, IsStudent
 
 
-class GradeViewSet(viewsets.ModelViewSet):
+class GradeViewSet(SparseFieldsetsMixin, viewsets.ModelViewSet):
     """Grade viewset."""
     queryset = Grade.objects.all()
     serializer_class = GradeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = PageNumberOrKeysetPagination
+    # Seeks the (date, id) index, or (student, date) / (course, date) when filtered
+    keyset_ordering = ('-date', '-id')
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'bulk_save']:
             return [IsTeacher() | IsSchoolAdmin() | IsSuperAdmin()]
         return super().get_permissions()
     
     def perform_create(self, serializer):
         serializer.save(recorded_by=self.request.user)
     
+    # Updates and deletes load the grade FOR UPDATE, so the aggregate delta
+    # (journal.aggregates) subtracts the value it replaces rather than one a
+    # concurrent write has already changed.
+    @transaction.atomic
+    def update(self, request, *args, **kwargs):
+        return super().update(request, *args, **kwargs)
+    
+    @transaction.atomic
+    def destroy(self, request, *args, **kwargs):
+        return super().destroy(request, *args, **kwargs)
+    
+    def get_date_range(self):
+        """[start, end) from ?period=YYYY-MM or ?term=<code> (with academic_year_id or course_id)."""
+        params = self.request.query_params
+        term = params.get('term')
+        if term:
+            academic_year_id = params.get('academic_year_id')
+            if not academic_year_id and params.get('course_id'):
+                academic_year_id = Course.objects.filter(id=params['course_id']).values_list(
+                    'academic_year_id', flat=True
+                ).first()
+            if not academic_year_id:
+                raise ValidationError({'term': ['academic_year_id or course_id is required with term.']})
+            return term_range(academic_year_id, term)
+        if params.get('period'):
+            return month_range(params['period'])
+        return None
+    
     def get_queryset(self):
         queryset = Grade.objects.all()
         student_id = self.request.query_params.get('student_id')
         course_id = self.request.query_params.get('course_id')
-        period = self.request.query_params.get('period')  # e.g., '2024-01'
-        
-        user = self.request.user
+        date_range = self.get_date_range()
         
-        # Students can only see their own grades
-        if user.has_role('student'):
-            try:
-                student = user.student_profile
-                queryset = queryset.filter(student=student)
-            except:
-                queryset = Grade.objects.none()
-        
-        # Parents can only see their children's grades
-        if user.has_role('parent'):
-            children_ids = [sp.student_id for sp in user.children.all()]
-            queryset = queryset.filter(student_id__in=children_ids)
+        # Students see their own grades, parents their children's
+        queryset = filter_visible(queryset, self.request.user)
         
         if student_id:
             queryset = queryset.filter(student_id=student_id)
         if course_id:
             queryset = queryset.filter(course_id=course_id)
-        if period:
-            year, month = map(int, period.split('-'))
-            queryset = queryset.filter(date__year=year, date__month=month)
+        if date_range:
+            # Half-open range so the (student, date) / (course, date) indexes apply
+            queryset = queryset.filter(date__gte=date_range[0], date__lt=date_range[1])
+        if self.action in ('update', 'partial_update', 'destroy'):
+            queryset = queryset.select_for_update()
         
         return queryset
     
     @action(detail=False, methods=['get'])
     def statistics(self, request):
-        """Get grade statistics."""
+        """Get grade statistics.
+        
+        ?group_by=course,class_group,type,month,student returns one row per group;
+        ?distribution=true adds value histograms and percentiles. Without them,
+        student_id + course_id, course_id + period and course_id alone are read
+        from the maintained aggregates; other filters (e.g. term) fall back to
+        aggregating grades.
+        """
         student_id = request.query_params.get('student_id')
         course_id = request.query_params.get('course_id')
+        period = request.query_params.get('period')
+        term = request.query_params.get('term')
+        group_by = [name for name in request.query_params.get('group_by', '').split(',') if name]
+        distribution = request.query_params.get('distribution', '').lower() in ('1', 'true')
         
-        queryset = self.get_queryset()
-        if student_id:
-            queryset = queryset.filter(student_id=student_id)
-        if course_id:
-            queryset = queryset.filter(course_id=course_id)
+        unknown = [name for name in group_by if name not in STATISTICS_GROUPS]
+        if unknown:
+            return Response(
+                {'group_by': [f'Unknown group: {", ".join(unknown)}. Use {", ".join(STATISTICS_GROUPS)}.']},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if group_by or distribution:
+            groups = grade_statistics(self.get_queryset(), group_by, distribution)
+            if group_by:
+                return Response({'group_by': group_by, 'groups': groups})
+            return Response(groups[0] if groups else {'total_grades': 0, 'avg_grade': None})
+        
+        visible_ids = get_visible_student_ids(request.user)
+        if course_id and student_id and not period and not term:
+            if visible_ids is None or student_id in visible_ids:
+                return Response(summarize(
+                    StudentCourseGradeStats.objects.filter(student_id=student_id, course_id=course_id)
+                ))
+        elif course_id and not student_id and not term and visible_ids is None:
+            if period:
+                # Validated and normalized to the stored key ('2024-1' -> '2024-01')
+                period = month_range(period)[0].strftime('%Y-%m')
+                rows = CoursePeriodGradeStats.objects.filter(course_id=course_id, period=period)
+            else:
+                rows = StudentCourseGradeStats.objects.filter(course_id=course_id)
+            return Response(summarize(rows))
         
+        queryset = self.get_queryset()
         stats = queryset.aggregate(
             avg_grade=Avg('value'),
             total_grades=Count('id')
         )
+        stats['by_type'] = {
+            row['type']: {'count': row['count'], 'avg_grade': row['avg_grade']}
+            for row in queryset.order_by('type').values('type').annotate(
+                count=Count('id'), avg_grade=Avg('value')
+            )
+        }
         
         return Response(stats)
+    
+    @action(detail=False, methods=['get'])
+    def gradebook(self, request):
+        """Students × lessons grade matrix of a course (?course_id=, optional ?period= or ?term=)."""
+        course_id = request.query_params.get('course_id')
+        if not course_id:
+            return Response({'course_id': ['This parameter is required.']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        payload = build_gradebook(course_id, request.user, date_range=self.get_date_range())
+        if payload is None:
+            return Response({'detail': 'Course not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(payload)
+    
+    @action(detail=False, methods=['post'])
+    def bulk_save(self, request):
+        """Save a grid of grade cells for a course in one transaction."""
+        serializer = GradeBulkSaveSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        course = Course.objects.select_related('school').filter(
+            id=serializer.validated_data['course']
+        ).first()
+        if not course:
+            return Response({'course': ['Course not found.']}, status=status.HTTP_400_BAD_REQUEST)
+        
+        results, counts = save_gradebook(course, serializer.validated_data['cells'], request.user)
+        if counts is None:
+            return Response({'results': results}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results, **counts})
 
 
 class FeedbackViewSet(viewsets.ModelViewSet):
@@ -88,26 +201,98 @@ class FeedbackViewSet(viewsets.ModelViewSet):
         serializer.save(from_user=self.request.user)
     
     def get_queryset(self):
-        queryset = Feedback.objects.all()
-        student_id = self.request.query_params.get('student_id')
-        
-        user = self.request.user
+        """Feedback in the user's scope.
         
-        # Students can only see feedback to them
-        if user.has_role('student'):
-            try:
-                student = user.student_profile
-                queryset = queryset.filter(to_student=student)
-            except:
-                queryset = Feedback.objects.none()
+        Filters: student_id, class_group_id, school_id, tags (comma-separated,
+        all must match; jsonb @> on a GIN index) and q (full-text, ranked; the
+        config follows ?lang= or the user's language and uses its GIN index).
+        """
+        queryset = Feedback.objects.all()
+        params = self.request.query_params
+        student_id = params.get('student_id')
         
-        # Parents can only see feedback to their children
-        if user.has_role('parent'):
-            children_ids = [sp.student_id for sp in user.children.all()]
-            queryset = queryset.filter(to_student_id__in=children_ids)
+        # Students see their own feedback, parents their children's
+        queryset = filter_visible(queryset, self.request.user, field='to_student')
         
         if student_id:
             queryset = queryset.filter(to_student_id=student_id)
+        if params.get('class_group_id'):
+            queryset = queryset.filter(to_student__class_group_id=params['class_group_id'])
+        if params.get('school_id'):
+            queryset = queryset.filter(to_student__school_id=params['school_id'])
+        tags = [tag.strip() for tag in params.get('tags', '').split(',') if tag.strip()]
+        if tags:
+            queryset = queryset.filter(tags__contains=tags)
         
-        return queryset
+        search = params.get('q', '').strip()
+        if search:
+            language = params.get('lang') or getattr(self.request.user, 'language_pref', None)
+            config = FEEDBACK_SEARCH_CONFIGS.get(language, FEEDBACK_SEARCH_CONFIGS['ru'])
+            vector = SearchVector('text', config=config)
+            query = SearchQuery(search, config=config, search_type='websearch')
+            return (
+                queryset.alias(search=vector)
+                .filter(search=query)
+                .annotate(rank=SearchRank(vector, query))
+                .order_by('-rank', '-date')
+            )
+        return queryset.order_by('-date', '-created_at')
 
+
+class FinalGradeViewSet(viewsets.ReadOnlyModelViewSet):
+    """Computed term/final grades; POST compute recalculates them."""
+    serializer_class = FinalGradeSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_permissions(self):
+        if self.action == 'compute':
+            return [IsTeacher() | IsSchoolAdmin() | IsSuperAdmin()]
+        return super().get_permissions()
+    
+    def get_queryset(self):
+        queryset = FinalGrade.objects.select_related('student__user', 'course').order_by('course_id', 'term')
+        params = self.request.query_params
+        
+        # Students see their own grades, parents their children's
+        queryset = filter_visible(queryset, self.request.user)
+        
+        if params.get('student_id'):
+            queryset = queryset.filter(student_id=params['student_id'])
+        if params.get('course_id'):
+            queryset = queryset.filter(course_id=params['course_id'])
+        if params.get('term'):
+            queryset = queryset.filter(term=params['term'])
+        return queryset
+    
+    @action(detail=False, methods=['post'])
+    def compute(self, request):
+        """Recompute final grades of a course, or of a whole school (admins) for a term.
+        
+        The requester needs a staff role in the course's school, or an
+        administrator role in the school being recomputed.
+        """
+        serializer = FinalGradeComputeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        admin_roles = (Role.SCHOOLADMIN, Role.DIRECTOR, Role.SUPERADMIN)
+        if data.get('school'):
+            school_id = data['school']
+            roles = admin_roles
+            denied = 'Only administrators of this school can recompute it.'
+        else:
+            school_id = Course.objects.filter(id=data['course']).values_list('school_id', flat=True).first()
+            if school_id is None:
+                return Response({'course': ['Course not found.']}, status=status.HTTP_400_BAD_REQUEST)
+            roles = (Role.TEACHER, *admin_roles)
+            denied = "You have no staff role in this course's school."
+        access = request.user.access
+        if not access.is_superuser and not access.has_school_role(school_id, *roles):
+            return Response({'detail': denied}, status=status.HTTP_403_FORBIDDEN)
+        
+        courses = courses_for_final_grades(
+            course_id=data.get('course'),
+            school_id=data.get('school'),
+            academic_year_id=data.get('academic_year'),
+        )
+        final_grades = compute_final_grades(courses, data['term'])
+        return Response({'term': data['term'], 'computed': len(final_grades)})
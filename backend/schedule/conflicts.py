@@ -0,0 +1,211 @@
+"""
+Schedule conflict detection: weekly slots of one school and academic year
+that overlap in time for the same teacher, classroom or class group.
+
+All slots are read in one query, then each (resource, day) is swept once in
+start-time order, keeping the slots still running in a heap ordered by end
+time: O(n log n) plus the number of conflicts, instead of comparing every
+pair of slots.
+
+Teacher and classroom overlaps of slots and lessons are also rejected on
+write by exclusion constraints (see schedule.models), including a course
+teacher change that moves its slots onto a busy teacher; overlap_conflicts()
+turns a violation into a 409 response listing the rows in the way.
+"""
+import heapq
+from collections import defaultdict
+from contextlib import contextmanager
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from schools.models import AcademicYear
+from .models import Course, Lesson, ScheduleSlot
+
+# Exclusion constraint -> resource it protects
+OVERLAP_CONSTRAINTS = {
+    'schedule_slot_teacher_overlap': 'teacher',
+    'schedule_slot_classroom_overlap': 'classroom',
+    'lesson_teacher_overlap': 'teacher',
+    'lesson_classroom_overlap': 'classroom',
+}
+
+# Resource type -> slot value identifying it, and its display name
+CONFLICT_RESOURCES = {
+    'teacher': ('course__teacher_id', 'teacher_name'),
+    'classroom': ('classroom', 'classroom'),
+    'class_group': ('course__class_group_id', 'course__class_group__name'),
+}
+
+
+def slots_for_conflicts(school_id, academic_year_id=None):
+    """Slot rows of a school's courses in an academic year (default: current), in one query."""
+    if not academic_year_id:
+        academic_year_id = AcademicYear.objects.filter(
+            school_id=school_id, is_current=True
+        ).values_list('id', flat=True).first()
+        if not academic_year_id:
+            raise ValidationError({'academic_year_id': ['The school has no current academic year.']})
+    return academic_year_id, list(
+        ScheduleSlot.objects.filter(course__school_id=school_id, course__academic_year_id=academic_year_id)
+        .values(
+            'id', 'course_id', 'course__name', 'day_of_week', 'start_time', 'end_time', 'classroom',
+            'course__teacher_id', 'course__teacher__user__first_name', 'course__teacher__user__last_name',
+            'course__class_group_id', 'course__class_group__name',
+        )
+        .order_by('day_of_week', 'start_time', 'end_time')
+    )
+
+
+def _overlaps(slots):
+    """Overlapping pairs among slots of one resource and day (sorted by start time)."""
+    running = []  # (end_time, index) of slots not finished yet
+    for index, slot in enumerate(slots):
+        while running and running[0][0] <= slot['start_time']:
+            heapq.heappop(running)
+        for _, other in running:
+            yield slots[other], slot
+        heapq.heappush(running, (slot['end_time'], index))
+
+
+def _slot_data(slot):
+    # Same shape as ScheduleSlotSerializer
+    return {
+        'id': slot['id'],
+        'course': slot['course_id'],
+        'course_name': slot['course__name'],
+        'day_of_week': slot['day_of_week'],
+        'start_time': slot['start_time'].isoformat(),
+        'end_time': slot['end_time'].isoformat(),
+        'classroom': slot['classroom'],
+    }
+
+
+def find_slot_conflicts(slots):
+    """
+    Conflicts among slot rows (see slots_for_conflicts), grouped by resource.
+
+    Returns:
+        list of {'type', 'resource', 'resource_name', 'conflicts'}, where each
+        conflict is {'type', 'day_of_week', 'slot1', 'slot2'}.
+    """
+    for slot in slots:
+        slot['teacher_name'] = ' '.join(filter(None, [
+            slot['course__teacher__user__first_name'], slot['course__teacher__user__last_name']
+        ]))
+    groups = []
+    for conflict_type, (key, name) in CONFLICT_RESOURCES.items():
+        by_resource = defaultdict(lambda: defaultdict(list))
+        for slot in slots:
+            if slot[key]:
+                by_resource[slot[key]][slot['day_of_week']].append(slot)
+        for resource, days in by_resource.items():
+            conflicts = [
+                {
+                    'type': conflict_type,
+                    'day_of_week': day,
+                    'slot1': _slot_data(first),
+                    'slot2': _slot_data(second),
+                }
+                for day, day_slots in sorted(days.items())
+                for first, second in _overlaps(day_slots)
+            ]
+            if conflicts:
+                groups.append({
+                    'type': conflict_type,
+                    'resource': resource,
+                    'resource_name': days[conflicts[0]['day_of_week']][0][name],
+                    'conflicts': conflicts,
+                })
+    return groups
+
+
+class ScheduleConflictError(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The time overlaps another entry of the same teacher or classroom.'
+    default_code = 'schedule_conflict'
+
+
+def _overlapping(instance, resource):
+    """
+    Rows in the way of the instance for the resource (one indexed query): rows
+    of its own model, or for a course the new teacher's slots overlapping the
+    course's slots.
+    """
+    model = type(instance)
+    if model is Course:
+        # Only a teacher change fails for a course: its slots move to the new teacher
+        own_slots = ScheduleSlot.objects.filter(
+            course_id=instance.pk,
+            day_of_week=OuterRef('day_of_week'),
+            start_time__lt=OuterRef('end_time'),
+            end_time__gt=OuterRef('start_time'),
+        )
+        day = 'day_of_week'
+        rows = (
+            ScheduleSlot.objects.filter(teacher_id=instance.teacher_id)
+            .exclude(course_id=instance.pk)
+            .filter(Exists(own_slots))
+        )
+    elif model in (ScheduleSlot, Lesson):
+        if model is ScheduleSlot:
+            if instance.teacher_id is None:
+                instance.teacher_id = instance.course.teacher_id
+            day = 'day_of_week'
+        else:
+            day = 'date'
+        key = 'teacher_id' if resource == 'teacher' else resource
+        rows = model.objects.filter(
+            **{key: getattr(instance, key), day: getattr(instance, day)},
+            start_time__lt=instance.end_time,
+            end_time__gt=instance.start_time,
+        ).exclude(pk=instance.pk)
+    else:
+        return []
+    rows = rows.values('id', 'course_id', 'course__name', day, 'start_time', 'end_time', 'classroom')
+    return [
+        {
+            'id': str(row['id']),
+            'course': str(row['course_id']),
+            'course_name': row['course__name'],
+            day: str(row[day]),
+            'start_time': row['start_time'].isoformat(),
+            'end_time': row['end_time'].isoformat(),
+            'classroom': row['classroom'],
+        }
+        for row in rows
+    ]
+
+
+@contextmanager
+def overlap_conflicts(serializer):
+    """
+    Run serializer.save() (or anything writing schedule rows) in a savepoint
+    and raise ScheduleConflictError if an overlap constraint rejects it.
+    """
+    try:
+        with transaction.atomic():
+            yield
+    except IntegrityError as exc:
+        diag = getattr(exc.__cause__, 'diag', None)
+        resource = OVERLAP_CONSTRAINTS.get(getattr(diag, 'constraint_name', None))
+        if resource is None:
+            raise
+        instance = serializer.instance or serializer.Meta.model(**serializer.validated_data)
+        raise ScheduleConflictError({
+            'error': 'Schedule conflict',
+            'resource': resource,
+            'conflicts': _overlapping(instance, resource),
+        }) from exc
+
+
+class OverlapConflictsMixin:
+    """Viewset mixin: saves of schedule rows answer 409 on overlaps (see overlap_conflicts)."""
+
+    def perform_create(self, serializer):
+        with overlap_conflicts(serializer):
+            super().perform_create(serializer)
+
+    def perform_update(self, serializer):
+        with overlap_conflicts(serializer):
+            super().perform_update(serializer)
@@ -0,0 +1,101 @@
+# Generated by Django 5.0.1 on 2026-10-17 01:04
+
+import django.contrib.postgres.constraints
+import django.db.models.deletion
+import schedule.models
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations, models
+from django.db.models import Exists, F, OuterRef, Subquery
+
+
+def copy_course_teachers(apps, schema_editor):
+    ScheduleSlot = apps.get_model('schedule', 'ScheduleSlot')
+    Course = apps.get_model('schedule', 'Course')
+    ScheduleSlot.objects.update(
+        teacher_id=Subquery(Course.objects.filter(pk=OuterRef('course_id')).values('teacher_id')[:1])
+    )
+
+
+# (model, resource, day) covered by the exclusion constraints below
+OVERLAP_CHECKS = [
+    ('Lesson', 'teacher_id', 'date'),
+    ('Lesson', 'classroom', 'date'),
+    ('ScheduleSlot', 'teacher_id', 'day_of_week'),
+    ('ScheduleSlot', 'classroom', 'day_of_week'),
+]
+MAX_REPORTED_ROWS = 50
+
+
+def find_constraint_violations(apps):
+    """Rows the constraints would reject: end before start, or overlapping another row."""
+    problems = []
+    for model_name in ('Lesson', 'ScheduleSlot'):
+        model = apps.get_model('schedule', model_name)
+        for row in model.objects.filter(end_time__lt=F('start_time')).values('id', 'start_time', 'end_time'):
+            problems.append(f"{model_name} {row['id']}: ends at {row['end_time']} before it starts at {row['start_time']}")
+    for model_name, resource, day in OVERLAP_CHECKS:
+        model = apps.get_model('schedule', model_name)
+        others = model.objects.filter(
+            **{resource: OuterRef(resource), day: OuterRef(day)},
+            start_time__lt=OuterRef('end_time'),
+            end_time__gt=OuterRef('start_time'),
+        ).exclude(pk=OuterRef('pk'))
+        rows = model.objects.exclude(**{resource: ''} if resource == 'classroom' else {f'{resource}__isnull': True})
+        for row in rows.filter(Exists(others)).order_by(resource, day, 'start_time').values(
+            'id', resource, day, 'start_time', 'end_time'
+        ):
+            problems.append(
+                f"{model_name} {row['id']}: {resource.removesuffix('_id')} {row[resource]} on {row[day]} "
+                f"{row['start_time']}-{row['end_time']} overlaps another row"
+            )
+    return problems
+
+
+def check_no_overlaps(apps, schema_editor):
+    """Fail with the offending rows instead of a bare constraint error."""
+    problems = find_constraint_violations(apps)
+    if not problems:
+        return
+    lines = problems[:MAX_REPORTED_ROWS]
+    if len(problems) > MAX_REPORTED_ROWS:
+        lines.append(f'... and {len(problems) - MAX_REPORTED_ROWS} more')
+    raise RuntimeError(
+        'Resolve these schedule rows before adding the overlap constraints '
+        '(resolve-conflicts lists slot conflicts per school):\n' + '\n'.join(lines)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schedule', '0002_initial'),
+        ('staff', '0002_initial'),
+    ]
+
+    # Existing overlaps must be resolved first: check_no_overlaps lists them.
+    operations = [
+        BtreeGistExtension(),
+        migrations.AddField(
+            model_name='scheduleslot',
+            name='teacher',
+            field=models.ForeignKey(editable=False, help_text='Учитель курса', null=True, on_delete=django.db.models.deletion.CASCADE, related_name='schedule_slots', to='staff.staff'),
+        ),
+        migrations.RunPython(copy_course_teachers, migrations.RunPython.noop),
+        migrations.RunPython(check_no_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('teacher', '='), ('date', '='), (schedule.models.TimeOfDayRange('start_time', 'end_time'), '&&')], name='lesson_teacher_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='lesson',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('classroom', ''), _negated=True), expressions=[('classroom', '='), ('date', '='), (schedule.models.TimeOfDayRange('start_time', 'end_time'), '&&')], name='lesson_classroom_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduleslot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(expressions=[('teacher', '='), ('day_of_week', '='), (schedule.models.TimeOfDayRange('start_time', 'end_time'), '&&')], name='schedule_slot_teacher_overlap'),
+        ),
+        migrations.AddConstraint(
+            model_name='scheduleslot',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('classroom', ''), _negated=True), expressions=[('classroom', '='), ('day_of_week', '='), (schedule.models.TimeOfDayRange('start_time', 'end_time'), '&&')], name='schedule_slot_classroom_overlap'),
+        ),
+    ]
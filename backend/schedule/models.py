@@ -1,8 +1,34 @@
 import uuid
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateTimeRangeField, RangeOperators
 from django.db import models
 from django.core.validators import MinValueValidator, MaxValueValidator
 
 
+class TimeOfDayRange(models.Func):
+    """
+    [start, end) of two time columns as a tsrange on a fixed day, for the
+    overlap exclusion constraints (Postgres has no time range type).
+    """
+    function = 'TSRANGE'
+    template = "%(function)s(DATE '2000-01-01' + %(expressions)s, '[)')"
+    arg_joiner = ", DATE '2000-01-01' + "
+    output_field = DateTimeRangeField()
+
+
+def overlap_constraint(name, resource, day, condition=None):
+    """Exclusion constraint: no two rows with the same resource and day overlap in time."""
+    return ExclusionConstraint(
+        name=name,
+        expressions=[
+            (resource, RangeOperators.EQUAL),
+            (day, RangeOperators.EQUAL),
+            (TimeOfDayRange('start_time', 'end_time'), RangeOperators.OVERLAPS),
+        ],
+        condition=condition,
+    )
+
+
 class Course(models.Model):
     """Course/Program model."""
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -40,6 +66,11 @@ class Course(models.Model):
     
     def __str__(self):
         return f"{self.name} - {self.class_group.name}"
+    
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        # Keep the teacher copied onto the schedule slots in step
+        self.schedule_slots.exclude(teacher_id=self.teacher_id).update(teacher_id=self.teacher_id)
 
 
 class ScheduleSlot(models.Model):
@@ -53,6 +84,16 @@ class ScheduleSlot(models.Model):
     start_time = models.TimeField()
     end_time = models.TimeField()
     classroom = models.CharField(max_length=100, blank=True)
+    # Copied from the course (see save() and Course.save) so the overlap
+    # constraint can cover the teacher without a join.
+    teacher = models.ForeignKey(
+        'staff.Staff',
+        on_delete=models.CASCADE,
+        null=True,
+        editable=False,
+        related_name='schedule_slots',
+        help_text="Учитель курса"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -63,10 +104,21 @@ class ScheduleSlot(models.Model):
         indexes = [
             models.Index(fields=['course', 'day_of_week']),
         ]
+        constraints = [
+            overlap_constraint('schedule_slot_teacher_overlap', 'teacher', 'day_of_week'),
+            overlap_constraint(
+                'schedule_slot_classroom_overlap', 'classroom', 'day_of_week', condition=~models.Q(classroom='')
+            ),
+        ]
     
     def __str__(self):
         days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
         return f"{self.course.name} - {days[self.day_of_week]} {self.start_time}-{self.end_time}"
+    
+    def save(self, *args, **kwargs):
+        if self.course_id:
+            self.teacher_id = Course.objects.filter(pk=self.course_id).values_list('teacher_id', flat=True).get()
+        super().save(*args, **kwargs)
 
 
 class Lesson(models.Model):
@@ -95,6 +147,10 @@ class Lesson(models.Model):
             models.Index(fields=['teacher', 'date']),
             models.Index(fields=['date']),
         ]
+        constraints = [
+            overlap_constraint('lesson_teacher_overlap', 'teacher', 'date'),
+            overlap_constraint('lesson_classroom_overlap', 'classroom', 'date', condition=~models.Q(classroom='')),
+        ]
     
     def __str__(self):
         return f"{self.course.name} - {self.date} {self.start_time}"
@@ -4,6 +4,15 @@ from staff.serializers import StaffSerializer
 from students.serializers import ClassGroupSerializer
 
 
+def validate_time_range(attrs, instance=None):
+    """end_time must be after start_time (also on partial updates)."""
+    start_time = attrs.get('start_time', getattr(instance, 'start_time', None))
+    end_time = attrs.get('end_time', getattr(instance, 'end_time', None))
+    if start_time and end_time and end_time <= start_time:
+        raise serializers.ValidationError({'end_time': 'Must be after start_time.'})
+    return attrs
+
+
 class ScheduleSlotSerializer(serializers.ModelSerializer):
     """ScheduleSlot serializer."""
     course_name = serializers.CharField(source='course.name', read_only=True)
@@ -15,6 +24,9 @@ class ScheduleSlotSerializer(serializers.ModelSerializer):
             'start_time', 'end_time', 'classroom', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        return validate_time_range(attrs, self.instance)
 
 
 class CourseSerializer(serializers.ModelSerializer):
@@ -48,4 +60,7 @@ class LessonSerializer(serializers.ModelSerializer):
             'notes', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+    
+    def validate(self, attrs):
+        return validate_time_range(attrs, self.instance)
 
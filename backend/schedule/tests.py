@@ -0,0 +1,240 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from schools.models import School, AcademicYear
+from students.models import ClassGroup
+from staff.models import Staff, Subject, Position
+from users.models import UserRole, Role, Permission, RolePermission
+from .conflicts import find_slot_conflicts
+from .models import Course, ScheduleSlot, Lesson
+from datetime import date, time
+from importlib import import_module
+import uuid
+
+User = get_user_model()
+
+
+def slot_row(start, end, day=0, teacher=None, classroom='', class_group=None):
+    """A row shaped like slots_for_conflicts() output."""
+    return {
+        'id': uuid.uuid4(),
+        'course_id': uuid.uuid4(),
+        'course__name': 'Course',
+        'day_of_week': day,
+        'start_time': time(*start),
+        'end_time': time(*end),
+        'classroom': classroom,
+        'course__teacher_id': teacher,
+        'course__teacher__user__first_name': 'Ann',
+        'course__teacher__user__last_name': 'Lee',
+        'course__class_group_id': class_group,
+        'course__class_group__name': '10A' if class_group else None,
+    }
+
+
+class FindSlotConflictsTest(TestCase):
+    def pairs(self, slots):
+        return [
+            (group['type'], conflict['slot1']['start_time'], conflict['slot2']['start_time'])
+            for group in find_slot_conflicts(slots) for conflict in group['conflicts']
+        ]
+
+    def test_touching_slots_do_not_conflict(self):
+        teacher = uuid.uuid4()
+        slots = [slot_row((8, 0), (8, 45), teacher=teacher), slot_row((8, 45), (9, 30), teacher=teacher)]
+        self.assertEqual(find_slot_conflicts(slots), [])
+
+    def test_every_overlapping_pair_is_reported(self):
+        teacher = uuid.uuid4()
+        slots = [
+            slot_row((8, 0), (10, 0), teacher=teacher),
+            slot_row((8, 30), (9, 0), teacher=teacher),
+            slot_row((8, 45), (9, 30), teacher=teacher),
+            slot_row((9, 30), (10, 30), teacher=teacher),  # overlaps only the first
+            slot_row((8, 30), (9, 0), day=1, teacher=teacher),  # another day
+        ]
+        self.assertEqual(sorted(self.pairs(slots)), [
+            ('teacher', '08:00:00', '08:30:00'),
+            ('teacher', '08:00:00', '08:45:00'),
+            ('teacher', '08:00:00', '09:30:00'),
+            ('teacher', '08:30:00', '08:45:00'),
+        ])
+        group, = find_slot_conflicts(slots)
+        self.assertEqual((group['resource'], group['resource_name']), (teacher, 'Ann Lee'))
+
+    def test_resources_grouped_separately(self):
+        class_group = uuid.uuid4()
+        slots = [
+            slot_row((8, 0), (9, 0), teacher=uuid.uuid4(), classroom='101', class_group=class_group),
+            slot_row((8, 30), (9, 30), teacher=uuid.uuid4(), classroom='101', class_group=class_group),
+            slot_row((8, 30), (9, 30), teacher=uuid.uuid4(), classroom='102'),
+        ]
+        groups = find_slot_conflicts(slots)
+        self.assertEqual([(group['type'], group['resource_name']) for group in groups],
+                         [('classroom', '101'), ('class_group', '10A')])
+        self.assertEqual([len(group['conflicts']) for group in groups], [1, 1])
+
+
+class ScheduleTestCase(TestCase):
+    """A school with a current year, two teachers and two courses of one class group."""
+
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.academic_year = AcademicYear.objects.create(
+            school=self.school,
+            name='2024-2025',
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 5, 31),
+            is_current=True
+        )
+        self.class_group = ClassGroup.objects.create(
+            school=self.school, name='10A', grade_level=10, academic_year=self.academic_year
+        )
+        subject = Subject.objects.create(school=self.school, name='Mathematics', code='MATH')
+        self.teachers = []
+        self.courses = []
+        for index in range(2):
+            user = User.objects.create_user(email=f'teacher{index}@test.com', password='test123')
+            teacher = Staff.objects.create(
+                user=user, school=self.school, position=Position.TEACHER, employment_date=date(2020, 9, 1)
+            )
+            self.teachers.append(teacher)
+            self.courses.append(Course.objects.create(
+                school=self.school, name=f'Course {index}', subject=subject, teacher=teacher,
+                class_group=self.class_group, academic_year=self.academic_year
+            ))
+        self.admin = User.objects.create_user(email='admin@test.com', password='test123')
+        UserRole.objects.create(user=self.admin, school=self.school, role=Role.SCHOOLADMIN)
+        # Usually seeded by a migration
+        RolePermission.objects.get_or_create(
+            role=Role.SCHOOLADMIN,
+            permission=Permission.objects.get_or_create(code='schedule.admin_manage', defaults={'name': 'Manage schedule'})[0]
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+
+class ResolveConflictsTest(ScheduleTestCase):
+    url = '/api/schedule/resolve-conflicts/'
+
+    def test_class_group_conflicts(self):
+        ScheduleSlot.objects.create(course=self.courses[0], day_of_week=0, start_time='08:00', end_time='08:45')
+        ScheduleSlot.objects.create(course=self.courses[1], day_of_week=0, start_time='08:30', end_time='09:15')
+        ScheduleSlot.objects.create(course=self.courses[1], day_of_week=0, start_time='09:15', end_time='10:00')
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['school_id'], str(self.school.id))
+        self.assertEqual(data['academic_year_id'], str(self.academic_year.id))
+        self.assertEqual([group['type'] for group in data['groups']], ['class_group'])
+        self.assertEqual(len(data['conflicts']), 1)
+
+    def test_school_scope(self):
+        other = School.objects.create(name='Other School')
+        response = self.client.post(self.url, {'school_id': str(other.id)}, format='json')
+        self.assertEqual(response.status_code, 403)
+        
+        UserRole.objects.create(user=self.admin, school=other, role=Role.SCHOOLADMIN)
+        response = self.client.post(self.url, {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('school_id', response.json())
+        response = self.client.post(f'{self.url}?school_id={other.id}', {}, format='json')
+        self.assertEqual(response.json(), {'academic_year_id': ['The school has no current academic year.']})
+        response = self.client.post(self.url, {'school_id': str(self.school.id)}, format='json')
+        self.assertEqual(response.json()['groups'], [])
+
+    def test_requires_permission(self):
+        teacher = self.teachers[0].user
+        UserRole.objects.create(user=teacher, school=self.school, role=Role.TEACHER)
+        self.client.force_authenticate(teacher)
+        self.assertEqual(self.client.post(self.url, {}, format='json').status_code, 403)
+
+
+class OverlapConflictTest(ScheduleTestCase):
+    def add_slot(self, course, start, end, classroom='', day=0):
+        return ScheduleSlot.objects.create(
+            course=course, day_of_week=day, start_time=start, end_time=end, classroom=classroom
+        )
+
+    def post_slot(self, course, start, end, classroom=''):
+        return self.client.post('/api/schedule/slots/', {
+            'course': str(course.id), 'day_of_week': 0, 'start_time': start, 'end_time': end, 'classroom': classroom,
+        }, format='json')
+
+    def test_slot_overlaps_answer_409(self):
+        existing = self.add_slot(self.courses[0], '08:00', '08:45', classroom='101')
+        response = self.post_slot(self.courses[0], '08:30', '09:15')
+        self.assertEqual(response.status_code, 409)
+        data = response.json()
+        self.assertEqual(data['resource'], 'teacher')
+        self.assertEqual([row['id'] for row in data['conflicts']], [str(existing.id)])
+        self.assertEqual(data['conflicts'][0]['day_of_week'], '0')
+        
+        response = self.post_slot(self.courses[1], '08:30', '09:15', classroom='101')
+        self.assertEqual((response.status_code, response.json()['resource']), (409, 'classroom'))
+        # Touching intervals do not overlap; the failed saves left nothing behind
+        self.assertEqual(self.post_slot(self.courses[0], '08:45', '09:30', classroom='101').status_code, 201)
+        self.assertEqual(ScheduleSlot.objects.count(), 2)
+
+    def test_lesson_overlap_answers_409(self):
+        existing = Lesson.objects.create(
+            course=self.courses[0], date=date(2024, 10, 1), start_time='09:00', end_time='09:45',
+            teacher=self.teachers[0]
+        )
+        response = self.client.post('/api/schedule/lessons/', {
+            'course': str(self.courses[1].id), 'date': '2024-10-01', 'start_time': '09:30', 'end_time': '10:15',
+            'teacher': str(self.teachers[0].id),
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'][0]['id'], str(existing.id))
+        self.assertEqual(response.json()['conflicts'][0]['date'], '2024-10-01')
+
+    def test_course_teacher_change_lists_the_new_teachers_slots(self):
+        busy = self.add_slot(self.courses[0], '08:00', '08:45')
+        self.add_slot(self.courses[0], '10:00', '10:45')
+        self.add_slot(self.courses[1], '08:30', '09:15')
+        response = self.client.patch(
+            f'/api/schedule/courses/{self.courses[1].id}/', {'teacher': str(self.teachers[0].id)}, format='json'
+        )
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['resource'], 'teacher')
+        self.assertEqual([row['id'] for row in response.json()['conflicts']], [str(busy.id)])
+        self.courses[1].refresh_from_db()
+        self.assertEqual(self.courses[1].teacher_id, self.teachers[1].id)
+
+    def test_time_range_validated(self):
+        response = self.post_slot(self.courses[0], '09:00', '09:00')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('end_time', response.json())
+        slot = self.add_slot(self.courses[0], '09:00', '09:45')
+        # Partial updates are checked against the stored start time
+        url = f'/api/schedule/slots/{slot.id}/'
+        self.assertEqual(self.client.patch(url, {'end_time': '08:30'}, format='json').status_code, 400)
+        self.assertEqual(self.client.patch(url, {'end_time': '10:00'}, format='json').status_code, 200)
+
+
+class OverlapMigrationCheckTest(ScheduleTestCase):
+    def test_existing_overlaps_are_named(self):
+        from django.apps import apps
+        from django.db import connection
+        migration = import_module('schedule.migrations.0003_overlap_constraints')
+        self.assertEqual(migration.find_constraint_violations(apps), [])
+        
+        # Rows from before the constraints (dropped inside the test transaction)
+        with connection.cursor() as cursor:
+            cursor.execute('ALTER TABLE lessons DROP CONSTRAINT lesson_teacher_overlap')
+        lessons = [
+            Lesson.objects.create(
+                course=self.courses[0], date=date(2024, 10, 1), start_time=start, end_time=end,
+                teacher=self.teachers[0]
+            )
+            for start, end in (('09:00', '09:45'), ('09:30', '10:15'), ('10:15', '11:00'))
+        ]
+        problems = migration.find_constraint_violations(apps)
+        self.assertEqual(len(problems), 2)
+        self.assertTrue(problems[0].startswith(f'Lesson {lessons[0].id}: teacher {self.teachers[0].id} on 2024-10-01'))
+        self.assertIn(str(lessons[1].id), problems[1])
+        with self.assertRaisesMessage(RuntimeError, str(lessons[1].id)):
+            migration.check_no_overlaps(apps, None)
@@ -3,17 +3,24 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from django.db.models import Q
+import uuid
 from datetime import datetime, timedelta
+from .conflicts import OverlapConflictsMixin, find_slot_conflicts, slots_for_conflicts
 from .models import Course, ScheduleSlot, Lesson
 from .serializers import CourseSerializer, ScheduleSlotSerializer, LessonSerializer
+from attendance.roster import get_lesson_roster
+from users.query_planning import SparseFieldsetsMixin
 from users.permissions import HasPermission, IsSchoolAdmin, IsTeacher, IsSuperAdmin
 
 
-class CourseViewSet(viewsets.ModelViewSet):
+class CourseViewSet(OverlapConflictsMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     """Course viewset."""
     queryset = Course.objects.all()
     serializer_class = CourseSerializer
-    permission_classes = [HasPermission('schedule.admin_manage')]
+    permission_classes = [IsAuthenticated]
+    
+    def get_permissions(self):
+        return [HasPermission('schedule.admin_manage')]
     
     def get_queryset(self):
         queryset = Course.objects.all()
@@ -31,11 +38,14 @@ class CourseViewSet(viewsets.ModelViewSet):
         return queryset
 
 
-class ScheduleSlotViewSet(viewsets.ModelViewSet):
+class ScheduleSlotViewSet(OverlapConflictsMixin, viewsets.ModelViewSet):
     """ScheduleSlot viewset."""
     queryset = ScheduleSlot.objects.all()
     serializer_class = ScheduleSlotSerializer
-    permission_classes = [HasPermission('schedule.admin_manage')]
+    permission_classes = [IsAuthenticated]
+    
+    def get_permissions(self):
+        return [HasPermission('schedule.admin_manage')]
     
     def get_queryset(self):
         queryset = ScheduleSlot.objects.all()
@@ -46,29 +56,30 @@ class ScheduleSlotViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def resolve_conflicts(self, request):
-        """Detect and suggest resolution for schedule conflicts."""
-        # TODO: Implement conflict detection logic
-        # Check for overlapping time slots for same teacher/classroom/class_group
-        conflicts = []
+        """Detect teacher, classroom and class group conflicts in a school's weekly schedule.
         
-        # Example conflict detection (simplified)
-        slots = ScheduleSlot.objects.all()
-        for slot1 in slots:
-            for slot2 in slots.exclude(id=slot1.id):
-                if (slot1.day_of_week == slot2.day_of_week and
-                    slot1.start_time < slot2.end_time and
-                    slot1.end_time > slot2.start_time):
-                    # Check if same teacher or classroom
-                    if (slot1.course.teacher == slot2.course.teacher or
-                        (slot1.classroom and slot2.classroom and slot1.classroom == slot2.classroom)):
-                        conflicts.append({
-                            'slot1': ScheduleSlotSerializer(slot1).data,
-                            'slot2': ScheduleSlotSerializer(slot2).data,
-                            'type': 'teacher' if slot1.course.teacher == slot2.course.teacher else 'classroom'
-                        })
+        Scoped to ?school_id= (default: the requester's only school) and
+        ?academic_year_id= (default: the school's current year); both may also
+        be sent in the body.
+        """
+        params = {**request.query_params.dict(), **request.data}
+        school_id = params.get('school_id')
+        access = request.user.access
+        user_school_ids = [school for school, _ in access.school_roles]
+        if not school_id:
+            if len(set(user_school_ids)) != 1:
+                return Response({'school_id': ['This field is required.']}, status=status.HTTP_400_BAD_REQUEST)
+            school_id = user_school_ids[0]
+        elif not access.is_superuser and str(school_id) not in user_school_ids:
+            return Response({'detail': 'Permission denied.'}, status=status.HTTP_403_FORBIDDEN)
         
+        academic_year_id, slots = slots_for_conflicts(school_id, params.get('academic_year_id'))
+        groups = find_slot_conflicts(slots)
         return Response({
-            'conflicts': conflicts,
+            'school_id': school_id,
+            'academic_year_id': academic_year_id,
+            'groups': groups,
+            'conflicts': [conflict for group in groups for conflict in group['conflicts']],
             'suggestions': [
                 'Move one of the conflicting slots to a different time',
                 'Assign different teacher or classroom'
@@ -76,14 +87,14 @@ class ScheduleSlotViewSet(viewsets.ModelViewSet):
         })
 
 
-class LessonViewSet(viewsets.ModelViewSet):
+class LessonViewSet(OverlapConflictsMixin, SparseFieldsetsMixin, viewsets.ModelViewSet):
     """Lesson viewset."""
     queryset = Lesson.objects.all()
     serializer_class = LessonSerializer
     permission_classes = [IsAuthenticated]
     
     def get_permissions(self):
-        if self.action in ['create', 'update', 'partial_update', 'destroy']:
+        if self.action in ['create', 'update', 'partial_update', 'destroy', 'roster']:
             return [IsTeacher() | IsSchoolAdmin() | IsSuperAdmin()]
         return super().get_permissions()
     
@@ -125,4 +136,15 @@ class LessonViewSet(viewsets.ModelViewSet):
         lesson.attendance_open_flag = False
         lesson.save()
         return Response({'message': 'Attendance closed'})
+    
+    @action(detail=True, methods=['get'])
+    def roster(self, request, pk=None):
+        """Class roster with each student's current attendance mark for the lesson."""
+        try:
+            roster = get_lesson_roster(uuid.UUID(pk))
+        except ValueError:
+            roster = None
+        if roster is None:
+            return Response({'error': 'Lesson not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(roster)
 
@@ -5,3 +5,5 @@ class SchoolsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'schools'
 
+    def ready(self):
+        from . import signals  # noqa: F401
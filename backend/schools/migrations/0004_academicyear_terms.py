@@ -0,0 +1,18 @@
+# Generated by Django 5.0.1 on 2026-10-17 00:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('schools', '0003_school_connection_code'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='academicyear',
+            name='terms',
+            field=models.JSONField(blank=True, default=list, help_text="Четверти/триместры: [{'code': 'Q1', 'name': '1 четверть', 'start': '2024-09-02', 'end': '2024-10-25'}, ...] (end включительно)"),
+        ),
+    ]
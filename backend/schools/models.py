@@ -90,6 +90,11 @@ class AcademicYear(models.Model):
     start_date = models.DateField()
     end_date = models.DateField()
     is_current = models.BooleanField(default=False)
+    terms = models.JSONField(
+        default=list,
+        blank=True,
+        help_text="Четверти/триместры: [{'code': 'Q1', 'name': '1 четверть', 'start': '2024-09-02', 'end': '2024-10-25'}, ...] (end включительно)"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
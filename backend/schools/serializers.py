@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from .models import City, School, AcademicYear
+from .terms import YEAR_TERM
 
 
 class CitySerializer(serializers.ModelSerializer):
@@ -8,12 +9,50 @@ class CitySerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'name_ru']
 
 
+class AcademicYearTermSerializer(serializers.Serializer):
+    """One term of AcademicYear.terms (end date inclusive)."""
+    code = serializers.CharField(max_length=20)
+    name = serializers.CharField(max_length=100, required=False, allow_blank=True)
+    start = serializers.DateField()
+    end = serializers.DateField()
+
+    def validate_code(self, value):
+        if value == YEAR_TERM:
+            raise serializers.ValidationError(f"'{YEAR_TERM}' is reserved for the whole academic year.")
+        return value
+
+    def validate(self, attrs):
+        if attrs['start'] > attrs['end']:
+            raise serializers.ValidationError('start must not be after end.')
+        # Stored as JSON
+        return {**attrs, 'start': attrs['start'].isoformat(), 'end': attrs['end'].isoformat()}
+
+
 class AcademicYearSerializer(serializers.ModelSerializer):
+    terms = serializers.ListField(child=AcademicYearTermSerializer(), required=False)
+
     class Meta:
         model = AcademicYear
-        fields = ['id', 'school', 'name', 'start_date', 'end_date', 'is_current', 'created_at']
+        fields = ['id', 'school', 'name', 'start_date', 'end_date', 'is_current', 'terms', 'created_at']
         read_only_fields = ['id', 'created_at']
 
+    def validate(self, attrs):
+        start_date = attrs.get('start_date', getattr(self.instance, 'start_date', None))
+        end_date = attrs.get('end_date', getattr(self.instance, 'end_date', None))
+        terms = attrs.get('terms')
+        if terms:
+            codes = [term['code'] for term in terms]
+            if len(set(codes)) != len(codes):
+                raise serializers.ValidationError({'terms': 'Term codes must be unique.'})
+            for term in terms:
+                if start_date and end_date and not (
+                    start_date.isoformat() <= term['start'] and term['end'] <= end_date.isoformat()
+                ):
+                    raise serializers.ValidationError(
+                        {'terms': f"Term {term['code']} is outside the academic year."}
+                    )
+        return attrs
+
 
 class SchoolSerializer(serializers.ModelSerializer):
     city_detail = CitySerializer(source='city', read_only=True)
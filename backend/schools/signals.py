@@ -0,0 +1,13 @@
+"""
+Term calendar invalidation on AcademicYear changes.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .models import AcademicYear
+from .terms import invalidate_term_calendar
+
+
+@receiver(post_save, sender=AcademicYear)
+@receiver(post_delete, sender=AcademicYear)
+def academic_year_changed(sender, instance, **kwargs):
+    invalidate_term_calendar(instance.pk)
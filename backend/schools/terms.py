@@ -0,0 +1,70 @@
+"""
+Date ranges for reporting periods: calendar months and academic terms.
+
+Ranges are half-open [start, end) so filters become `date >= start AND
+date < end`, which the (student, date) / (course, date) indexes can serve;
+date__year / date__month would wrap the column in EXTRACT instead.
+"""
+from datetime import date, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.exceptions import ValidationError
+
+YEAR_TERM = 'year'
+
+
+def month_range(period):
+    """[start, end) of a 'YYYY-MM' period."""
+    try:
+        year, month = map(int, period.split('-'))
+        start = date(year, month, 1)
+        end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    except (ValueError, OverflowError):
+        # Also out-of-range years, e.g. 9999-12 (whose end is in year 10000)
+        raise ValidationError({'period': ['Expected YYYY-MM.']})
+    return start, end
+
+
+def term_calendar_cache_key(academic_year_id):
+    return f'terms:calendar:{academic_year_id}'
+
+
+def invalidate_term_calendar(academic_year_id):
+    """Drop the cached calendar of an academic year (on save/delete)."""
+    cache.delete(term_calendar_cache_key(academic_year_id))
+
+
+def get_term_calendar(academic_year_id):
+    """{term code: (start, end)} half-open ranges of an academic year, cached.
+
+    Contains the terms from AcademicYear.terms (end inclusive there) plus
+    'year' for the whole academic year. Empty if the year does not exist.
+    """
+    key = term_calendar_cache_key(academic_year_id)
+    calendar = cache.get(key)
+    if calendar is None:
+        from .models import AcademicYear
+
+        year = (
+            AcademicYear.objects.filter(id=academic_year_id)
+            .values('start_date', 'end_date', 'terms')
+            .first()
+        )
+        calendar = {}
+        if year:
+            calendar[YEAR_TERM] = (year['start_date'], year['end_date'] + timedelta(days=1))
+            for term in year['terms'] or []:
+                calendar[term['code']] = (
+                    date.fromisoformat(term['start']),
+                    date.fromisoformat(term['end']) + timedelta(days=1),
+                )
+        cache.set(key, calendar, settings.TERM_CALENDAR_CACHE_TIMEOUT)
+    return calendar
+
+
+def term_range(academic_year_id, code):
+    """[start, end) of a named term ('Q1', 'T2', 'year', ...) of an academic year."""
+    calendar = get_term_calendar(academic_year_id)
+    if code not in calendar:
+        raise ValidationError({'term': [f'Unknown term for this academic year. Use {", ".join(calendar) or "none"}.']})
+    return calendar[code]
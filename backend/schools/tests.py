@@ -1,20 +1,20 @@
 from django.test import TestCase
-from .models import School, AcademicYear, SchoolType
+from .models import School, AcademicYear, City
 from datetime import date
+from rest_framework.exceptions import ValidationError
 
 
 class SchoolModelTest(TestCase):
     def setUp(self):
         self.school = School.objects.create(
             name='Test School',
-            type=SchoolType.NIS,
-            city='Almaty',
+            city=City.objects.get_or_create(name='Almaty')[0],
             grading_system={'scale': '10-point', 'min': 0, 'max': 10}
         )
 
     def test_school_creation(self):
         self.assertEqual(self.school.name, 'Test School')
-        self.assertEqual(self.school.type, SchoolType.NIS)
+        self.assertEqual(self.school.city.name, 'Almaty')
         self.assertIsNotNone(self.school.grading_system)
 
     def test_academic_year(self):
@@ -28,3 +28,23 @@ class SchoolModelTest(TestCase):
         self.assertEqual(academic_year.school, self.school)
         self.assertTrue(academic_year.is_current)
 
+
+    def test_term_calendar(self):
+        from .terms import term_range, month_range
+        academic_year = AcademicYear.objects.create(
+            school=self.school,
+            name='2024-2025',
+            start_date=date(2024, 9, 1),
+            end_date=date(2025, 5, 31),
+            terms=[{'code': 'Q1', 'start': '2024-09-01', 'end': '2024-10-31'}]
+        )
+        self.assertEqual(term_range(academic_year.id, 'Q1'), (date(2024, 9, 1), date(2024, 11, 1)))
+        self.assertEqual(term_range(academic_year.id, 'year'), (date(2024, 9, 1), date(2025, 6, 1)))
+        self.assertEqual(month_range('2024-12'), (date(2024, 12, 1), date(2025, 1, 1)))
+        for period in ('2024-13', '9999-12', '99999999999999999999-01', 'soon'):
+            with self.assertRaises(ValidationError):
+                month_range(period)
+
+        academic_year.terms = [{'code': 'Q1', 'start': '2024-09-02', 'end': '2024-10-25'}]
+        academic_year.save()
+        self.assertEqual(term_range(academic_year.id, 'Q1'), (date(2024, 9, 2), date(2024, 10, 26)))
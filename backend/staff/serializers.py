@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Staff, Subject, StaffSubject
-from users.serializers import UserSerializer
+from users.serializers import UserSerializer, UserPrefetchListSerializer
 
 
 class SubjectSerializer(serializers.ModelSerializer):
@@ -24,6 +24,11 @@ class StaffSubjectSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class StaffListSerializer(UserPrefetchListSerializer):
+    """Batch-loads users (with roles/schools) for a page of staff."""
+    user_attr = 'user'
+
+
 class StaffSerializer(serializers.ModelSerializer):
     """Staff serializer."""
     user = UserSerializer(read_only=True)
@@ -38,4 +43,5 @@ class StaffSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = StaffListSerializer
 
@@ -0,0 +1,47 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from schools.models import School
+from users.models import UserRole, Role
+from .models import Staff, Subject, StaffSubject, Position
+from datetime import date
+
+User = get_user_model()
+
+
+class StaffListPlanningTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.subjects = [
+            Subject.objects.create(school=self.school, name=name, code=name[:4].upper())
+            for name in ('Mathematics', 'Physics')
+        ]
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_staff(self, index, subjects=()):
+        user = User.objects.create_user(email=f'teacher{index}@test.com', password='test123')
+        UserRole.objects.create(user=user, school=self.school, role=Role.TEACHER)
+        staff = Staff.objects.create(
+            user=user, school=self.school, position=Position.TEACHER, employment_date=date(2020, 9, 1)
+        )
+        for subject in subjects:
+            StaffSubject.objects.create(staff=staff, subject=subject)
+        return staff
+
+    def test_list_query_count_independent_of_page_size(self):
+        # COUNT, staff with users, subjects, users' roles with schools, permission codes
+        self.add_staff(0, self.subjects[:1])
+        with self.assertNumQueries(5):
+            self.client.get('/api/staff/staff/')
+        for index in range(1, 5):
+            self.add_staff(index, self.subjects[:index % 3])
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get('/api/staff/staff/')
+        rows = {row['user']['email']: row for row in response.json()['results']}
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows['teacher1@test.com']['user']['roles'], [Role.TEACHER])
@@ -2,10 +2,11 @@ from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from .models import Staff, Subject, StaffSubject
 from .serializers import StaffSerializer, SubjectSerializer, StaffSubjectSerializer
+from users.query_planning import QueryPlanningMixin
 from users.permissions import IsSchoolAdmin, IsSuperAdmin
 
 
-class StaffViewSet(viewsets.ModelViewSet):
+class StaffViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """Staff viewset."""
     queryset = Staff.objects.all()
     serializer_class = StaffSerializer
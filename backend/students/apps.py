@@ -5,3 +5,5 @@ class StudentsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'students'
 
+    def ready(self):
+        from . import signals  # noqa: F401
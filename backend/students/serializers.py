@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from .models import Student, ClassGroup, StudentParent
-from users.serializers import UserSerializer
+from users.serializers import UserSerializer, UserPrefetchListSerializer
 
 
 class ClassGroupSerializer(serializers.ModelSerializer):
@@ -29,6 +29,12 @@ class StudentParentSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'created_at']
 
 
+class StudentListSerializer(UserPrefetchListSerializer):
+    """Batch-loads users (with roles/schools) , class groups and parents for a page of students."""
+    user_attr = 'user'
+    prefetch = ('class_group', 'parents__parent')
+
+
 class StudentSerializer(serializers.ModelSerializer):
     """Student serializer."""
     user = UserSerializer(read_only=True)
@@ -45,4 +51,5 @@ class StudentSerializer(serializers.ModelSerializer):
             'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'created_at', 'updated_at']
+        list_serializer_class = StudentListSerializer
 
@@ -0,0 +1,38 @@
+"""
+Visibility scope invalidation on Student / StudentParent changes.
+"""
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import Student, StudentParent
+from .visibility import invalidate_visibility
+
+
+@receiver(pre_save, sender=Student)
+def student_user_changing(sender, instance, **kwargs):
+    # A student re-linked to another user: the previous user loses the profile
+    if instance._state.adding:
+        return
+    old_user_id = Student.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+    if old_user_id and old_user_id != instance.user_id:
+        invalidate_visibility(old_user_id)
+
+
+@receiver(post_save, sender=Student)
+@receiver(post_delete, sender=Student)
+def student_changed(sender, instance, **kwargs):
+    invalidate_visibility(instance.user_id)
+
+
+@receiver(pre_save, sender=StudentParent)
+def student_parent_changing(sender, instance, **kwargs):
+    if instance._state.adding:
+        return
+    old_parent_id = StudentParent.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+    if old_parent_id and old_parent_id != instance.parent_id:
+        invalidate_visibility(old_parent_id)
+
+
+@receiver(post_save, sender=StudentParent)
+@receiver(post_delete, sender=StudentParent)
+def student_parent_changed(sender, instance, **kwargs):
+    invalidate_visibility(instance.parent_id)
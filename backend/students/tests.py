@@ -0,0 +1,92 @@
+from django.test import TestCase
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from rest_framework.test import APIClient
+from schools.models import School, AcademicYear
+from users.models import UserRole, Role
+from .models import Student, StudentParent, ClassGroup
+from .visibility import filter_visible, get_visible_student_ids
+from datetime import date
+
+User = get_user_model()
+
+
+class VisibilityScopeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.students = []
+        for index in range(3):
+            user = User.objects.create_user(email=f'student{index}@test.com', password='test123')
+            UserRole.objects.create(user=user, school=self.school, role=Role.STUDENT)
+            self.students.append(Student.objects.create(
+                user=user, school=self.school, student_number=f'STU00{index}', enrollment_date=date(2024, 9, 1)
+            ))
+        self.parent = User.objects.create_user(email='parent@test.com', password='test123')
+        UserRole.objects.create(user=self.parent, school=self.school, role=Role.PARENT)
+        StudentParent.objects.create(student=self.students[0], parent=self.parent)
+
+    def visible(self, user):
+        return get_visible_student_ids(User.objects.get(pk=user.pk))
+
+    def test_student_sees_own_profile(self):
+        self.assertEqual(self.visible(self.students[1].user), [str(self.students[1].id)])
+
+    def test_parent_scope_cached_and_invalidated(self):
+        self.assertEqual(self.visible(self.parent), [str(self.students[0].id)])
+        parent = User.objects.get(pk=self.parent.pk)
+        with self.assertNumQueries(0):
+            get_visible_student_ids(parent)
+
+        link = StudentParent.objects.create(student=self.students[2], parent=self.parent)
+        self.assertEqual(
+            sorted(self.visible(self.parent)), sorted([str(self.students[0].id), str(self.students[2].id)])
+        )
+        link.delete()
+        self.assertEqual(self.visible(self.parent), [str(self.students[0].id)])
+
+    def test_unscoped_roles_and_filter(self):
+        teacher = User.objects.create_user(email='teacher@test.com', password='test123')
+        UserRole.objects.create(user=teacher, school=self.school, role=Role.TEACHER)
+        self.assertIsNone(self.visible(teacher))
+
+        links = StudentParent.objects.all()
+        self.assertEqual(filter_visible(links, User.objects.get(pk=teacher.pk)).count(), 1)
+        self.assertEqual(filter_visible(links, User.objects.get(pk=self.students[1].user_id)).count(), 0)
+
+
+class ClassGroupListPlanningTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.admin = User.objects.create_superuser(email='admin@test.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def add_class_group(self, name, size):
+        academic_year = AcademicYear.objects.get_or_create(
+            school=self.school, name='2024-2025',
+            defaults={'start_date': date(2024, 9, 1), 'end_date': date(2025, 5, 31)}
+        )[0]
+        class_group = ClassGroup.objects.create(
+            school=self.school, name=name, grade_level=10, academic_year=academic_year
+        )
+        for index in range(size):
+            user = User.objects.create_user(email=f'{name}-{index}@test.com', password='test123')
+            Student.objects.create(
+                user=user, school=self.school, class_group=class_group,
+                student_number=f'{name}-{index}', enrollment_date=date(2024, 9, 1)
+            )
+        return class_group
+
+    def test_list_query_count_independent_of_page_size(self):
+        # COUNT, class groups with homeroom teachers, students (counted from the prefetch)
+        self.add_class_group('10A', 2)
+        with self.assertNumQueries(3):
+            self.client.get('/api/classes/')
+        for name, size in (('10B', 3), ('10C', 0), ('11A', 4)):
+            self.add_class_group(name, size)
+        with self.assertNumQueries(3):
+            response = self.client.get('/api/classes/')
+        counts = {row['name']: row['student_count'] for row in response.json()['results']}
+        self.assertEqual(counts, {'10A': 2, '10B': 3, '10C': 0, '11A': 4})
@@ -9,13 +9,14 @@ import io
 from datetime import datetime
 from .models import Student, ClassGroup, StudentParent
 from .serializers import StudentSerializer, ClassGroupSerializer, StudentParentSerializer
+from users.query_planning import QueryPlanningMixin, SparseFieldsetsMixin, plan_queryset
 from users.permissions import IsSchoolAdmin, IsTeacher, IsSuperAdmin
 from schools.models import School, AcademicYear
 
 User = get_user_model()
 
 
-class ClassGroupViewSet(viewsets.ModelViewSet):
+class ClassGroupViewSet(QueryPlanningMixin, viewsets.ModelViewSet):
     """ClassGroup viewset."""
     queryset = ClassGroup.objects.all()
     serializer_class = ClassGroupSerializer
@@ -37,12 +38,12 @@ class ClassGroupViewSet(viewsets.ModelViewSet):
     def students(self, request, pk=None):
         """Get students in a class group."""
         class_group = self.get_object()
-        students = class_group.students.all()
-        serializer = StudentSerializer(students, many=True)
+        serializer = StudentSerializer(many=True)
+        serializer.instance = plan_queryset(class_group.students.all(), serializer)
         return Response(serializer.data)
 
 
-class StudentViewSet(viewsets.ModelViewSet):
+class StudentViewSet(SparseFieldsetsMixin, viewsets.ModelViewSet):
     """Student viewset."""
     queryset = Student.objects.all()
     serializer_class = StudentSerializer
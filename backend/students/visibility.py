@@ -0,0 +1,63 @@
+"""
+Data visibility scope: which students' records a student or parent may see.
+
+The scope is computed once per user (own Student profile for the student
+role, linked children for the parent role) and kept in the shared cache
+until a Student or StudentParent row of that user changes.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from users.models import Role
+
+SCOPED_ROLES = (Role.STUDENT, Role.PARENT)
+
+
+def visibility_cache_key(user_id):
+    return f'visibility:students:{user_id}'
+
+
+def invalidate_visibility(user_id):
+    """Drop the cached scope of a user (after Student/StudentParent changes)."""
+    cache.delete(visibility_cache_key(user_id))
+
+
+def get_visible_student_ids(user):
+    """Student IDs the user may see, or None if the user is not scoped by role.
+
+    Users with the student and/or parent role are limited to their own
+    profile and/or their children; other roles are not restricted here.
+    """
+    roles = sorted(role for role in SCOPED_ROLES if user.access.has_role(role))
+    if not roles:
+        return None
+
+    key = visibility_cache_key(user.pk)
+    cached = cache.get(key)
+    if cached is not None and cached['roles'] == roles:
+        return cached['student_ids']
+
+    from .models import Student
+
+    condition = Q()
+    if Role.STUDENT in roles:
+        condition |= Q(user_id=user.pk)
+    if Role.PARENT in roles:
+        condition |= Q(parents__parent_id=user.pk)
+    student_ids = [
+        str(pk) for pk in Student.objects.filter(condition).values_list('id', flat=True).distinct()
+    ]
+    cache.set(
+        key,
+        {'roles': roles, 'student_ids': student_ids},
+        settings.PERMISSION_CACHE_TIMEOUT,
+    )
+    return student_ids
+
+
+def filter_visible(queryset, user, field='student'):
+    """Restrict a queryset to the user's visible students (indexed `<field>_id IN (...)`)."""
+    student_ids = get_visible_student_ids(user)
+    if student_ids is None:
+        return queryset
+    return queryset.filter(**{f'{field}_id__in': student_ids})
@@ -0,0 +1,145 @@
+"""
+Per-request role and permission context.
+
+The user's UserRole rows and effective permission codes are loaded once and
+every has_role / HasPermission check afterwards is answered from memory.
+Both are also kept in the shared cache (Redis), so across workers they cost
+nothing until a UserRole changes or an admin edits the role-permission matrix.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+
+MATRIX_VERSION_KEY = 'permissions:matrix_version'
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Seed with a timestamp so a lost key never re-uses an old version number.
+        cache.add(key, int(time.time()), None)
+        version = cache.get(key)
+    return version
+
+
+def _bump_version(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, int(time.time()), None)
+        return cache.incr(key)
+
+
+def get_matrix_version():
+    """Current version of the role-permission matrix (bumped on every edit)."""
+    return _get_version(MATRIX_VERSION_KEY)
+
+
+def bump_matrix_version():
+    """Invalidate cached permission codes and all token claims (after RolePermission/Permission edits)."""
+    return _bump_version(MATRIX_VERSION_KEY)
+
+
+def user_roles_version_key(user_id):
+    return f'permissions:user_roles_version:{user_id}'
+
+
+def get_user_roles_version(user_id):
+    """Current version of a user's roles (bumped on each of their UserRole edits)."""
+    return _get_version(user_roles_version_key(user_id))
+
+
+def get_permission_codes_for_roles(roles, superuser=False):
+    """Effective permission codes for a role set, cached per matrix version."""
+    from .models import Permission, RolePermission
+
+    roles = sorted(set(roles))
+    role_key = '*' if superuser else ','.join(roles)
+    key = f'permissions:v{get_matrix_version()}:{role_key}'
+    codes = cache.get(key)
+    if codes is None:
+        if superuser:
+            codes = list(Permission.objects.values_list('code', flat=True))
+        elif not roles:
+            codes = []
+        else:
+            codes = list(
+                RolePermission.objects.filter(role__in=roles)
+                .values_list('permission__code', flat=True)
+                .distinct()
+            )
+        cache.set(key, codes, settings.PERMISSION_CACHE_TIMEOUT)
+    return frozenset(codes)
+
+
+def user_roles_cache_key(user_id):
+    return f'permissions:user_roles:{user_id}'
+
+
+def invalidate_user_roles(user_id):
+    """Drop the cached (school, role) rows and token role claims of a user (after UserRole changes)."""
+    cache.delete(user_roles_cache_key(user_id))
+    _bump_version(user_roles_version_key(user_id))
+
+
+class AccessContext:
+    """Roles (per school) and permission codes of a user, loaded lazily once."""
+
+    def __init__(self, user, school_roles=None):
+        self.user = user
+        self._school_roles = school_roles
+        self._permission_codes = None
+
+    @property
+    def is_superuser(self):
+        return bool(getattr(self.user, 'is_superuser', False))
+
+    @property
+    def school_roles(self):
+        """List of (school_id, role) pairs from UserRole (cached per user)."""
+        if self._school_roles is None:
+            key = user_roles_cache_key(self.user.pk)
+            rows = cache.get(key)
+            if rows is None:
+                rows = [
+                    (str(school_id), role)
+                    for school_id, role in self.user.user_roles.values_list('school_id', 'role')
+                ]
+                cache.set(key, rows, settings.PERMISSION_CACHE_TIMEOUT)
+            self._school_roles = [tuple(row) for row in rows]
+        return self._school_roles
+
+    @property
+    def roles(self):
+        """Set of role codes the user has in any school."""
+        return frozenset(role for _, role in self.school_roles)
+
+    def has_role(self, *roles):
+        """True if the user has any of the given roles (in any school)."""
+        return not self.roles.isdisjoint(roles)
+
+    def has_school_role(self, school_id, *roles):
+        """True if the user has any of the given roles in this school."""
+        school_id = str(school_id)
+        return any(
+            sid == school_id and role in roles
+            for sid, role in self.school_roles
+        )
+
+    def school_ids_with_role(self, *roles):
+        """School IDs where the user has any of the given roles."""
+        return list(dict.fromkeys(sid for sid, role in self.school_roles if role in roles))
+
+    @property
+    def permission_codes(self):
+        """Effective permission codes (from RolePermission; all codes if is_superuser)."""
+        if self._permission_codes is None:
+            self._permission_codes = get_permission_codes_for_roles(
+                self.roles, superuser=self.is_superuser
+            )
+        return self._permission_codes
+
+    def has_permission(self, code):
+        if self.is_superuser:
+            return True
+        return code in self.permission_codes
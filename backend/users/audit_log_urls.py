@@ -0,0 +1,7 @@
+from rest_framework.routers import DefaultRouter
+from .views import AuditLogViewSet
+
+router = DefaultRouter()
+router.register(r'', AuditLogViewSet, basename='auditlog')
+
+urlpatterns = router.urls
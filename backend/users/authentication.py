@@ -0,0 +1,77 @@
+"""
+JWT authentication: cached slim user lookup and role claims from the access token.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication as BaseJWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from .tokens import access_from_claims
+
+# Columns kept in the auth cache; password, last_login and profile stay deferred.
+AUTH_USER_FIELDS = (
+    'id', 'email', 'first_name', 'last_name', 'middle_name', 'phone',
+    'language_pref', 'linked_school_id', 'is_active', 'is_staff',
+    'is_superuser', 'date_joined',
+)
+
+
+def auth_user_cache_key(user_id):
+    return f'auth:user:{user_id}'
+
+
+def invalidate_auth_user(user_id):
+    """Drop the cached auth record of a user (on save/delete)."""
+    cache.delete(auth_user_cache_key(user_id))
+
+
+class JWTAuthentication(BaseJWTAuthentication):
+    """simplejwt JWTAuthentication with a cached user lookup.
+
+    The user row is cached by id as a slim record (AUTH_USER_FIELDS) for
+    AUTH_USER_CACHE_TIMEOUT seconds; heavy fields are loaded only if accessed.
+    Role claims in the token are attached to request.user when fresh.
+    """
+
+    def authenticate(self, request):
+        result = super().authenticate(request)
+        if result is None:
+            return None
+        user, validated_token = result
+        access = access_from_claims(user, validated_token)
+        if access is not None:
+            user.access = access
+        return user, validated_token
+
+    def get_user(self, validated_token):
+        if api_settings.CHECK_REVOKE_TOKEN:
+            # Needs the password hash, which is never cached
+            return super().get_user(validated_token)
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+
+        # from_db() expects values in model field order
+        field_names = [
+            f.attname for f in self.user_model._meta.concrete_fields
+            if f.attname in AUTH_USER_FIELDS
+        ]
+        key = auth_user_cache_key(user_id)
+        values = cache.get(key)
+        if values is None:
+            values = (
+                self.user_model.objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+                .values_list(*field_names)
+                .first()
+            )
+            if values is None:
+                raise AuthenticationFailed(_('User not found'), code='user_not_found')
+            cache.set(key, values, settings.AUTH_USER_CACHE_TIMEOUT)
+
+        user = self.user_model.from_db(DEFAULT_DB_ALIAS, field_names, values)
+        if not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        return user
@@ -2,6 +2,8 @@ import uuid
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.db import models
 from django.utils import timezone
+from django.utils.functional import cached_property
+from .access import AccessContext
 
 
 class UserManager(BaseUserManager):
@@ -88,26 +90,22 @@ class User(AbstractBaseUser, PermissionsMixin):
         parts = [self.first_name, self.middle_name, self.last_name]
         return ' '.join(filter(None, parts)) or self.email
     
+    @cached_property
+    def access(self):
+        """Role and permission context, loaded once per user instance (i.e. per request)."""
+        return AccessContext(self)
+
     def has_role(self, role):
         """Check if user has a specific role."""
-        return self.user_roles.filter(role=role).exists()
+        return self.access.has_role(role)
     
     def get_roles(self):
         """Get all roles for this user."""
-        return [ur.role for ur in self.user_roles.all()]
+        return [role for _, role in self.access.school_roles]
 
     def get_effective_permission_codes(self):
         """Permission codes for this user (from RolePermission by user roles; all if is_superuser)."""
-        if getattr(self, 'is_superuser', False):
-            return list(Permission.objects.values_list('code', flat=True))
-        roles = self.get_roles()
-        if not roles:
-            return []
-        return list(
-            RolePermission.objects.filter(role__in=roles)
-            .values_list('permission__code', flat=True)
-            .distinct()
-        )
+        return list(self.access.permission_codes)
 
 
 class UserRole(models.Model):
@@ -0,0 +1,198 @@
+"""
+Keyset (cursor) pagination for large, append-mostly tables.
+
+Pages are addressed by the sort key of the last row seen, e.g. (date, id),
+so a page is an index range scan with LIMIT: no OFFSET and no COUNT(*).
+"""
+import base64
+import json
+from datetime import date, datetime
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+def _encode_value(value):
+    if isinstance(value, (date, datetime)):
+        # Full precision: the cursor must compare equal to the stored value
+        return value.isoformat()
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return str(value)
+
+
+def _model_field(model, path):
+    """Model field at a `__`-separated path (e.g. 'student__user__last_name')."""
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+class KeysetPagination(BasePagination):
+    """Forward-only keyset pagination.
+
+    The view sets `keyset_ordering` (e.g. ('-date', '-id')); the last field must
+    be unique. The response has `next` (URL or None) and `results`; there is no
+    `count`.
+    """
+    ordering = ('-created_at', '-id')
+    cursor_query_param = 'cursor'
+    selector_query_param = 'pagination'
+    page_size = api_settings.PAGE_SIZE or 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    invalid_cursor_message = 'Invalid cursor'
+
+    def keyset_requested(self, request):
+        """True for ?pagination=cursor or when a cursor is given."""
+        params = request.query_params
+        return params.get(self.selector_query_param) == 'cursor' or self.cursor_query_param in params
+
+    def get_ordering(self, view):
+        return tuple(getattr(view, 'keyset_ordering', None) or self.ordering)
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def decode_cursor(self, request, ordering, model):
+        """Cursor values converted by the ordering fields (NotFound if malformed)."""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(ordering):
+                raise ValueError
+            # Bad dates or UUIDs would otherwise only fail in the database
+            return [
+                _model_field(model, field.lstrip('-')).to_python(value)
+                for field, value in zip(ordering, values)
+            ]
+        except (TypeError, ValueError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, values):
+        data = json.dumps([_encode_value(value) for value in values], separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode('ascii')).decode('ascii')
+
+    def after(self, ordering, values):
+        """Q for rows strictly after `values` in `ordering` (expanded row comparison).
+
+        The OR chain is ANDed with a redundant bound on the first column
+        (date <= x for '-date'): Postgres can seek the index with that bound,
+        while the OR chain alone is only a filter over the scanned rows.
+        """
+        condition = Q()
+        equal = Q()
+        for field, value in zip(ordering, values):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= equal & Q(**{f'{name}__{lookup}': value})
+            equal &= Q(**{name: value})
+        first = ordering[0]
+        bound = 'lte' if first.startswith('-') else 'gte'
+        return Q(**{f'{first.lstrip("-")}__{bound}': values[0]}) & condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        ordering = self.get_ordering(view)
+        self.request = request
+        self.ordering_fields = [field.lstrip('-') for field in ordering]
+        page_size = self.get_page_size(request)
+
+        queryset = queryset.order_by(*ordering)
+        cursor = self.decode_cursor(request, ordering, queryset.model)
+        if cursor is not None:
+            queryset = queryset.filter(self.after(ordering, cursor))
+
+        rows = list(queryset[:page_size + 1])
+        self.has_next = len(rows) > page_size
+        rows = rows[:page_size]
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        values = []
+        for name in self.ordering_fields:
+            value = self.last_row
+            for part in name.split('__'):
+                value = getattr(value, part)
+            values.append(value)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(values))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view):
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Keyset cursor from the previous page `next` link.',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of results per page (max {self.max_page_size}).',
+                'schema': {'type': 'integer'},
+            },
+        ]
+
+
+class PageNumberOrKeysetPagination(BasePagination):
+    """Page numbers by default; keyset pages with ?pagination=cursor (or a ?cursor=)."""
+
+    def __init__(self):
+        self.page_number = PageNumberPagination()
+        self.keyset = KeysetPagination()
+        self.active = self.page_number
+
+    def keyset_requested(self, request):
+        return self.keyset.keyset_requested(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.active = self.keyset if self.keyset_requested(request) else self.page_number
+        return self.active.paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        return self.active.get_paginated_response(data)
+
+    def get_paginated_response_schema(self, schema):
+        return self.page_number.get_paginated_response_schema(schema)
+
+    def get_schema_operation_parameters(self, view):
+        return self.page_number.get_schema_operation_parameters(view) + [
+            {
+                'name': self.keyset.selector_query_param,
+                'required': False,
+                'in': 'query',
+                'description': "'cursor' for keyset pagination (no count, stable deep pages).",
+                'schema': {'type': 'string', 'enum': ['cursor']},
+            },
+        ] + self.keyset.get_schema_operation_parameters(view)
@@ -2,7 +2,23 @@ from rest_framework import permissions
 from .models import Role
 
 
-class IsSuperAdmin(permissions.BasePermission):
+class ComposablePermission(permissions.BasePermission):
+    """BasePermission whose instances compose with | and &, e.g. IsTeacher() | IsSchoolAdmin()."""
+
+    def __or__(self, other):
+        return permissions.OR(self, other)
+
+    def __ror__(self, other):
+        return permissions.OR(other, self)
+
+    def __and__(self, other):
+        return permissions.AND(self, other)
+
+    def __rand__(self, other):
+        return permissions.AND(other, self)
+
+
+class IsSuperAdmin(ComposablePermission):
     """Permission check for SuperAdmin role. Django is_superuser is treated as SuperAdmin."""
     
     def has_permission(self, request, view):
@@ -10,10 +26,10 @@ class IsSuperAdmin(permissions.BasePermission):
             return False
         if getattr(request.user, 'is_superuser', False):
             return True
-        return request.user.has_role(Role.SUPERADMIN)
+        return request.user.access.has_role(Role.SUPERADMIN)
 
 
-class IsSchoolAdmin(permissions.BasePermission):
+class IsSchoolAdmin(ComposablePermission):
     """Permission check for SchoolAdmin or Director role. Django is_superuser is treated as SuperAdmin."""
     
     def has_permission(self, request, view):
@@ -21,61 +37,52 @@ class IsSchoolAdmin(permissions.BasePermission):
             return False
         if getattr(request.user, 'is_superuser', False):
             return True
-        return (
-            request.user.has_role(Role.SCHOOLADMIN) or
-            request.user.has_role(Role.DIRECTOR) or
-            request.user.has_role(Role.SUPERADMIN)
+        return request.user.access.has_role(
+            Role.SCHOOLADMIN, Role.DIRECTOR, Role.SUPERADMIN
         )
 
 
-class IsTeacher(permissions.BasePermission):
+class IsTeacher(ComposablePermission):
     """Permission check for Teacher role."""
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return (
-            request.user.has_role(Role.TEACHER) or
-            request.user.has_role(Role.SCHOOLADMIN) or
-            request.user.has_role(Role.DIRECTOR) or
-            request.user.has_role(Role.SUPERADMIN)
+        return request.user.access.has_role(
+            Role.TEACHER, Role.SCHOOLADMIN, Role.DIRECTOR, Role.SUPERADMIN
         )
 
 
-class IsStudent(permissions.BasePermission):
+class IsStudent(ComposablePermission):
     """Permission check for Student role."""
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.has_role(Role.STUDENT)
+        return request.user.access.has_role(Role.STUDENT)
 
 
-class IsParent(permissions.BasePermission):
+class IsParent(ComposablePermission):
     """Permission check for Parent role."""
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return request.user.has_role(Role.PARENT)
+        return request.user.access.has_role(Role.PARENT)
 
 
-class IsTeacherOrStudent(permissions.BasePermission):
+class IsTeacherOrStudent(ComposablePermission):
     """Permission check for Teacher or Student role."""
     
     def has_permission(self, request, view):
         if not request.user or not request.user.is_authenticated:
             return False
-        return (
-            request.user.has_role(Role.TEACHER) or
-            request.user.has_role(Role.STUDENT) or
-            request.user.has_role(Role.SCHOOLADMIN) or
-            request.user.has_role(Role.DIRECTOR) or
-            request.user.has_role(Role.SUPERADMIN)
+        return request.user.access.has_role(
+            Role.TEACHER, Role.STUDENT, Role.SCHOOLADMIN, Role.DIRECTOR, Role.SUPERADMIN
         )
 
 
-class IsSuperAdminOrSchoolAdmin(permissions.BasePermission):
+class IsSuperAdminOrSchoolAdmin(ComposablePermission):
     """Permission check for SuperAdmin or SchoolAdmin/Director role.
     Also allows Django is_superuser (e.g. staff users without UserRole).
     """
@@ -85,14 +92,12 @@ class IsSuperAdminOrSchoolAdmin(permissions.BasePermission):
             return False
         if getattr(request.user, 'is_superuser', False):
             return True
-        return (
-            request.user.has_role(Role.SUPERADMIN) or
-            request.user.has_role(Role.SCHOOLADMIN) or
-            request.user.has_role(Role.DIRECTOR)
+        return request.user.access.has_role(
+            Role.SUPERADMIN, Role.SCHOOLADMIN, Role.DIRECTOR
         )
 
 
-class IsScheduleAdmin(permissions.BasePermission):
+class IsScheduleAdmin(ComposablePermission):
     """Permission for schedule admin: builder, conflicts. Includes Registrar and Scheduler."""
 
     def has_permission(self, request, view):
@@ -100,16 +105,12 @@ class IsScheduleAdmin(permissions.BasePermission):
             return False
         if getattr(request.user, 'is_superuser', False):
             return True
-        return (
-            request.user.has_role(Role.SUPERADMIN) or
-            request.user.has_role(Role.SCHOOLADMIN) or
-            request.user.has_role(Role.DIRECTOR) or
-            request.user.has_role(Role.REGISTRAR) or
-            request.user.has_role(Role.SCHEDULER)
+        return request.user.access.has_role(
+            Role.SUPERADMIN, Role.SCHOOLADMIN, Role.DIRECTOR, Role.REGISTRAR, Role.SCHEDULER
         )
 
 
-class HasPermission(permissions.BasePermission):
+class HasPermission(ComposablePermission):
     """Check that the user has the given permission code (from RolePermission or is_superuser)."""
 
     def __init__(self, permission_code):
@@ -120,6 +121,4 @@ class HasPermission(permissions.BasePermission):
             return False
         if getattr(request.user, 'is_superuser', False):
             return True
-        codes = request.user.get_effective_permission_codes()
-        return self.permission_code in codes
-
+        return request.user.access.has_permission(self.permission_code)
@@ -0,0 +1,207 @@
+"""
+Serializer-driven query planning and sparse fieldsets for viewsets.
+
+The queryset of a list/retrieve is planned from the `source` paths of the
+serializer's fields: forward relations become select_related, to-many
+relations become Prefetch (planned the same way, `rel.count` included), and
+only() restricts each table to the columns a field actually reads. A page
+therefore costs a fixed number of queries whatever its size.
+
+`?fields=a,b` keeps only those serializer fields, `?slim=true` keeps only
+plain columns of the model, and `?expand=x,y` adds named fields back on top
+of either; the plan follows the trimmed serializer.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch, QuerySet
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def _split(value):
+    return {name.strip() for name in (value or '').split(',') if name.strip()}
+
+
+def is_plain_field(serializer, field):
+    """True if the field reads a column of the serializer's own model (no join, no method)."""
+    if isinstance(field, (serializers.BaseSerializer, serializers.SerializerMethodField)):
+        return False
+    if field.source == '*' or '.' in field.source:
+        return False
+    model = getattr(getattr(serializer, 'Meta', None), 'model', None)
+    if model is None:
+        return False
+    try:
+        model_field = model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        return False
+    return model_field.concrete and not model_field.many_to_many
+
+
+def trim_fields(serializer, fields=None, expand=(), slim=False):
+    """Drop serializer fields not selected by ?fields= / ?slim= (plus ?expand=)."""
+    if fields is None and not slim:
+        return serializer
+    root = serializer.child if isinstance(serializer, serializers.ListSerializer) else serializer
+    keep = set(expand)
+    for name, field in root.fields.items():
+        if (fields is not None and name in fields) or (fields is None and slim and is_plain_field(root, field)):
+            keep.add(name)
+    for name in list(root.fields):
+        if name not in keep:
+            root.fields.pop(name)
+    return serializer
+
+
+class _Plan:
+    """Joins and columns needed by a serializer on one model."""
+
+    def __init__(self, model):
+        self.model = model
+        self.select = {}        # relation name -> _Plan (select_related)
+        self.prefetch = {}      # relation name -> (_Plan, nested serializer or None)
+        self.columns = set()
+        self.full = False       # a method/property reads the row: load every column
+
+    def related(self, name, model):
+        if name not in self.select:
+            self.select[name] = _Plan(model)
+        return self.select[name]
+
+
+def _add_path(plan, parts, nested):
+    """Walk a dotted source from plan.model, recording joins and columns."""
+    for index, part in enumerate(parts):
+        try:
+            field = plan.model._meta.get_field(part)
+        except FieldDoesNotExist:
+            # Method or property: needs the whole row
+            plan.full = True
+            return
+        last = index == len(parts) - 1
+        if not field.is_relation:
+            plan.columns.add(field.name)
+            return
+        if field.many_to_one or field.one_to_one:
+            if field.concrete:
+                plan.columns.add(field.name)
+                if last and nested is None:
+                    return  # primary key of the relation: the FK column is enough
+            plan = plan.related(part, field.related_model)
+            continue
+        # Reverse FK or many-to-many: prefetched
+        if part not in plan.prefetch:
+            child_plan = _Plan(field.related_model)
+            if field.one_to_many:
+                child_plan.columns.add(field.field.name)  # joins the rows back to their parent
+            else:
+                child_plan.full = True
+            plan.prefetch[part] = (child_plan, None)
+        child_plan, _ = plan.prefetch[part]
+        if parts[index + 1:] == ['count']:
+            return  # counted from the prefetched rows
+        if last and nested is not None:
+            plan.prefetch[part] = (child_plan, nested)
+            _plan_serializer(child_plan, nested)
+            return
+        plan = child_plan
+    if nested is not None:
+        _plan_serializer(plan, nested)
+    else:
+        plan.full = True
+
+
+def _plan_serializer(plan, serializer):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField) or field.source == '*':
+            plan.full = True
+            continue
+        nested = field if isinstance(field, serializers.BaseSerializer) else None
+        _add_path(plan, field.source.split('.'), nested)
+
+
+def _only(plan, prefix=''):
+    if plan.full:
+        names = [prefix + f.name for f in plan.model._meta.concrete_fields]
+    else:
+        names = [prefix + column for column in plan.columns] or [prefix + plan.model._meta.pk.name]
+    for name, child in plan.select.items():
+        names.append(prefix + name)
+        names += _only(child, f'{prefix}{name}__')
+    return names
+
+
+def _select_related(plan, prefix=''):
+    paths = []
+    for name, child in plan.select.items():
+        nested = _select_related(child, f'{prefix}{name}__')
+        paths += nested or [prefix + name]
+    return paths
+
+
+def _prefetches(plan, prefix=''):
+    lookups = []
+    for name, (child, _) in plan.prefetch.items():
+        queryset = child.model._default_manager.only(*_only(child))
+        select = _select_related(child)
+        if select:
+            queryset = queryset.select_related(*select)
+        lookups.append(Prefetch(prefix + name, queryset=queryset))
+        lookups += _prefetches(child, f'{prefix}{name}__')
+    for name, child in plan.select.items():
+        lookups += _prefetches(child, f'{prefix}{name}__')
+    return lookups
+
+
+def plan_queryset(queryset, serializer, restrict_columns=True, columns=()):
+    """Apply select_related / Prefetch / only() for what `serializer` will read.
+
+    `columns` are extra field paths to load, e.g. a keyset pagination ordering.
+    """
+    plan = _Plan(queryset.model)
+    _plan_serializer(plan, serializer)
+    for column in columns:
+        _add_path(plan, column.lstrip('-').split('__'), None)
+    # Columns are left alone if get_queryset() already chose joins or deferrals
+    if restrict_columns and not queryset.query.select_related and not queryset.query.deferred_loading[0]:
+        queryset = queryset.only(*_only(plan))
+    select = _select_related(plan)
+    if select:
+        queryset = queryset.select_related(*select)
+    prefetches = _prefetches(plan)
+    if prefetches:
+        queryset = queryset.prefetch_related(*prefetches)
+    return queryset
+
+
+class QueryPlanningMixin:
+    """Viewset mixin: plan list/retrieve querysets from the serializer (see plan_queryset)."""
+    planned_actions = ('list', 'retrieve')
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.planned_actions and isinstance(queryset, QuerySet):
+            queryset = plan_queryset(
+                queryset, self.get_serializer(), columns=getattr(self, 'keyset_ordering', None) or ()
+            )
+        return queryset
+
+
+class SparseFieldsetsMixin(QueryPlanningMixin):
+    """Viewset mixin: ?fields= / ?slim= / ?expand= trimming on reads, on top of query planning."""
+
+    def get_field_selection(self):
+        params = self.request.query_params
+        fields = _split(params.get('fields')) if 'fields' in params else None
+        slim = params.get('slim', '').lower() in ('1', 'true')
+        return fields, _split(params.get('expand')), slim
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        if self.request is not None and self.request.method in SAFE_METHODS:
+            fields, expand, slim = self.get_field_selection()
+            trim_fields(serializer, fields, expand, slim)
+        return serializer
@@ -1,6 +1,49 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
-from .models import User, UserRole, Role, Permission, RolePermission, SchoolJoinRequest, SchoolJoinRequestStatus, Notification
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from django.conf import settings
+from django.db import models
+from django.db.models import Prefetch, prefetch_related_objects
+from .access import get_permission_codes_for_roles
+from .tokens import access_token_for
+from .models import User, UserRole, Role, Permission, RolePermission, SchoolJoinRequest, SchoolJoinRequestStatus, Notification, AuditLog
+
+
+def prefetch_user_roles(users):
+    """Load UserRole rows (with school) for many users in one query."""
+    users = [user for user in users if user is not None]
+    prefetch_related_objects(
+        users,
+        Prefetch('user_roles', queryset=UserRole.objects.select_related('school')),
+    )
+    return users
+
+
+class UserPrefetchListSerializer(serializers.ListSerializer):
+    """List serializer that batch-loads users' roles and schools for the whole page.
+
+    `user_attr` names the attribute holding the User on each item (None when
+    the items are users); `prefetch` lists extra lookups for the items.
+    """
+    user_attr = None
+    prefetch = ()
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        # Only load what the (possibly ?fields= trimmed) child still reads
+        sources = {field.source.split('.')[0] for field in self.child.fields.values()}
+        lookups = [lookup for lookup in self.prefetch if lookup.split('__')[0] in sources]
+        with_users = self.user_attr is None or self.user_attr in sources
+        if self.user_attr and with_users:
+            lookups.insert(0, self.user_attr)
+        if lookups:
+            prefetch_related_objects(items, *lookups)
+        if with_users:
+            users = items if self.user_attr is None else [getattr(item, self.user_attr) for item in items]
+            prefetch_user_roles(users)
+        return super().to_representation(items)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -17,20 +60,39 @@ class UserSerializer(serializers.ModelSerializer):
             'is_active', 'is_superuser', 'date_joined', 'roles', 'permissions', 'schools'
         ]
         read_only_fields = ['id', 'date_joined']
+        list_serializer_class = UserPrefetchListSerializer
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._permission_codes = {}
+
+    def to_representation(self, instance):
+        if 'user_roles' not in getattr(instance, '_prefetched_objects_cache', {}):
+            prefetch_user_roles([instance])
+        return super().to_representation(instance)
 
     def get_roles(self, obj):
         """Get user roles (from UserRole per school)."""
         return [ur.role for ur in obj.user_roles.all()]
 
     def get_permissions(self, obj):
-        """Effective permission codes for this user (from RolePermission / is_superuser)."""
-        return obj.get_effective_permission_codes()
+        """Effective permission codes for this user (from RolePermission / is_superuser).
+
+        Resolved once per distinct role set (memoized on the serializer for list pages).
+        """
+        roles = frozenset(ur.role for ur in obj.user_roles.all())
+        key = (roles, bool(obj.is_superuser))
+        if key not in self._permission_codes:
+            self._permission_codes[key] = sorted(
+                get_permission_codes_for_roles(roles, superuser=obj.is_superuser)
+            )
+        return self._permission_codes[key]
 
     def get_schools(self, obj):
         """Schools where user has a role (for school switcher)."""
         return [
             {'id': str(ur.school_id), 'name': ur.school.name}
-            for ur in obj.user_roles.select_related('school').all()
+            for ur in obj.user_roles.all()
         ]
 
 
@@ -160,3 +222,37 @@ class NotificationSerializer(serializers.ModelSerializer):
         fields = ['id', 'type', 'payload', 'read_flag', 'created_at']
         read_only_fields = ['id', 'type', 'payload', 'created_at']
 
+
+class AuditLogSerializer(serializers.ModelSerializer):
+    """Audit log entry (read-only)."""
+    actor_email = serializers.EmailField(source='actor.email', read_only=True, allow_null=True)
+
+    class Meta:
+        model = AuditLog
+        fields = ['id', 'actor', 'actor_email', 'action', 'target', 'target_id', 'payload', 'timestamp']
+        read_only_fields = fields
+
+
+class TokenObtainPairWithClaimsSerializer(TokenObtainPairSerializer):
+    """Login: access token carries role claims when JWT_ACCESS_CLAIMS is on."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        refresh = RefreshToken(data['refresh'])
+        data['access'] = str(access_token_for(refresh, self.user))
+        return data
+
+
+class TokenRefreshWithClaimsSerializer(TokenRefreshSerializer):
+    """Refresh: re-stamps role claims so refreshed access tokens are never stale."""
+
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        if settings.JWT_ACCESS_CLAIMS:
+            refresh = RefreshToken(attrs['refresh'])
+            user = User.objects.filter(
+                **{jwt_settings.USER_ID_FIELD: refresh[jwt_settings.USER_ID_CLAIM]}
+            ).first()
+            if user is not None:
+                data['access'] = str(access_token_for(refresh, user))
+        return data
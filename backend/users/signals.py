@@ -0,0 +1,33 @@
+"""
+Cache invalidation for auth users, user roles and the role-permission matrix.
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .access import bump_matrix_version, invalidate_user_roles
+from .authentication import invalidate_auth_user
+from .models import User, UserRole, RolePermission, Permission
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    invalidate_auth_user(instance.pk)
+
+
+@receiver(post_save, sender=UserRole)
+@receiver(post_delete, sender=UserRole)
+def user_role_changed(sender, instance, **kwargs):
+    # Also stales the role claims in this user's access tokens (per-user version)
+    invalidate_user_roles(instance.user_id)
+    # Drop the role context already loaded on the related user instance (if any).
+    user = instance._state.fields_cache.get('user')
+    if user is not None:
+        user.__dict__.pop('access', None)
+
+
+@receiver(post_save, sender=RolePermission)
+@receiver(post_delete, sender=RolePermission)
+@receiver(post_save, sender=Permission)
+@receiver(post_delete, sender=Permission)
+def permission_matrix_changed(sender, instance, **kwargs):
+    bump_matrix_version()
@@ -1,7 +1,17 @@
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
-from .models import UserRole, Role
-from schools.models import School, SchoolType
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import JWTAuthentication
+from .models import UserRole, Role, Permission, RolePermission, Notification
+from .pagination import KeysetPagination
+from .serializers import UserSerializer
+from .tokens import access_from_claims, tokens_for_user
+from schools.models import School, City
 
 User = get_user_model()
 
@@ -10,8 +20,7 @@ class UserModelTest(TestCase):
     def setUp(self):
         self.school = School.objects.create(
             name='Test School',
-            type=SchoolType.NIS,
-            city='Almaty'
+            city=City.objects.get_or_create(name='Almaty')[0]
         )
         self.user = User.objects.create_user(
             email='test@example.com',
@@ -34,3 +43,174 @@ class UserModelTest(TestCase):
         self.assertTrue(self.user.has_role(Role.TEACHER))
         self.assertFalse(self.user.has_role(Role.STUDENT))
 
+
+    def test_role_checks_load_roles_once(self):
+        UserRole.objects.create(
+            user=self.user,
+            school=self.school,
+            role=Role.TEACHER
+        )
+        with self.assertNumQueries(1):
+            self.assertTrue(self.user.has_role(Role.TEACHER))
+            self.assertFalse(self.user.has_role(Role.STUDENT))
+            self.assertTrue(self.user.access.has_role(Role.STUDENT, Role.TEACHER))
+            self.assertTrue(self.user.access.has_school_role(self.school.id, Role.TEACHER))
+
+
+class PermissionCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.user = User.objects.create_user(email='cache@example.com', password='testpass123')
+        UserRole.objects.create(user=self.user, school=self.school, role=Role.TEACHER)
+        self.view = Permission.objects.create(code='grades.view', name='View grades')
+        RolePermission.objects.create(role=Role.TEACHER, permission=self.view)
+
+    def fresh_access(self):
+        return User.objects.get(pk=self.user.pk).access
+
+    def test_codes_cached_across_requests(self):
+        self.assertTrue(self.fresh_access().has_permission('grades.view'))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(user.access.has_permission('grades.view'))
+            self.assertTrue(user.access.has_role(Role.TEACHER))
+
+    def test_role_permission_edit_invalidates_codes(self):
+        self.assertFalse(self.fresh_access().has_permission('grades.edit'))
+        edit = Permission.objects.create(code='grades.edit', name='Edit grades')
+        grant = RolePermission.objects.create(role=Role.TEACHER, permission=edit)
+        self.assertTrue(self.fresh_access().has_permission('grades.edit'))
+        grant.delete()
+        self.assertFalse(self.fresh_access().has_permission('grades.edit'))
+
+    def test_user_role_edit_invalidates_roles(self):
+        self.assertFalse(self.fresh_access().has_role(Role.SCHOOLADMIN))
+        role = UserRole.objects.create(user=self.user, school=self.school, role=Role.SCHOOLADMIN)
+        self.assertTrue(self.fresh_access().has_role(Role.SCHOOLADMIN))
+        role.delete()
+        self.assertFalse(self.fresh_access().has_role(Role.SCHOOLADMIN))
+
+
+@override_settings(JWT_ACCESS_CLAIMS=True)
+class AccessTokenClaimsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.school = School.objects.create(name='Test School')
+        self.user = User.objects.create_user(email='claims@example.com', password='testpass123')
+        self.other = User.objects.create_user(email='other@example.com', password='testpass123')
+        UserRole.objects.create(user=self.user, school=self.school, role=Role.TEACHER)
+
+    def claims(self):
+        return AccessToken(tokens_for_user(self.user)['access'])
+
+    def test_claims_resolve_roles(self):
+        access = access_from_claims(self.user, self.claims())
+        self.assertIsNotNone(access)
+        self.assertTrue(access.has_school_role(self.school.id, Role.TEACHER))
+
+    def test_other_users_role_edit_keeps_claims(self):
+        token = self.claims()
+        UserRole.objects.create(user=self.other, school=self.school, role=Role.STUDENT)
+        self.assertIsNotNone(access_from_claims(self.user, token))
+
+    def test_own_role_edit_stales_claims(self):
+        token = self.claims()
+        UserRole.objects.create(user=self.user, school=self.school, role=Role.SCHOOLADMIN)
+        self.assertIsNone(access_from_claims(self.user, token))
+        self.assertIsNotNone(access_from_claims(self.user, self.claims()))
+
+    def test_role_permission_edit_stales_claims(self):
+        token = self.claims()
+        permission = Permission.objects.create(code='grades.view', name='View grades')
+        RolePermission.objects.create(role=Role.TEACHER, permission=permission)
+        self.assertIsNone(access_from_claims(self.user, token))
+
+
+class AuthUserCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            email='auth@example.com', password='testpass123', first_name='Auth'
+        )
+        self.token = AccessToken.for_user(self.user)
+
+    def test_user_lookup_cached(self):
+        authentication = JWTAuthentication()
+        with self.assertNumQueries(1):
+            authentication.get_user(self.token)
+        with self.assertNumQueries(0):
+            user = authentication.get_user(self.token)
+        self.assertEqual(user.pk, self.user.pk)
+        self.assertEqual(user.first_name, 'Auth')
+
+    def test_user_save_invalidates(self):
+        authentication = JWTAuthentication()
+        authentication.get_user(self.token)
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        self.assertEqual(authentication.get_user(self.token).first_name, 'Renamed')
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            authentication.get_user(self.token)
+
+
+class UserListSerializerTest(TestCase):
+    def setUp(self):
+        self.school = School.objects.create(name='Test School')
+        for index in range(6):
+            user = User.objects.create_user(email=f'list{index}@example.com', password='testpass123')
+            UserRole.objects.create(user=user, school=self.school, role=Role.TEACHER if index % 2 else Role.STUDENT)
+
+    def serialize(self, count):
+        cache.clear()
+        users = User.objects.order_by('email')[:count]
+        with CaptureQueriesContext(connection) as queries:
+            data = UserSerializer(users, many=True).data
+        return data, len(queries)
+
+    def test_query_count_independent_of_page_size(self):
+        small, small_queries = self.serialize(2)
+        data, queries = self.serialize(6)
+        self.assertEqual(queries, small_queries)
+        self.assertEqual(len(data), 6)
+        self.assertEqual(data[0]['roles'], [Role.STUDENT])
+        self.assertEqual(data[0]['schools'][0]['id'], str(self.school.id))
+
+
+class KeysetPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(email='pages@example.com', password='testpass123')
+        for index in range(5):
+            Notification.objects.create(to_user=self.user, type='grade', payload={'index': index})
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def cursor(self, *values):
+        return KeysetPagination().encode_cursor(values)
+
+    def test_pages_follow_next_link(self):
+        seen = []
+        response = self.client.get('/api/notifications/', {'pagination': 'cursor', 'page_size': 2})
+        while True:
+            self.assertEqual(response.status_code, 200)
+            seen += [row['id'] for row in response.data['results']]
+            if not response.data['next']:
+                break
+            response = self.client.get(response.data['next'])
+        expected = Notification.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        self.assertEqual(seen, [str(pk) for pk in expected])
+
+    def test_malformed_cursor_is_not_found(self):
+        notification = Notification.objects.first()
+        for cursor in (
+            'not base64!',
+            self.cursor('2024-10-01T09:00:00+00:00'),
+            self.cursor('not a date', str(notification.id)),
+            self.cursor(notification.created_at, 'not-a-uuid'),
+        ):
+            response = self.client.get('/api/notifications/', {'cursor': cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+            self.assertEqual(str(response.data['detail']), 'Invalid cursor')
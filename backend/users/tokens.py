@@ -0,0 +1,55 @@
+"""
+Role claims in JWT access tokens (enabled by settings.JWT_ACCESS_CLAIMS).
+
+The access token carries the user's (school, role) pairs, the version of the
+user's roles and the role-permission matrix version it was issued under.
+While both versions are current, roles and permission codes are resolved
+from the token without touching the database. A UserRole edit bumps only
+that user's version and a RolePermission edit the matrix version, so older
+tokens fall back to the regular lookup.
+"""
+from django.conf import settings
+from rest_framework_simplejwt.tokens import RefreshToken
+from .access import AccessContext, get_matrix_version, get_user_roles_version
+
+ROLES_CLAIM = 'roles'
+MATRIX_VERSION_CLAIM = 'pmv'
+ROLES_VERSION_CLAIM = 'rv'
+
+
+def add_access_claims(token, user):
+    """Embed role claims into an access token."""
+    # Read the versions first: a concurrent edit then makes the token stale, never wrong.
+    token[MATRIX_VERSION_CLAIM] = get_matrix_version()
+    token[ROLES_VERSION_CLAIM] = get_user_roles_version(user.pk)
+    token[ROLES_CLAIM] = [list(row) for row in AccessContext(user).school_roles]
+    return token
+
+
+def access_from_claims(user, token):
+    """AccessContext built from token claims, or None if absent or stale."""
+    roles = token.get(ROLES_CLAIM)
+    if roles is None:
+        return None
+    if token.get(MATRIX_VERSION_CLAIM) != get_matrix_version():
+        return None
+    if token.get(ROLES_VERSION_CLAIM) != get_user_roles_version(user.pk):
+        return None
+    return AccessContext(user, school_roles=[tuple(row) for row in roles])
+
+
+def access_token_for(refresh, user):
+    """Access token for a refresh token, with role claims if enabled."""
+    access = refresh.access_token
+    if settings.JWT_ACCESS_CLAIMS:
+        add_access_claims(access, user)
+    return access
+
+
+def tokens_for_user(user):
+    """Refresh/access pair for a user (registration and login)."""
+    refresh = RefreshToken.for_user(user)
+    return {
+        'refresh': str(refresh),
+        'access': str(access_token_for(refresh, user)),
+    }
@@ -4,7 +4,6 @@ from rest_framework.response import Response
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.views import APIView
 from rest_framework_simplejwt.views import TokenObtainPairView
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import get_user_model
 from django.utils import timezone
 from .serializers import (
@@ -18,8 +17,12 @@ from .serializers import (
     SchoolJoinRequestCreateSerializer,
     SchoolJoinRequestReviewSerializer,
     NotificationSerializer,
+    AuditLogSerializer,
 )
-from .permissions import IsSuperAdminOrSchoolAdmin, HasPermission
+from .pagination import KeysetPagination
+from .permissions import IsSuperAdminOrSchoolAdmin, IsSuperAdmin, HasPermission
+from .access import bump_matrix_version
+from .tokens import tokens_for_user
 from .models import (
     UserRole,
     Permission,
@@ -38,10 +41,9 @@ def can_approve_for_school(user, school):
     """True if user can approve join requests for this school (Director/SchoolAdmin/SuperAdmin for this school)."""
     if getattr(user, 'is_superuser', False):
         return True
-    return user.user_roles.filter(
-        school=school,
-        role__in=[Role.DIRECTOR, Role.SCHOOLADMIN, Role.SUPERADMIN]
-    ).exists()
+    return user.access.has_school_role(
+        school.id, Role.DIRECTOR, Role.SCHOOLADMIN, Role.SUPERADMIN
+    )
 
 
 def get_schools_user_can_approve(user):
@@ -49,11 +51,7 @@ def get_schools_user_can_approve(user):
     if getattr(user, 'is_superuser', False):
         from schools.models import School
         return list(School.objects.values_list('id', flat=True))
-    return list(
-        user.user_roles.filter(
-            role__in=[Role.DIRECTOR, Role.SCHOOLADMIN, Role.SUPERADMIN]
-        ).values_list('school_id', flat=True).distinct()
-    )
+    return user.access.school_ids_with_role(Role.DIRECTOR, Role.SCHOOLADMIN, Role.SUPERADMIN)
 
 
 class UserViewSet(viewsets.ModelViewSet):
@@ -87,13 +85,9 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = UserRegistrationSerializer(data=request.data)
         if serializer.is_valid():
             user = serializer.save()
-            refresh = RefreshToken.for_user(user)
             return Response({
                 'user': UserSerializer(user).data,
-                'tokens': {
-                    'refresh': str(refresh),
-                    'access': str(refresh.access_token),
-                }
+                'tokens': tokens_for_user(user),
             }, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
@@ -180,6 +174,8 @@ class RolePermissionsView(APIView):
         RolePermission.objects.bulk_create([
             RolePermission(role=role, permission=p) for p in perms
         ])
+        # bulk_create sends no signals: invalidate cached permission codes explicitly
+        bump_matrix_version()
         codes = [p.code for p in perms]
         return Response({'role': role, 'permission_codes': codes})
 
@@ -334,13 +330,18 @@ class NotificationViewSet(viewsets.GenericViewSet):
     """List and mark read notifications for current user."""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-created_at', '-id')
 
     def get_queryset(self):
-        return Notification.objects.filter(to_user=self.request.user).order_by('-created_at')[:50]
+        return Notification.objects.filter(to_user=self.request.user).order_by('-created_at')
 
     def list(self, request, *args, **kwargs):
         qs = self.get_queryset()
-        serializer = self.get_serializer(qs, many=True)
+        if self.paginator.keyset_requested(request):
+            page = self.paginate_queryset(qs)
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        serializer = self.get_serializer(qs[:50], many=True)
         return Response(serializer.data)
 
     def partial_update(self, request, *args, **kwargs):
@@ -352,3 +353,23 @@ class NotificationViewSet(viewsets.GenericViewSet):
         instance.save(update_fields=['read_flag'])
         return Response(NotificationSerializer(instance).data)
 
+
+class AuditLogViewSet(viewsets.ReadOnlyModelViewSet):
+    """Audit log listing for SuperAdmin, newest first, keyset-paginated."""
+    serializer_class = AuditLogSerializer
+    permission_classes = [IsSuperAdmin]
+    pagination_class = KeysetPagination
+    keyset_ordering = ('-timestamp', '-id')
+
+    def get_queryset(self):
+        queryset = AuditLog.objects.select_related('actor')
+        params = self.request.query_params
+        if params.get('actor_id'):
+            queryset = queryset.filter(actor_id=params['actor_id'])
+        if params.get('action'):
+            queryset = queryset.filter(action=params['action'])
+        if params.get('target'):
+            queryset = queryset.filter(target=params['target'])
+        if params.get('target_id'):
+            queryset = queryset.filter(target_id=params['target_id'])
+        return queryset
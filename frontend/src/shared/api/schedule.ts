@@ -16,9 +16,20 @@ export interface ScheduleConflict {
   slot1: ScheduleSlot
   slot2: ScheduleSlot
   type: 'teacher' | 'classroom' | 'class_group'
+  day_of_week: number
+}
+
+export interface ScheduleConflictGroup {
+  type: ScheduleConflict['type']
+  resource: string
+  resource_name: string
+  conflicts: ScheduleConflict[]
 }
 
 export interface ConflictResolution {
+  school_id: string
+  academic_year_id: string
+  groups: ScheduleConflictGroup[]
   conflicts: ScheduleConflict[]
   suggestions: string[]
 }